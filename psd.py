@@ -13,17 +13,57 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import asyncio
+import atexit
+import bisect
+import calendar
+import collections
+import concurrent.futures
+import cProfile
 import datetime
+import functools
+import gc
+import glob
+import gzip
+import hashlib
+import heapq
+import http.server
+import importlib
+import itertools
 import json
+import multiprocessing
+import os
+import pickle
 import platform
+import queue
+import re
+import selectors
+import shlex
+import shutil
 import signal
+import socket
 import subprocess
 import sys
+import threading
 import time
+import traceback
 from datetime import timedelta
 from os import environ
 from os import path
 from os import mkdir
+from os import remove
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import sqlite3
+except ImportError:  # Python built without sqlite
+    sqlite3 = None
+
+TIME_FORMAT = re.compile(r"([01][0-9]|2[0-3]):[0-5][0-9]")
 
 DOW = {"mon": 0, "tue": 1, "wed": 2, "thu": 3,  "fri": 4, "sat": 5, "sun": 6}
 
@@ -42,22 +82,107 @@ PURPLE = 134
 LOG = False
 LOG_FOLDER = "logs/"
 LOG_PREFIX = "log_"
+LOG_BUFFER_SIZE = 64 * 1024  # characters of pending messages which force a write
+LOG_FLUSH_INTERVAL = 1  # seconds
+LOG_COMPRESS = False  # gzip log file of the previous day after midnight
+LOG_WRITER = None
 ENCODING = sys.getdefaultencoding()
-DEBUG = False
+TRACE = False  # checked at every trace call site, so disabled tracing costs one global lookup
+TRACE_LEVEL = 0
+TRACE_JOBS = None  # None - all jobs
+TRACE_SECTIONS = None  # None - all sections
+
+TRACE_BEGIN = 5
+TRACE_END = 6
+TRACE_DEBUG = 10
+TRACE_INFO = 20
+TRACE_LEVELS = {"section": TRACE_BEGIN, "debug": TRACE_DEBUG, "info": TRACE_INFO}
 
 DEBUG_SECTION_BEGIN = "[BEGIN]"
 DEBUG_SECTION_END = "[END]"
 DEBUG_BANNER = "[DEBUG]"
 
+IS_WINDOWS = platform.system() == 'Windows'
+
+OUTPUT = None  # output sink, see make_output()
+OUTPUT_SINKS = ("console", "plain", "json", "null")
+OUTPUT_BUFFER = 10000  # lines waiting for the terminal
+
+RETRY_DELAY = timedelta(seconds=1)  # re-check interval for jobs that wait on a running process
+MAX_SLEEP = 60  # upper bound of one scheduler sleep, in seconds, to follow wall clock changes
+SUPERVISOR = None  # ChildSupervisor or AsyncSupervisor, learns about finished processes
+ENGINE = "default"
+ENGINES = ("default", "asyncio")
+EXEC_MODE = "legacy"  # "auto" - cmd is parsed once, simple commands are started without the shell
+EXEC_MODES = ("legacy", "auto")
+SHELL_SYNTAX = re.compile(r"[|&;<>()$`*?\[\]#~{}!\n]")  # a command with any of them is run by the shell
+FAST_SPAWN = hasattr(os, "posix_spawn") and hasattr(os, "waitstatus_to_exitcode")
+SPAWN_ENV = None  # environment of processes started by os.posix_spawn, encoded at the first start
+ZYGOTES = {}  # zygote name -> Zygote, see setting 'zygotes'
+CALL_POOL = None  # CallPool, runs jobs with field 'call'
+CALL_WORKERS = None  # None - number of CPUs
+CALL_MAX_TASKS = 1000  # calls per worker before the pool is recycled, None - no limit
+CALL_MAX_RSS = None  # MB of worker RSS after a call which recycles the pool, None - no limit
+CALL_RESULT_SIZE = 1000  # max characters of the return value in the run result
+SPAWN_SIGDEF = tuple(getattr(signal, _s) for _s in ("SIGPIPE", "SIGXFSZ") if hasattr(signal, _s))  # ignored by Python
+SHUTDOWN_GRACE = 5  # seconds between SIGTERM and SIGKILL
+SHUTDOWN_TIMEOUT = None  # seconds to wait for repeated jobs, None - no limit
+SHUTDOWN = None  # ShutdownCoordinator, while psd is finishing
+CONCURRENCY = None  # ConcurrencyController, if limits are set
+CONCURRENCY_MAX_RUNNING = None  # None - no limit
+CONCURRENCY_QUEUE_SIZE = 1000
+CONCURRENCY_OVERFLOW = "queue"
+CONCURRENCY_OVERFLOWS = ("drop", "queue", "replace_oldest")
+CONCURRENCY_POOLS = {}  # pool name -> max running processes
+CAPTURE = False  # default of job field 'capture'
+CAPTURE_FOLDER = None  # None - 'runs/' in the log folder
+CAPTURE_MAX_SIZE = 10 * 1024 * 1024  # bytes of one output file, None - no limit
+CAPTURE_RING_SIZE = 64 * 1024  # last bytes of output kept in memory, 0 - none
+CAPTURE_CHUNK = 64 * 1024
+OUTPUT_PUMP = None  # OutputPump, moves captured output of the default engine
+CONFIG_CACHE = False  # keep compiled jobs in '<settings file>.cache'
+CONFIG_CACHE_VERSION = 4
+RELOAD = False  # apply changes of settings file and job files to jobs without restart
+RELOAD_INTERVAL = 2  # seconds between checks of the files
+INCLUDE_WORKERS = 16  # threads reading job files
+CALENDAR_CACHE_SIZE = 4096  # resolved days of month rules, shared by all jobs
+MONTH_TABLES = {}  # (year, month) -> (weekday of the 1st day, number of days)
+METRICS = None  # Metrics, if enabled
+METRICS_ENABLED = False
+METRICS_ADDRESS = "127.0.0.1"
+METRICS_PORT = 9464  # None - no HTTP endpoint
+METRICS_TEXTFILE = None  # None - metrics are not written to a file
+METRICS_INTERVAL = 15  # seconds between writes of the textfile
+METRICS_DURATION_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600, 14400)  # seconds of a run
+METRICS_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)  # seconds from due time to process start
+METRICS_TICK_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)  # seconds of one scheduler pass
+TIMING = None  # TimingStats, if enabled
+TIMING_ENABLED = False
+TIMING_TICK_BUDGET = 0.1  # seconds, longer scheduler passes are overruns
+TIMING_WINDOW = 10000  # the last samples kept for percentiles
+PROFILE = None  # Profiler, with --profile
+PROFILE_MODES = ("phases", "cprofile", "sample")
+PROFILE_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+PROFILE_TOP_JOBS = 50  # jobs with the highest tick cost in the report
+STATE = None  # StateStore, if enabled
+STATE_ENABLED = False
+STATE_FILE = None  # None - '<settings file>.state'
+STATE_COMMIT_INTERVAL = 1  # seconds, changed states are committed in one transaction
+CATCH_UP = None  # CatchUpRunner, starts runs missed by jobs
+CATCH_UP_POLICY = "skip"  # default of job field 'catch_up'
+CATCH_UP_POLICIES = ("skip", "once", "all")
+CATCH_UP_MAX = 10  # default of job field 'catch_up_max', catch-up runs of one job with policy "all"
+CATCH_UP_INTERVAL = 1  # seconds between catch-up runs of all jobs
+
 
 class DateTimeMonthsJob:
-    def __init__(self, _dt, _months):
+    def __init__(self, _dt, _months, now=None):
         self._dt = _dt
         self._months = _months
         self._iterator = 0
-        _today = datetime.datetime.today()
+        _today = now if now is not None else datetime.datetime.today()
         for _month in _months:
-            if _today.month > MONTHS[_month]:
+            if _today.month > _month:
                 self._iterator += 1
                 continue
             elif _today.day > _dt.day:
@@ -79,7 +204,7 @@ class DateTimeMonthsJob:
             self._iterator = 0
             year += 1
 
-        _month = MONTHS[self._months[self._iterator]]
+        _month = self._months[self._iterator]
         self._dt = datetime.datetime(
             year, _month, 1, 0, 0, 0, 0)
         self._iterator += 1
@@ -87,24 +212,187 @@ class DateTimeMonthsJob:
 
 
 def add_months(dt, months):
-    if isinstance(months, int):
-        _month = dt.month - 1 + months
-        year = dt.year + _month // 12
-        _month = _month % 12 + 1
-        return datetime.date(year, _month, 1)
-    else:
-        _year = dt.year
-        _month = MONTHS[months]
+    _month = dt.month - 1 + months
+    year = dt.year + _month // 12
+    _month = _month % 12 + 1
+    return datetime.date(year, _month, 1)
+
+
+def next_month(dt, month):
+    _year = dt.year
+    if dt.month >= month:
+        _year += 1
+    dt = datetime.datetime(
+        _year, month, 1, 0, 0, 0, 0)
+    return dt
+
+
+def month_table(year, month):
+    table = MONTH_TABLES.get((year, month))
+    if table is None:
+        table = calendar.monthrange(year, month)
+        MONTH_TABLES[(year, month)] = table
+    return table
+
+
+def precompute_month_tables(year):  # current and next year, the rest is added on demand
+    for _year in (year, year + 1):
+        for _month in range(1, 13):
+            month_table(_year, _month)
+
+
+@functools.lru_cache(maxsize=CALENDAR_CACHE_SIZE)
+def month_day(year, month, day, dow, each):
+    # 'day' of the month, or the 'each'-th weekday 'dow' after the 1st day of the month
+    if dow is None:
+        return datetime.date(year, month, day)
+    days_ahead = dow - month_table(year, month)[0]
+    if days_ahead <= 0:
+        days_ahead += 7
+    return datetime.date(year, month, 1) + timedelta(days_ahead + 7 * (each - 1))
+
+
+class ScheduleSpec:
+    # 'start' or 'finish' section of job schedule, resolved once at load time
+    __slots__ = ("is_now", "is_never", "is_month", "h_m", "time", "has_day", "day", "dow",
+                 "months", "month_step", "month", "month_day", "month_dow", "each")
+
+    def __init__(self, section):
+        self.is_now = section.get("time") == "now"
+        self.is_never = section.get("time") == "never"
+        self.is_month = "month" in section
+        self.has_day = "day" in section
+        self.day = 0
+        self.dow = None
+        if isinstance(section.get("day"), str):
+            self.dow = DOW[section["day"]]
+        elif self.has_day:
+            self.day = section["day"]
+
+        self.months = None  # list of months, start only
+        self.month_step = None  # number of months
+        self.month = None  # month name, finish only
+        self.month_day = None
+        self.month_dow = None
+        self.each = 1
+        if self.is_month:
+            _month = section["month"]
+            if isinstance(_month["values"], list):
+                self.months = tuple(MONTHS[_m] for _m in _month["values"])
+            elif isinstance(_month["values"], str):
+                self.month = MONTHS[_month["values"]]
+            else:
+                self.month_step = _month["values"]
+            if isinstance(_month["day"], str):
+                self.month_dow = DOW[_month["day"]]
+                self.each = _month["each"]
+            else:
+                self.month_day = _month["day"]
+            self.h_m = tuple(int_time(_month["time"]))
+        elif self.is_now or self.is_never:
+            self.h_m = (0, 0)
+        else:
+            self.h_m = tuple(int_time(section["time"]))
+        self.time = datetime.time(self.h_m[0], self.h_m[1], 0)
+
+    def month_date(self, month_start):  # day given by 'day' and 'each' of 'month' in the month of month_start
+        return month_day(month_start.year, month_start.month, self.month_day, self.month_dow, self.each)
 
-        if dt.month >= _month:
-            _year += 1
-        dt = datetime.datetime(
-            _year, _month, 1, 0, 0, 0, 0)
-        return dt
+    def row(self):
+        return (self.is_now, self.is_never, self.is_month, self.h_m, self.time, self.has_day, self.day, self.dow,
+                self.months, self.month_step, self.month, self.month_day, self.month_dow, self.each)
+
+    @staticmethod
+    def from_row(row):
+        spec = ScheduleSpec.__new__(ScheduleSpec)
+        (spec.is_now, spec.is_never, spec.is_month, spec.h_m, spec.time, spec.has_day, spec.day, spec.dow,
+         spec.months, spec.month_step, spec.month, spec.month_day, spec.month_dow, spec.each) = row
+        return spec
+
+    def __repr__(self):
+        return "ScheduleSpec(" + ", ".join(_s + "=" + str(getattr(self, _s)) for _s in self.__slots__) + ")"
+
+
+class Schedule:
+    __slots__ = ("start", "finish")
+
+    def __init__(self, schedule):
+        self.start = ScheduleSpec(schedule["start"])
+        self.finish = ScheduleSpec(schedule["finish"])
+
+    def __repr__(self):
+        return "Schedule(start=" + str(self.start) + ", finish=" + str(self.finish) + ")"
+
+
+REPEAT_UNITS = {"s": "seconds", "m": "minutes", "h": "hours"}
+
+
+class Repeat:
+    __slots__ = ("delta", "wait_finished")
+
+    def __init__(self, repeat):
+        self.delta = timedelta(**{REPEAT_UNITS[repeat["unit"]]: repeat["val"]})
+        self.wait_finished = repeat["wait_finished"]
+
+    def __repr__(self):
+        return "Repeat(delta=" + str(self.delta) + ", wait_finished=" + str(self.wait_finished) + ")"
+
+
+class JobSpec:  # validated job of settings, kept in config cache
+    __slots__ = ("name", "cmd", "schedule", "when_finished", "repeat", "max_instances", "pool", "capture", "catch_up",
+                 "catch_up_max", "zygote", "call", "call_args")
+
+    def __init__(self, js, when_finished):
+        self.name = js["name"]
+        self.cmd = js["cmd"] if "cmd" in js else js["call"]
+        self.schedule = Schedule(js["schedule"])
+        self.when_finished = when_finished
+        self.repeat = Repeat(js["repeat"]) if "repeat" in js else None
+        self.max_instances = js.get("max_instances")
+        self.pool = js.get("pool")
+        self.capture = js.get("capture", CAPTURE)
+        self.catch_up = js.get("catch_up", CATCH_UP_POLICY)
+        self.catch_up_max = js.get("catch_up_max", CATCH_UP_MAX)
+        self.zygote = js.get("zygote")
+        self.call = js.get("call")
+        self.call_args = tuple(js.get("args", ()))
+
+    def row(self):  # equal rows - equal jobs
+        rep = None if self.repeat is None else (self.repeat.delta, self.repeat.wait_finished)
+        return (self.name, self.cmd, self.schedule.start.row(), self.schedule.finish.row(),
+                self.when_finished, rep, self.max_instances, self.pool, self.capture, self.catch_up, self.catch_up_max,
+                self.zygote, self.call, self.call_args)
+
+    def __reduce__(self):  # flat row, unpickled many times faster than nested slot objects
+        return restore_job_spec, self.row()
+
+
+def restore_job_spec(name, cmd, start, finish, when_finished, rep, max_instances, pool, capture, catch_up,
+                     catch_up_max, zygote, call, call_args):
+    spec = JobSpec.__new__(JobSpec)
+    spec.name = name
+    spec.cmd = cmd
+    spec.schedule = Schedule.__new__(Schedule)
+    spec.schedule.start = ScheduleSpec.from_row(start)
+    spec.schedule.finish = ScheduleSpec.from_row(finish)
+    spec.when_finished = when_finished
+    spec.repeat = None
+    if rep is not None:
+        spec.repeat = Repeat.__new__(Repeat)
+        spec.repeat.delta, spec.repeat.wait_finished = rep
+    spec.max_instances = max_instances
+    spec.pool = pool
+    spec.capture = capture
+    spec.catch_up = catch_up
+    spec.catch_up_max = catch_up_max
+    spec.zygote = zygote
+    spec.call = call
+    spec.call_args = call_args
+    return spec
 
 
 class Job:
-    def __init__(self, name, cmd, schedule, when_finished, is_sh):
+    def __init__(self, name, cmd, schedule, when_finished, is_sh, now=None):
         self.name = name
         self.cmd = cmd.split(" ")
         self.schedule = schedule
@@ -114,54 +402,78 @@ class Job:
         self.start_datetime = None
         self.stop_datetime = None
         self.dt_month = None
-        self.init_start_dt()
-        self.init_stop_dt()
-
-        try_debug("job: name:" + self.name)
-        try_debug("job: cmd:" + str(self.cmd))
-        try_debug("job: schedule:" + str(self.schedule))
-        try_debug("job: is_shell:" + str(self.is_shell))
-        try_debug("job: when_finished:" + str(self.when_finished))
-        try_debug("job: start_datetime:" + str(self.start_datetime))
-        try_debug("job: stop_datetime:" + str(self.stop_datetime))
-        try_debug("job: dt_month:" + str(self.dt_month))
-
-    def init_start_dt(self):
-        try_debug("job: '" + self.name + "', section: 'def init_start_dt(self)'", DEBUG_SECTION_BEGIN)
+        self.exit_code = None  # of the last finished run
+        self.end_datetime = None
+        self.max_instances = None  # running processes of the job, None - no limit
+        self.pool = None  # name of concurrency pool
+        self.capture = False  # write output of every run to files
+        self.captured = None  # RunCapture of the last run
+        self.last_start = None  # start of the last run
+        self.program = None  # program of exec mode "auto", None - cmd is run as in "legacy"
+        self.zygote = None  # Zygote which forks runs of the job, None - runs are started as processes
+        self.zygote_argv = None  # script or '-m' module and its arguments
+        self.call = None  # 'module:function' run by CALL_POOL instead of cmd
+        self.call_args = ()
+        self.catch_up = CATCH_UP_POLICY  # policy for runs missed while psd was stopped or stalled
+        self.catch_up_max = CATCH_UP_MAX
+        self.init_start_dt(now)
+        self.init_stop_dt(now)
+
+        if TRACE:
+            trace(TRACE_DEBUG, self.name, "__init__", "job: name:%s", self.name)
+            trace(TRACE_DEBUG, self.name, "__init__", "job: cmd:%s", self.cmd)
+            trace(TRACE_DEBUG, self.name, "__init__", "job: schedule:%s", self.schedule)
+            trace(TRACE_DEBUG, self.name, "__init__", "job: is_shell:%s", self.is_shell)
+            trace(TRACE_DEBUG, self.name, "__init__", "job: when_finished:%s", self.when_finished)
+            trace(TRACE_DEBUG, self.name, "__init__", "job: start_datetime:%s", self.start_datetime)
+            trace(TRACE_DEBUG, self.name, "__init__", "job: stop_datetime:%s", self.stop_datetime)
+            trace(TRACE_DEBUG, self.name, "__init__", "job: dt_month:%s", self.dt_month)
+
+    def init_start_dt(self, now=None):  # now - the same instant for a batch of jobs
+        if TRACE:
+            trace(TRACE_BEGIN, self.name, "init_start_dt", "job: '%s', section: 'def init_start_dt(self)'", self.name)
         if self.start_datetime is None:
-            if "month" in self.schedule["start"]:
-                start_h_m = int_time(self.schedule["start"]["month"]["time"])
-                try_debug("job: '" + self.name + "', section: "
-                                                 "'if self.start_datetime is None: if 'month' in self.schedule['start']"
-                                                 "': start_h_m:" + str(start_h_m))
+            if self.schedule.start.is_month:
+                start_h_m = self.schedule.start.h_m
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_start_dt",
+                          "job: '%s', section: 'if self.start_datetime is None: if self.schedule.start.is_month"
+                          "': start_h_m:%s", self.name, start_h_m)
             else:
-                if self.schedule["start"]["time"] == "now":
+                if self.schedule.start.is_now:
                     start_h_m = [0, 0]
-                    try_debug("job: '" + self.name + "', section: "
-                                                     "'if self.schedule['start']['time'] == 'now''"
-                                                     ": start_h_m:" + str(start_h_m))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "job: '%s', section: 'if self.schedule.start.is_now': start_h_m:%s",
+                              self.name, start_h_m)
                 else:
-                    start_h_m = int_time(self.schedule["start"]["time"])
-                    try_debug("job: '" + self.name + "', section: "
-                                                     "'if self.schedule['start']['time'] == 'now': else: '"
-                                                     ": start_h_m:" + str(start_h_m))
-
-            if "month" in self.schedule["finish"]:
-                stop_h_m = int_time(self.schedule["finish"]["month"]["time"])
-                try_debug("job: '" + self.name + "', section: "
-                                                 "'if 'month' in self.schedule['finish']'"
-                                                 ": stop_h_m:" + str(stop_h_m))
+                    start_h_m = self.schedule.start.h_m
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "job: '%s', section: 'if self.schedule.start.is_now: else: ': "
+                              "start_h_m:%s", self.name, start_h_m)
+
+            if self.schedule.finish.is_month:
+                stop_h_m = self.schedule.finish.h_m
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_start_dt",
+                          "job: '%s', section: 'if self.schedule.finish.is_month': stop_h_m:%s",
+                          self.name, stop_h_m)
             else:
-                if self.schedule["finish"]["time"] == "never":
+                if self.schedule.finish.is_never:
                     stop_h_m = [0, 0]
-                    try_debug("job: '" + self.name + "', section: 'if self.schedule['finish']['time'] == 'never'': "
-                                                     "stop_h_m:" + str(stop_h_m))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "job: '%s', section: 'if self.schedule.finish.is_never': stop_h_m:%s",
+                              self.name, stop_h_m)
                 else:
-                    stop_h_m = int_time(self.schedule["finish"]["time"])
-                    try_debug("job: '" + self.name + "', section: 'if self.schedule['finish']['time'] == 'never': else:"
-                                                     " ': stop_h_m:" + str(stop_h_m))
+                    stop_h_m = self.schedule.finish.h_m
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "job: '%s', section: 'if self.schedule.finish.is_never: else: ': "
+                              "stop_h_m:%s", self.name, stop_h_m)
 
-            dt_start = datetime.datetime.today()
+            dt_start = now if now is not None else datetime.datetime.today()
             dt_actual_start = datetime.datetime(year=dt_start.year,
                                                 month=dt_start.month,
                                                 day=dt_start.day,
@@ -173,95 +485,111 @@ class Job:
                                                  hour=stop_h_m[0],
                                                  minute=stop_h_m[1])
 
-            try_debug("job: '" + self.name + "', section: 'if self.start_datetime is None': dt_start: " + str(dt_start)
-                      + ", dt_actual_start: " + str(dt_actual_start) + ", dt_actual_finish: " + str(dt_actual_finish))
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "init_start_dt",
+                      "job: '%s', section: 'if self.start_datetime is None': dt_start: %s, dt_actual_start: %s, "
+                      "dt_actual_finish: %s", self.name, dt_start, dt_actual_start, dt_actual_finish)
 
             if dt_actual_start > dt_actual_finish:
                 dt_actual_finish += timedelta(days=1)
-                try_debug("job: '" + self.name + "', section: 'dt_actual_start > dt_actual_finish': dt_actual_finish: "
-                          + str(dt_actual_finish))
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_start_dt",
+                          "job: '%s', section: 'dt_actual_start > dt_actual_finish': dt_actual_finish: %s",
+                          self.name, dt_actual_finish)
 
             if not(dt_actual_start < dt_start < dt_actual_finish):
                 if not(dt_start < dt_actual_start and dt_start < dt_actual_finish):
                     dt_start += timedelta(days=1)
-                    try_debug("job: '" + self.name +
-                              "', section: 'if not(dt_actual_start < dt_start < dt_actual_finish): "
-                              "if not(dt_start < dt_actual_start and dt_start < dt_actual_finish): "
-                              "dt_actual_finish: " + str(dt_actual_finish))
-
-            if "month" in self.schedule["start"]:
-                start_h_m = int_time(self.schedule["start"]["month"]["time"])
-                try_debug("job: '" + self.name + "', section: 'if 'month' in self.schedule['start']': "
-                                                 "start_h_m: " + str(start_h_m))
-                if isinstance(self.schedule["start"]["month"]["values"], list):
-                    self.dt_month = DateTimeMonthsJob(dt_start,
-                                                      self.schedule["start"]["month"]["values"])
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "job: '%s', section: 'if not(dt_actual_start < dt_start < dt_actual_finish): if "
+                              "not(dt_start < dt_actual_start and dt_start < dt_actual_finish): dt_actual_finish: %s",
+                              self.name, dt_actual_finish)
+
+            if self.schedule.start.is_month:
+                start_h_m = self.schedule.start.h_m
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_start_dt",
+                          "job: '%s', section: 'if self.schedule.start.is_month': start_h_m: %s",
+                          self.name, start_h_m)
+                if self.schedule.start.months is not None:
+                    self.dt_month = DateTimeMonthsJob(dt_start, self.schedule.start.months, now)
                     start_date = self.dt_month.next_date_time()
-                    try_debug("job: '" + self.name +
-                              "', section: 'if isinstance(self.schedule['start']['month']['values'], list)': "
-                              "dt_month: " + str(self.dt_month) + ", start_date: " + str(start_date))
-                else:
-                    start_date = add_months(dt_start, self.schedule["start"]["month"]["values"])
-                    try_debug("job: '" + self.name +
-                              "', section: 'if isinstance(self.schedule['start']['month']['values'], list): else: ':"
-                              ", start_date: " + str(start_date))
-                if isinstance(self.schedule["start"]["month"]["day"], str):
-                    for i in range(self.schedule["start"]["month"]["each"]):
-                        start_date = next_weekday(start_date, DOW[self.schedule["start"]["month"]["day"]])
-                    try_debug("job: '" + self.name +
-                              "', section: 'if isinstance(self.schedule['start']['month']['day'], str)'"
-                              ": start_date: " + str(start_date))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "job: '%s', section: 'if self.schedule.start.months is not None"
+                              "': dt_month: %s, start_date: %s", self.name, self.dt_month, start_date)
                 else:
-                    start_date = datetime.date(year=start_date.year,
-                                               month=start_date.month,
-                                               day=self.schedule["start"]["month"]["day"])
-                    try_debug("job: '" + self.name
-                              + "', section: 'if isinstance(self.schedule['start']['month']['day'], str): else: '"
-                                ": start_date: " + str(start_date))
+                    start_date = add_months(dt_start, self.schedule.start.month_step)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "job: '%s', section: 'if self.schedule.start.months is not None: "
+                              "else: ':, start_date: %s", self.name, start_date)
+                start_date = self.schedule.start.month_date(start_date)
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_start_dt",
+                          "job: '%s', section: 'self.schedule.start.month_date': start_date: %s",
+                          self.name, start_date)
             else:
-                if self.schedule["start"]["time"] == "now":
-                    try_debug("job: '" + self.name
-                              + "', section: 'if self.schedule['start']['time'] == 'now'': return None")
+                if self.schedule.start.is_now:
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "job: '%s', section: 'if self.schedule.start.is_now': return None",
+                              self.name)
                     return None
-                if isinstance(self.schedule["start"]["day"], str):
-                    start_date = next_weekday(dt_start, DOW[self.schedule["start"]["day"]])
-                    try_debug("job: '" + self.name
-                              + "', section: 'if isinstance(self.schedule['start']['day'], str)': "
-                                "start_date: " + str(start_date))
+                if self.schedule.start.dow is not None:
+                    start_date = next_weekday(dt_start, self.schedule.start.dow)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "job: '%s', section: 'if self.schedule.start.dow is not None': start_date: "
+                              "%s", self.name, start_date)
                 else:
                     start_date = dt_start
-                    try_debug("job: '" + self.name
-                              + "', section: 'if isinstance(self.schedule['start']['day'], str): else: '"
-                                ": start_date: " + str(start_date))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "job: '%s', section: 'if self.schedule.start.dow is not None: else: ': "
+                              "start_date: %s", self.name, start_date)
 
             self.start_datetime = datetime.datetime.combine(
                 start_date,
-                datetime.time(start_h_m[0], start_h_m[1], 0))
-
-            try_debug("job: '" + self.name + "', section: 'if 'month' in self.schedule['start']: else: '"
-                                             ": start_datetime: " + str(self.start_datetime))
-        try_debug("job: '" + self.name + "', section: 'def init_start_dt(self)'", DEBUG_SECTION_END)
-
-    def init_stop_dt(self):
-        try_debug("job: '" + self.name + "', section: 'def init_stop_dt(self)' [BEGIN]", DEBUG_SECTION_BEGIN)
+                self.schedule.start.time)
+
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "init_start_dt",
+                      "job: '%s', section: 'if self.schedule.start.is_month: else: ': start_datetime: %s",
+                      self.name, self.start_datetime)
+        if TRACE:
+            trace(TRACE_END, self.name, "init_start_dt", "job: '%s', section: 'def init_start_dt(self)'", self.name)
+
+    def init_stop_dt(self, now=None):
+        if TRACE:
+            trace(TRACE_BEGIN, self.name, "init_stop_dt",
+                  "job: '%s', section: 'def init_stop_dt(self)' [BEGIN]", self.name)
         if self.start_datetime is None:
-            dt_start = datetime.date.today()
-            try_debug("job: '" + self.name + "', section: 'if self.start_datetime is None': dt_start: " + str(dt_start))
+            dt_start = now.date() if now is not None else datetime.date.today()
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                      "job: '%s', section: 'if self.start_datetime is None': dt_start: %s", self.name, dt_start)
         else:
-            if "month" in self.schedule["finish"]:
-                stop_h_m = int_time(self.schedule["finish"]["month"]["time"])
-                try_debug("job: '" + self.name + "', section: 'if 'month' in self.schedule['finish']'"
-                                                 ": dt_start: " + str(stop_h_m))
+            if self.schedule.finish.is_month:
+                stop_h_m = self.schedule.finish.h_m
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                          "job: '%s', section: 'if self.schedule.finish.is_month': dt_start: %s",
+                          self.name, stop_h_m)
             else:
-                if self.schedule["finish"]["time"] == "never":
+                if self.schedule.finish.is_never:
                     stop_h_m = [0, 0]
-                    try_debug("job: '" + self.name + "', section: 'if self.schedule['finish']['time'] == 'never''"
-                                                     ": stop_h_m: " + str(stop_h_m))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                              "job: '%s', section: 'if self.schedule.finish.is_never': stop_h_m: %s",
+                              self.name, stop_h_m)
                 else:
-                    stop_h_m = int_time(self.schedule["finish"]["time"])
-                    try_debug("job: '" + self.name
-                              + "', section: 'if self.schedule['finish']['time'] == 'never': else: '"
-                                ": stop_h_m: " + str(stop_h_m))
+                    stop_h_m = self.schedule.finish.h_m
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                              "job: '%s', section: 'if self.schedule.finish.is_never: else: ': "
+                              "stop_h_m: %s", self.name, stop_h_m)
 
             dt_start = self.start_datetime
             dt_actual_finish = datetime.datetime(year=dt_start.year,
@@ -270,231 +598,269 @@ class Job:
                                                  hour=stop_h_m[0],
                                                  minute=stop_h_m[1])
 
-            try_debug("job: '" + self.name
-                      + "', section: 'if self.start_datetime is None: else: ': dt_start: " +
-                      str(dt_start) + ", dt_actual_finish: " + str(dt_actual_finish))
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                      "job: '%s', section: 'if self.start_datetime is None: else: ': dt_start: %s, "
+                      "dt_actual_finish: %s", self.name, dt_start, dt_actual_finish)
 
             if dt_start > dt_actual_finish:
                 dt_start += timedelta(days=1)
-                try_debug("job: '" + self.name + "', " + str(dt_start) + ">" + str(dt_actual_finish))
-                try_debug("job: '" + self.name + "', section: 'if dt_start > dt_actual_finish'"
-                                                 ": dt_start: " + str(dt_start))
-        if "month" in self.schedule["finish"]:
-            if isinstance(self.schedule["finish"]["month"]["values"], str):
-                stop_date = add_months(dt_start, self.schedule["finish"]["month"]["values"])
-                try_debug("job: '" + self.name +
-                          "', section: 'if 'month' in self.schedule['finish']: "
-                          "if isinstance(self.schedule['finish']['month']['values'], str)'"
-                          ": stop_date: " + str(stop_date))
-            else:
-                stop_date = add_months(dt_start, self.schedule["finish"]["month"]["values"])
-                try_debug("job: '" + self.name +
-                          "', section: 'if 'month' in self.schedule['finish']: "
-                          "if isinstance(self.schedule['finish']['month']['values'], str): else'"
-                          ": stop_date: " + str(stop_date))
-            if isinstance(self.schedule["finish"]["month"]["day"], str):
-                for i in range(self.schedule["finish"]["month"]["each"]):
-                    stop_date = next_weekday(stop_date, DOW[self.schedule["finish"]["month"]["day"]])
-                try_debug("job: '" + self.name +
-                          "', section: 'if isinstance(self.schedule['finish']['month']['day'], str)'"
-                          ": stop_date: " + str(stop_date))
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                          "job: '%s', %s>%s", self.name, dt_start, dt_actual_finish)
+                    trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                          "job: '%s', section: 'if dt_start > dt_actual_finish': dt_start: %s", self.name, dt_start)
+        if self.schedule.finish.is_month:
+            if self.schedule.finish.month is not None:
+                stop_date = next_month(dt_start, self.schedule.finish.month)
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                          "job: '%s', section: 'if self.schedule.finish.is_month: "
+                          "if self.schedule.finish.month is not None': stop_date: %s",
+                          self.name, stop_date)
             else:
-                stop_date = datetime.date(year=stop_date.year,
-                                          month=stop_date.month,
-                                          day=self.schedule["finish"]["month"]["day"])
-                try_debug("job: '" + self.name +
-                          "', section: 'if isinstance(self.schedule['finish']['month']['day'], str): else: '"
-                          ": stop_date: " + str(stop_date))
-            stop_h_m = int_time(self.schedule["finish"]["month"]["time"])
+                stop_date = add_months(dt_start, self.schedule.finish.month_step)
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                          "job: '%s', section: 'if self.schedule.finish.is_month: "
+                          "if self.schedule.finish.month is not None: else': stop_date: %s",
+                          self.name, stop_date)
+            stop_date = self.schedule.finish.month_date(stop_date)
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                      "job: '%s', section: 'self.schedule.finish.month_date': stop_date: %s",
+                      self.name, stop_date)
+            stop_h_m = self.schedule.finish.h_m
             self.stop_datetime = datetime.datetime.combine(
                 stop_date,
-                datetime.time(stop_h_m[0], stop_h_m[1], 0))
-            try_debug("job: '" + self.name +
-                      "', section: 'if 'month' in self.schedule['finish']': stop_h_m: " + str(stop_h_m) +
-                      ", stop_datetime: " + str(self.stop_datetime))
+                self.schedule.finish.time)
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                      "job: '%s', section: 'if self.schedule.finish.is_month': stop_h_m: %s, stop_datetime: %s",
+                      self.name, stop_h_m, self.stop_datetime)
         else:
-            if self.schedule["finish"]["time"] == "never":
-                try_debug("job: '" + self.name +
-                          "', section: 'if self.schedule['finish']['time'] == 'never'': return None")
+            if self.schedule.finish.is_never:
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                          "job: '%s', section: 'if self.schedule.finish.is_never': return None", self.name)
                 return None
 
             if self.stop_datetime is None:
-                stop_h_m = int_time(self.schedule["finish"]["time"])
+                stop_h_m = self.schedule.finish.h_m
                 stop_day = 0
-                try_debug("job: '" + self.name + "', section: 'if self.stop_datetime is None': stop_h_m: " +
-                          str(stop_h_m) + ", stop_day:" + str(stop_day))
-                if "day" in self.schedule["finish"]:
-                    if isinstance(self.schedule["finish"]["day"], str):
-                        stop_day = DOW[self.schedule["finish"]["day"]]
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                          "job: '%s', section: 'if self.stop_datetime is None': stop_h_m: %s, stop_day:%s",
+                          self.name, stop_h_m, stop_day)
+                if self.schedule.finish.has_day:
+                    if self.schedule.finish.dow is not None:
+                        stop_day = self.schedule.finish.dow
                         self.stop_datetime = next_weekday(
                             datetime.datetime.combine(
                                 dt_start,
-                                datetime.time(stop_h_m[0], stop_h_m[1], 0)),
+                                self.schedule.finish.time),
                             stop_day)
-                        try_debug("job: '" + self.name + "', section: 'if 'day' in self.schedule['finish']': stop_day: "
-                                  + str(stop_day) + ", stop_datetime:" + str(self.stop_datetime))
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                                  "job: '%s', section: 'if self.schedule.finish.has_day': stop_day: %s, "
+                                  "stop_datetime:%s", self.name, stop_day, self.stop_datetime)
                     else:
-                        stop_day = self.schedule["finish"]["day"]
+                        stop_day = self.schedule.finish.day
                         self.stop_datetime = datetime.datetime.combine(
                             dt_start + timedelta(days=stop_day),
-                            datetime.time(stop_h_m[0], stop_h_m[1], 0))
-                        try_debug("job: '" + self.name +
-                                  "', section: 'if 'day' in self.schedule['finish']: else: ': stop_day: " +
-                                  str(stop_day) + ", stop_datetime:" + str(self.stop_datetime))
+                            self.schedule.finish.time)
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                                  "job: '%s', section: 'if self.schedule.finish.has_day: else: ': stop_day: %s, "
+                                  "stop_datetime:%s", self.name, stop_day, self.stop_datetime)
                 else:
                     self.stop_datetime = datetime.datetime.combine(
                         dt_start + timedelta(days=stop_day),
-                        datetime.time(stop_h_m[0], stop_h_m[1], 0))
-                    try_debug("job: '" + self.name +
-                              "', section: 'if 'day' in self.schedule['finish']: else: ': stop_datetime:"
-                              + str(self.stop_datetime))
-        try_debug("job: '" + self.name + "', section: 'def init_stop_dt(self)'", DEBUG_SECTION_END)
+                        self.schedule.finish.time)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                              "job: '%s', section: 'if self.schedule.finish.has_day: else: ': stop_datetime:%s",
+                              self.name, self.stop_datetime)
+        if TRACE:
+            trace(TRACE_END, self.name, "init_stop_dt", "job: '%s', section: 'def init_stop_dt(self)'", self.name)
 
     def try_start(self):  # True - job is running, False - job is not running
-        try_debug("job: '" + self.name + "', section: 'def try_start(self)'", DEBUG_SECTION_BEGIN)
-        if "month" in self.schedule["start"]:
+        if TRACE:
+            trace(TRACE_BEGIN, self.name, "try_start", "job: '%s', section: 'def try_start(self)'", self.name)
+        if self.schedule.start.is_month:
             if self.job is None:
-                try_debug("job: '" + self.name + "', section: 'if self.job is None'")
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_start", "job: '%s', section: 'if self.job is None'", self.name)
                 now = datetime.datetime.now()
                 if self.start_datetime <= now <= self.stop_datetime:
-                    try_debug("job: '" + self.name +
-                              "', section: 'if self.start_datetime <= now <= self.stop_datetime'")
-                    try_debug(str(self.start_datetime) + "<=" + str(now) + "<=" + str(self.stop_datetime))
-                    self.job = subprocess.Popen(self.cmd, shell=self.is_shell)
-                    if isinstance(self.schedule["start"]["month"]["values"], list):
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_start",
+                              "job: '%s', section: 'if self.start_datetime <= now <= self.stop_datetime'", self.name)
+                        trace(TRACE_DEBUG, self.name, "try_start",
+                              "%s<=%s<=%s", self.start_datetime, now, self.stop_datetime)
+                    self.job = spawn(self)
+                    if self.schedule.start.months is not None:
                         start_date = self.dt_month.next_date_time()
                     else:
-                        start_date = add_months(self.start_datetime, self.schedule["start"]["month"]["values"])
-                    if isinstance(self.schedule["start"]["month"]["day"], str):
-                        for i in range(self.schedule["start"]["month"]["each"]):
-                            start_date = next_weekday(start_date, DOW[self.schedule["start"]["month"]["day"]])
-                    else:
-                        start_date = datetime.date(year=start_date.year,
-                                                   month=start_date.month,
-                                                   day=self.schedule["start"]["month"]["day"])
-                    start_h_m = int_time(self.schedule["start"]["month"]["time"])
+                        start_date = add_months(self.start_datetime, self.schedule.start.month_step)
+                    start_date = self.schedule.start.month_date(start_date)
+                    start_h_m = self.schedule.start.h_m
 
-                    try_debug("job: " + self.name + "start_date: " + str(start_date))
-                    try_debug("job: " + self.name + "start_h_m: " + str(start_h_m))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_start", "job: %sstart_date: %s", self.name, start_date)
+                        trace(TRACE_DEBUG, self.name, "try_start", "job: %sstart_h_m: %s", self.name, start_h_m)
 
                     self.start_datetime = datetime.datetime.combine(
                         start_date,
-                        datetime.time(start_h_m[0], start_h_m[1], 0))
+                        self.schedule.start.time)
 
-                    try_debug("job: " + self.name + "start_datetime: " + str(self.start_datetime))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_start",
+                              "job: %sstart_datetime: %s", self.name, self.start_datetime)
 
                     if self.when_finished:
-                        try_debug("job: " + self.name + "section: start_date: 'if self.when_finished'")
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "try_start",
+                                  "job: %ssection: start_date: 'if self.when_finished'", self.name)
 
                         if self.start_datetime < self.stop_datetime:
-                            try_debug("job: " + self.name + ": " + str(self.start_datetime) + "<" +
-                                      str(self.stop_datetime))
+                            if TRACE:
+                                trace(TRACE_DEBUG, self.name, "try_start",
+                                      "job: %s: %s<%s", self.name, self.start_datetime, self.stop_datetime)
                             temp_start_date = datetime.date(year=self.stop_datetime.year,
                                                             month=self.stop_datetime.month,
                                                             day=self.stop_datetime.day)
-                            try_debug("job: " + self.name + " temp_start_date: " + str(temp_start_date))
-                            if isinstance(self.schedule["start"]["day"], str):
-                                temp_start_date += next_weekday(temp_start_date,
-                                                                DOW[self.schedule["start"]["day"]])
-                                try_debug("job: " + self.name +
-                                          "section: 'if isinstance(self.schedule['start']['day'], str)'"
-                                          ": temp_start_date: " + str(temp_start_date))
+                            if TRACE:
+                                trace(TRACE_DEBUG, self.name, "try_start",
+                                      "job: %s temp_start_date: %s", self.name, temp_start_date)
+                            if self.schedule.start.dow is not None:
+                                temp_start_date = next_weekday(temp_start_date, self.schedule.start.dow)
+                                if TRACE:
+                                    trace(TRACE_DEBUG, self.name, "try_start",
+                                          "job: %ssection: 'if self.schedule.start.dow is not None': "
+                                          "temp_start_date: %s", self.name, temp_start_date)
                             else:
-                                temp_start_date += timedelta(days=self.schedule["start"]["day"])
-                                try_debug(
-                                    "job: " + self.name +
-                                    "section: 'if isinstance(self.schedule['start']['day'], str)': else:"
-                                    " temp_start_date: " + str(temp_start_date))
+                                temp_start_date += timedelta(days=self.schedule.start.day)
+                                if TRACE:
+                                    trace(TRACE_DEBUG, self.name, "try_start",
+                                          "job: %ssection: 'if self.schedule.start.dow is not None': "
+                                          "else: temp_start_date: %s", self.name, temp_start_date)
                             self.start_datetime = datetime.datetime(year=temp_start_date.year,
                                                                     month=temp_start_date.month,
                                                                     day=temp_start_date.day,
                                                                     hour=self.start_datetime.hour,
                                                                     minute=self.start_datetime.minute,
                                                                     second=self.start_datetime.second)
-                            try_debug("job: " + self.name +
-                                      "section: 'if self.start_datetime < self.stop_datetime'"
-                                      ": start_datetime: " + str(self.start_datetime))
-
-                    print(start_msg_full(self.name, str(now), self.stop_datetime, self.start_datetime))
-                    try_debug("job: '" + self.name + "', section: 'def try_start(self)'", DEBUG_SECTION_END)
+                            if TRACE:
+                                trace(TRACE_DEBUG, self.name, "try_start",
+                                      "job: %ssection: 'if self.start_datetime < self.stop_datetime': "
+                                      "start_datetime: %s", self.name, self.start_datetime)
+
+                    start_msg_full(self.name, str(now), self.stop_datetime, self.start_datetime)
+                    if TRACE:
+                        trace(TRACE_END, self.name, "try_start", "job: '%s', section: 'def try_start(self)'", self.name)
                     return True
                 else:
-                    try_debug("job: '" + self.name + "', section: 'if self.start_datetime <= now <= self.stop_datetime'"
-                                                     ": return False")
-                    try_debug("job: '" + self.name + "', section: 'def try_start(self)'", DEBUG_SECTION_END)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_start",
+                              "job: '%s', section: 'if self.start_datetime <= now <= self.stop_datetime': return "
+                              "False", self.name)
+                        trace(TRACE_END, self.name, "try_start", "job: '%s', section: 'def try_start(self)'", self.name)
                     return False
             else:
-                try_debug("job: '" + self.name + "', section: 'if self.job is None': return True")
-                try_debug("job: '" + self.name + "', section: 'def try_start(self)'", DEBUG_SECTION_END)
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_start",
+                          "job: '%s', section: 'if self.job is None': return True", self.name)
+                    trace(TRACE_END, self.name, "try_start", "job: '%s', section: 'def try_start(self)'", self.name)
                 return True
         else:
-            if self.schedule["start"]["time"] == "now":
+            if self.schedule.start.is_now:
                 if self.job is None:
-                    try_debug("job: '" + self.name + "', section: 'if self.schedule['start']['time'] == 'now'")
-                    self.job = subprocess.Popen(self.cmd, shell=self.is_shell)
-                    print(start_msg_short(self.name, datetime.datetime.now()))
-                try_debug("job: '" + self.name + "', section: 'if self.schedule['start']['time'] == 'now''"
-                                                 ": return True")
-                try_debug("job: '" + self.name + "', section: 'def try_start(self)'", DEBUG_SECTION_END)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_start",
+                              "job: '%s', section: 'if self.schedule.start.is_now", self.name)
+                    self.job = spawn(self)
+                    start_msg_short(self.name, datetime.datetime.now())
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_start",
+                          "job: '%s', section: 'if self.schedule.start.is_now': return True", self.name)
+                    trace(TRACE_END, self.name, "try_start", "job: '%s', section: 'def try_start(self)'", self.name)
                 return True
             else:
                 if self.job is None:
-                    try_debug("job: '" + self.name + "', section: 'if self.job is None'")
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_start",
+                              "job: '%s', section: 'if self.job is None'", self.name)
                     now = datetime.datetime.now()
                     if self.start_datetime <= now <= self.stop_datetime:
-                        try_debug("job: '" + self.name +
-                                  "', section: 'if self.start_datetime <= now <= self.stop_datetime'")
-                        try_debug(str(self.start_datetime) + "<=" + str(now) + "<=" + str(self.stop_datetime))
-                        self.job = subprocess.Popen(self.cmd, shell=self.is_shell)
-                        try_debug("job: '" + self.name + ": " + str(self.job))
-                        start_h_m = int_time(self.schedule["start"]["time"])
-                        start_day = self.schedule["start"]["day"]
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "try_start",
+                                  "job: '%s', section: 'if self.start_datetime <= now <= self.stop_datetime'",
+                                  self.name)
+                            trace(TRACE_DEBUG, self.name, "try_start",
+                                  "%s<=%s<=%s", self.start_datetime, now, self.stop_datetime)
+                        self.job = spawn(self)
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "try_start", "job: '%s: %s", self.name, self.job)
+                        start_h_m = self.schedule.start.h_m
+                        start_day = self.schedule.start.day
                         start_date = datetime.datetime.now()
 
-                        try_debug("job: '" + self.name + ", start_h_m " + str(start_h_m))
-                        try_debug("job: '" + self.name + ", start_day" + str(start_day))
-                        try_debug("job: '" + self.name + ", start_date" + str(start_date))
-
-                        if "day" in self.schedule["finish"]:
-                            try_debug("job: '" + self.name + "', section: 'if 'day' in self.schedule['finish']'")
-                            if isinstance(self.schedule["finish"]["day"], str):
-                                start_date = next_weekday(datetime.date.today(), DOW[self.schedule["finish"]["day"]])
-                                try_debug("job: '" + self.name +
-                                          "', section: 'if 'day' in self.schedule['finish']'"
-                                          ": start_date: " + str(start_date))
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "try_start", "job: '%s, start_h_m %s", self.name, start_h_m)
+                            trace(TRACE_DEBUG, self.name, "try_start", "job: '%s, start_day%s", self.name, start_day)
+                            trace(TRACE_DEBUG, self.name, "try_start", "job: '%s, start_date%s", self.name, start_date)
+
+                        if self.schedule.finish.has_day:
+                            if TRACE:
+                                trace(TRACE_DEBUG, self.name, "try_start",
+                                      "job: '%s', section: 'if self.schedule.finish.has_day'", self.name)
+                            if self.schedule.finish.dow is not None:
+                                start_date = next_weekday(datetime.date.today(), self.schedule.finish.dow)
+                                if TRACE:
+                                    trace(TRACE_DEBUG, self.name, "try_start",
+                                          "job: '%s', section: 'if self.schedule.finish.has_day': start_date: %s",
+                                          self.name, start_date)
                             else:
-                                start_day += self.schedule["finish"]["day"]
-                                try_debug("job: '" + self.name +
-                                          "', section: 'if 'day' in self.schedule['finish']': else:"
-                                          " start_date: " + str(start_day))
+                                start_day += self.schedule.finish.day
+                                if TRACE:
+                                    trace(TRACE_DEBUG, self.name, "try_start",
+                                          "job: '%s', section: 'if self.schedule.finish.has_day': else: "
+                                          "start_date: %s", self.name, start_day)
                         self.start_datetime = datetime.datetime.combine(
                             start_date + timedelta(days=start_day),
-                            datetime.time(start_h_m[0], start_h_m[1], 0))
-                        try_debug("job: '" + self.name + "start_datetime: " + str(self.start_datetime))
+                            self.schedule.start.time)
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "try_start",
+                                  "job: '%sstart_datetime: %s", self.name, self.start_datetime)
 
                         if self.when_finished:
-                            try_debug("job: '" + self.name + "', section: if self.when_finished")
+                            if TRACE:
+                                trace(TRACE_DEBUG, self.name, "try_start",
+                                      "job: '%s', section: if self.when_finished", self.name)
                             if self.start_datetime < self.stop_datetime:
                                 temp_start_date = datetime.date(year=self.stop_datetime.year,
                                                                 month=self.stop_datetime.month,
                                                                 day=self.stop_datetime.day)
-                                try_debug("job: '" + self.name +
-                                          "', section: 'if self.start_datetime < self.stop_datetime'")
-                                try_debug("job: '" + self.name + "', " + str(self.start_datetime) + "<" +
-                                          str(self.stop_datetime))
-
-                                if isinstance(self.schedule["start"]["day"], str):
-                                    temp_start_date += next_weekday(temp_start_date,
-                                                                    DOW[self.schedule["start"]["day"]])
-                                    try_debug(
-                                        "job: '" + self.name +
-                                        "', section: 'if isinstance(self.schedule['start']['day'], str)'"
-                                        ": temp_start_date: " + str(temp_start_date))
+                                if TRACE:
+                                    trace(TRACE_DEBUG, self.name, "try_start",
+                                          "job: '%s', section: 'if self.start_datetime < self.stop_datetime'",
+                                          self.name)
+                                    trace(TRACE_DEBUG, self.name, "try_start",
+                                          "job: '%s', %s<%s", self.name, self.start_datetime, self.stop_datetime)
+
+                                if self.schedule.start.dow is not None:
+                                    temp_start_date = next_weekday(temp_start_date, self.schedule.start.dow)
+                                    if TRACE:
+                                        trace(TRACE_DEBUG, self.name, "try_start",
+                                              "job: '%s', section: 'if self.schedule.start.dow is not None"
+                                              "': temp_start_date: %s", self.name, temp_start_date)
                                 else:
-                                    temp_start_date += timedelta(days=self.schedule["start"]["day"])
-                                    try_debug("job: '" + self.name +
-                                              "', section: 'if isinstance(self.schedule['start']['day'], str)': else:"
-                                              " temp_start_date: " + str(temp_start_date))
+                                    temp_start_date += timedelta(days=self.schedule.start.day)
+                                    if TRACE:
+                                        trace(TRACE_DEBUG, self.name, "try_start",
+                                              "job: '%s', section: 'if self.schedule.start.dow is not None"
+                                              "': else: temp_start_date: %s", self.name, temp_start_date)
 
                                 self.start_datetime = datetime.datetime(year=temp_start_date.year,
                                                                         month=temp_start_date.month,
@@ -502,127 +868,164 @@ class Job:
                                                                         hour=self.start_datetime.hour,
                                                                         minute=self.start_datetime.minute,
                                                                         second=self.start_datetime.second)
-                                try_debug("job: '" + self.name +
-                                          "', section: 'if self.start_datetime < self.stop_datetime'"
-                                          ": start_datetime: " + str(self.start_datetime))
-
-                        print(start_msg_full(self.name, str(now), self.stop_datetime, self.start_datetime))
-                        try_debug("job: '" + self.name + "', section: 'def try_start(self)'", DEBUG_SECTION_END)
+                                if TRACE:
+                                    trace(TRACE_DEBUG, self.name, "try_start",
+                                          "job: '%s', section: 'if self.start_datetime < self.stop_datetime': "
+                                          "start_datetime: %s", self.name, self.start_datetime)
+
+                        start_msg_full(self.name, str(now), self.stop_datetime, self.start_datetime)
+                        if TRACE:
+                            trace(TRACE_END, self.name, "try_start",
+                                  "job: '%s', section: 'def try_start(self)'", self.name)
                         return True
                     else:
-                        try_debug("job: '" + self.name +
-                                  "', section: 'if self.start_datetime <= now <= self.stop_datetime': return False")
-                        try_debug(str(self.start_datetime) + "<=" + str(now) + "<=" + str(self.stop_datetime))
-                        try_debug("job: '" + self.name + "', section: 'def try_start(self)'", DEBUG_SECTION_END)
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "try_start",
+                                  "job: '%s', section: 'if self.start_datetime <= now <= self.stop_datetime': "
+                                  "return False", self.name)
+                            trace(TRACE_DEBUG, self.name, "try_start",
+                                  "%s<=%s<=%s", self.start_datetime, now, self.stop_datetime)
+                            trace(TRACE_END, self.name, "try_start",
+                                  "job: '%s', section: 'def try_start(self)'", self.name)
                         return False
                 else:
-                    try_debug("job: '" + self.name + "', section: 'if self.job is None': return True")
-                    try_debug("job: '" + self.name + "', section: 'def try_start(self)'", DEBUG_SECTION_END)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_start",
+                              "job: '%s', section: 'if self.job is None': return True", self.name)
+                        trace(TRACE_END, self.name, "try_start", "job: '%s', section: 'def try_start(self)'", self.name)
                     return True
 
     def try_stop(self):  # true - job is finished, false - job is not finished
-        try_debug("job: '" + self.name + "', section: 'def try_stop(self)", DEBUG_SECTION_BEGIN)
+        if TRACE:
+            trace(TRACE_BEGIN, self.name, "try_stop", "job: '%s', section: 'def try_stop(self)", self.name)
         now = datetime.datetime.now()
-        if "month" in self.schedule["finish"]:
-            try_debug("job: '" + self.name + "', section: 'if 'month' in self.schedule['finish']'")
+        if self.schedule.finish.is_month:
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "try_stop",
+                      "job: '%s', section: 'if self.schedule.finish.is_month'", self.name)
             if now > self.stop_datetime:
-                try_debug("job: '" + self.name + "', section: 'if now > self.stop_datetime'")
-                if platform.system() == 'Windows':
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_stop",
+                          "job: '%s', section: 'if now > self.stop_datetime'", self.name)
+                if IS_WINDOWS:
                     subprocess.call(['taskkill', '/F', '/T', '/PID', str(self.job.pid)])
-                    try_debug("job: '" + self.name + "', section: 'if platform.system() == 'Windows'")
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_stop",
+                              "job: '%s', section: 'if IS_WINDOWS", self.name)
                 else:
-                    self.job.kill()
-                    try_debug("job: '" + self.name + "', section: 'if platform.system() == 'Windows': else")
+                    stop_process(self.job, True)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_stop",
+                              "job: '%s', section: 'if IS_WINDOWS: else", self.name)
                 self.job = None
-                try_debug("job: '" + self.name + "', section: 'if now > self.stop_datetime', job:" + str(self.job))
-                print(stop_msg(self.name, str(now)))
-
-                if isinstance(self.schedule["finish"]["month"]["values"], str):
-                    stop_date = add_months(self.stop_datetime, MONTHS[self.schedule["finish"]["month"]["values"]])
-                    try_debug("job: '" + self.name +
-                              "', section: 'if isinstance(self.schedule['finish']['month']['values'], str)'"
-                              ", stop_date:" + str(stop_date))
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_stop",
+                          "job: '%s', section: 'if now > self.stop_datetime', job:%s", self.name, self.job)
+                stop_msg(self.name, str(now))
+
+                if self.schedule.finish.month is not None:
+                    stop_date = add_months(self.stop_datetime, self.schedule.finish.month)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_stop",
+                              "job: '%s', section: 'if self.schedule.finish.month is not None"
+                              "', stop_date:%s", self.name, stop_date)
                 else:
-                    stop_date = add_months(self.stop_datetime, self.schedule["finish"]["month"]["values"])
-                try_debug("job: '" + self.name +
-                          "', section: 'if isinstance(self.schedule['finish']['month']['values'], str): else'"
-                          ", stop_date:" + str(stop_date))
-                if isinstance(self.schedule["finish"]["month"]["day"], str):
-                    for i in range(self.schedule["finish"]["month"]["each"]):
-                        stop_date = next_weekday(stop_date, DOW[self.schedule["finish"]["month"]["day"]])
-                        try_debug("job: '" + self.name +
-                                  "', section: 'if isinstance(self.schedule['finish']['month']['day'], str)'"
-                                  ", stop_date:" + str(stop_date))
-                else:
-                    stop_date = datetime.date(year=stop_date.year,
-                                              month=stop_date.month,
-                                              day=self.schedule["finish"]["month"]["day"])
-                    try_debug("job: '" + self.name +
-                              "', section: 'if isinstance(self.schedule['finish']['month']['day'], str): else'"
-                              ", stop_date:" + str(stop_date))
-                stop_h_m = int_time(self.schedule["finish"]["month"]["time"])
-                try_debug("job: '" + self.name + "', section: 'if now > self.stop_datetime', stop_h_m:" + str(stop_h_m))
+                    stop_date = add_months(self.stop_datetime, self.schedule.finish.month_step)
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_stop",
+                          "job: '%s', section: 'if self.schedule.finish.month is not None: "
+                          "else', stop_date:%s", self.name, stop_date)
+                stop_date = self.schedule.finish.month_date(stop_date)
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_stop",
+                          "job: '%s', section: 'self.schedule.finish.month_date': stop_date: %s",
+                          self.name, stop_date)
+                stop_h_m = self.schedule.finish.h_m
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_stop",
+                          "job: '%s', section: 'if now > self.stop_datetime', stop_h_m:%s", self.name, stop_h_m)
 
                 self.stop_datetime = datetime.datetime.combine(
                     stop_date,
-                    datetime.time(stop_h_m[0], stop_h_m[1], 0))
-                try_debug("job: '" + self.name + "', section: 'if now > self.stop_datetime'"
-                                                 ", stop_datetime:" + str(self.stop_datetime))
-                try_debug("job: '" + self.name + "', section: 'def try_stop(self)", DEBUG_SECTION_END)
+                    self.schedule.finish.time)
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_stop",
+                          "job: '%s', section: 'if now > self.stop_datetime', stop_datetime:%s",
+                          self.name, self.stop_datetime)
+                    trace(TRACE_END, self.name, "try_stop", "job: '%s', section: 'def try_stop(self)", self.name)
                 return True
         else:
-            if self.schedule["finish"]["time"] == "never":
-                try_debug("job: '" + self.name + "', section: 'if self.schedule['finish']['time'] == 'never''"
-                                                 ": return False")
-                try_debug("job: '" + self.name + "', section: 'def try_stop(self)", DEBUG_SECTION_END)
+            if self.schedule.finish.is_never:
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_stop",
+                          "job: '%s', section: 'if self.schedule.finish.is_never': return False",
+                          self.name)
+                    trace(TRACE_END, self.name, "try_stop", "job: '%s', section: 'def try_stop(self)", self.name)
                 return False
             else:
                 if self.start_datetime is None:
                     start_dt = datetime.date.today()
-                    try_debug("job: '" + self.name + "', section: 'if self.start_datetime is None'"
-                                                     ": start_dt:" + str(start_dt))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_stop",
+                              "job: '%s', section: 'if self.start_datetime is None': start_dt:%s", self.name, start_dt)
                 else:
                     start_dt = self.start_datetime
-                    try_debug("job: '" + self.name + "', section: 'if self.start_datetime is None: else'"
-                                                     ": start_dt:" + str(start_dt))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_stop",
+                              "job: '%s', section: 'if self.start_datetime is None: else': start_dt:%s",
+                              self.name, start_dt)
 
                 if now > self.stop_datetime:
-                    try_debug("job: '" + self.name + "', section: 'if now > self.stop_datetime'")
-                    if platform.system() == 'Windows':
-                        try_debug("job: '" + self.name + "', section: 'if platform.system() == 'Windows'")
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_stop",
+                              "job: '%s', section: 'if now > self.stop_datetime'", self.name)
+                    if IS_WINDOWS:
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "try_stop",
+                                  "job: '%s', section: 'if IS_WINDOWS", self.name)
                         subprocess.call(['taskkill', '/F', '/T', '/PID', str(self.job.pid)])
                     else:
-                        try_debug("job: '" + self.name + "', section: 'if platform.system() == 'Windows: else'")
-                        self.job.kill()
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "try_stop",
+                                  "job: '%s', section: 'if IS_WINDOWS: else'", self.name)
+                        stop_process(self.job, True)
                     self.job = None
-                    try_debug("job: '" + self.name + "', section: 'if now > self.stop_datetime': job: " + str(self.job))
-                    print(stop_msg(self.name, str(now)))
-
-                    stop_h_m = int_time(self.schedule["finish"]["time"])
-                    try_debug("job: '" + self.name + "', section: 'if now > self.stop_datetime'"
-                                                     ": stop_h_m: " + str(stop_h_m))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_stop",
+                              "job: '%s', section: 'if now > self.stop_datetime': job: %s", self.name, self.job)
+                    stop_msg(self.name, str(now))
+
+                    stop_h_m = self.schedule.finish.h_m
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_stop",
+                              "job: '%s', section: 'if now > self.stop_datetime': stop_h_m: %s", self.name, stop_h_m)
                     stop_day = 0
-                    if "day" in self.schedule["finish"]:
-                        try_debug("job: '" + self.name + "', section: 'if 'day' in self.schedule['finish']'")
-                        if isinstance(self.schedule["finish"]["day"], str):
-                            stop_day = DOW[self.schedule["finish"]["day"]]
-                            try_debug("job: '" + self.name +
-                                      "', section: 'if isinstance(self.schedule['finish']['day'], str)'"
-                                      ": stop_day: " + str(stop_day))
+                    if self.schedule.finish.has_day:
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "try_stop",
+                                  "job: '%s', section: 'if self.schedule.finish.has_day'", self.name)
+                        if self.schedule.finish.dow is not None:
+                            stop_day = self.schedule.finish.dow
+                            if TRACE:
+                                trace(TRACE_DEBUG, self.name, "try_stop",
+                                      "job: '%s', section: 'if self.schedule.finish.dow is not None': "
+                                      "stop_day: %s", self.name, stop_day)
                             self.stop_datetime = next_weekday(
                                 datetime.datetime.combine(
                                     start_dt,
-                                    datetime.time(stop_h_m[0], stop_h_m[1], 0)),
+                                    self.schedule.finish.time),
                                 stop_day)
-                            try_debug("job: '" + self.name +
-                                      "', section: 'if isinstance(self.schedule['finish']['day'], str)'"
-                                      ": stop_datetime: " + str(self.stop_datetime))
+                            if TRACE:
+                                trace(TRACE_DEBUG, self.name, "try_stop",
+                                      "job: '%s', section: 'if self.schedule.finish.dow is not None': "
+                                      "stop_datetime: %s", self.name, self.stop_datetime)
                             return True
                         else:
-                            stop_day += self.schedule["finish"]["day"]
-                            try_debug("job: '" + self.name +
-                                      "', section: 'if isinstance(self.schedule['finish']['day'], str): else'"
-                                      ": stop_day: " + str(stop_day))
+                            stop_day += self.schedule.finish.day
+                            if TRACE:
+                                trace(TRACE_DEBUG, self.name, "try_stop",
+                                      "job: '%s', section: 'if self.schedule.finish.dow is not None: "
+                                      "else': stop_day: %s", self.name, stop_day)
                     else:
                         temp_stop_day_time = datetime.datetime(
                             year=self.start_datetime.year,
@@ -635,29 +1038,59 @@ class Job:
 
                     self.stop_datetime = datetime.datetime.combine(
                         start_dt + timedelta(days=stop_day),
-                        datetime.time(stop_h_m[0], stop_h_m[1], 0))
-                    try_debug("job: '" + self.name + "', section: 'if 'day' in self.schedule['finish']'"
-                                                     ": stop_datetime: " + str(self.stop_datetime))
-                    try_debug("job: '" + self.name + "', section: 'def try_stop(self)", DEBUG_SECTION_END)
+                        self.schedule.finish.time)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_stop",
+                              "job: '%s', section: 'if self.schedule.finish.has_day': stop_datetime: %s",
+                              self.name, self.stop_datetime)
+                        trace(TRACE_END, self.name, "try_stop", "job: '%s', section: 'def try_stop(self)", self.name)
                     return True
                 else:
-                    try_debug("job: '" + self.name + "', section: 'if now > self.stop_datetime: else': return False")
-                    try_debug("job: '" + self.name + "', section: 'def try_stop(self)", DEBUG_SECTION_END)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_stop",
+                              "job: '%s', section: 'if now > self.stop_datetime: else': return False", self.name)
+                        trace(TRACE_END, self.name, "try_stop", "job: '%s', section: 'def try_stop(self)", self.name)
                     return False
 
     def stop_immediately(self):
-        try_debug("job: '" + self.name + "', section: 'def stop_immediately(self)", DEBUG_SECTION_BEGIN)
+        if TRACE:
+            trace(TRACE_BEGIN, self.name, "stop_immediately",
+                  "job: '%s', section: 'def stop_immediately(self)", self.name)
         if self.job is not None:
-            if platform.system() == 'Windows':
+            if IS_WINDOWS:
                 subprocess.call(['taskkill', '/F', '/T', '/PID', str(self.job.pid)])
             else:
-                self.job.kill()
-            print(stop_msg(self.name, str(datetime.datetime.now())))
-        try_debug("job: '" + self.name + "', section: 'def stop_immediately(self)", DEBUG_SECTION_END)
+                stop_process(self.job, True)
+            stop_msg(self.name, str(datetime.datetime.now()))
+        if TRACE:
+            trace(TRACE_END, self.name, "stop_immediately",
+                  "job: '%s', section: 'def stop_immediately(self)", self.name)
+
+    def on_exit(self, proc, end_datetime):  # called by ChildSupervisor after the process is reaped
+        self.exit_code = proc.returncode
+        self.end_datetime = end_datetime
+        if TRACE:
+            trace(TRACE_DEBUG, self.name, "on_exit",
+                  "job: '%s', pid: %s, exit_code: %s, end_datetime: %s",
+                  self.name, proc.pid, self.exit_code, self.end_datetime)
+        return self.job is proc  # False - the job has already noticed the exit itself
+
+    def tick(self):
+        if self.try_start():
+            self.try_stop()
+        elif self.job is None and self.stop_datetime is not None and self.stop_datetime < datetime.datetime.now():
+            catch_up(self)  # the run window has passed, it is missed if psd was stalled
+
+    def next_wakeup(self, now):  # None - nothing to wait for
+        if self.job is None:
+            if self.start_datetime is None:  # 'now' job
+                return now
+            return self.start_datetime
+        return self.stop_datetime
 
 
 class JobRep:
-    def __init__(self, name, cmd, schedule, when_finished, is_sh, repeat):
+    def __init__(self, name, cmd, schedule, when_finished, is_sh, repeat, now=None):
         self.name = name
         self.cmd = cmd.split(" ")
         self.schedule = schedule
@@ -668,52 +1101,80 @@ class JobRep:
         self.start_datetime = None
         self.stop_datetime = None
         self.dt_month = None
+        self.exit_code = None  # of the last finished run
+        self.end_datetime = None
+        self.max_instances = None  # running processes of the job, None - no limit
+        self.pool = None  # name of concurrency pool
+        self.capture = False  # write output of every run to files
+        self.captured = None  # RunCapture of the last run
+        self.last_start = None  # start of the last run
+        self.program = None  # program of exec mode "auto", None - cmd is run as in "legacy"
+        self.zygote = None  # Zygote which forks runs of the job, None - runs are started as processes
+        self.zygote_argv = None  # script or '-m' module and its arguments
+        self.call = None  # 'module:function' run by CALL_POOL instead of cmd
+        self.call_args = ()
+        self.catch_up = CATCH_UP_POLICY  # policy for runs missed while psd was stopped or stalled
+        self.catch_up_max = CATCH_UP_MAX
         self.next_repeat = None
         self.is_start = False
         self.is_stop = False
-        self.init_start_dt()
-        self.init_stop_dt()
-
-        try_debug("jobRep: name:" + self.name)
-        try_debug("jobRep: cmd:" + str(self.cmd))
-        try_debug("jobRep: schedule:" + str(self.schedule))
-        try_debug("jobRep: is_shell:" + str(self.is_shell))
-        try_debug("jobRep: when_finished:" + str(self.when_finished))
-        try_debug("jobRep: start_datetime:" + str(self.start_datetime))
-        try_debug("jobRep: stop_datetime:" + str(self.stop_datetime))
-        try_debug("jobRep: dt_month:" + str(self.dt_month))
-
-    def init_start_dt(self):
-        try_debug("jobRep: '" + self.name + "', section: 'def init_start_dt(self)", DEBUG_SECTION_BEGIN)
+        self.init_start_dt(now)
+        self.init_stop_dt(now)
+
+        if TRACE:
+            trace(TRACE_DEBUG, self.name, "__init__", "jobRep: name:%s", self.name)
+            trace(TRACE_DEBUG, self.name, "__init__", "jobRep: cmd:%s", self.cmd)
+            trace(TRACE_DEBUG, self.name, "__init__", "jobRep: schedule:%s", self.schedule)
+            trace(TRACE_DEBUG, self.name, "__init__", "jobRep: is_shell:%s", self.is_shell)
+            trace(TRACE_DEBUG, self.name, "__init__", "jobRep: when_finished:%s", self.when_finished)
+            trace(TRACE_DEBUG, self.name, "__init__", "jobRep: start_datetime:%s", self.start_datetime)
+            trace(TRACE_DEBUG, self.name, "__init__", "jobRep: stop_datetime:%s", self.stop_datetime)
+            trace(TRACE_DEBUG, self.name, "__init__", "jobRep: dt_month:%s", self.dt_month)
+
+    def init_start_dt(self, now=None):  # now - the same instant for a batch of jobs
+        if TRACE:
+            trace(TRACE_BEGIN, self.name, "init_start_dt", "jobRep: '%s', section: 'def init_start_dt(self)", self.name)
         if self.start_datetime is None:
-            if "month" in self.schedule["start"]:
-                start_h_m = int_time(self.schedule["start"]["month"]["time"])
-                try_debug("jobRep: '" + self.name + "', section: 'if 'month' in self.schedule['start']'"
-                                                    ": start_h_m: " + str(start_h_m))
+            if self.schedule.start.is_month:
+                start_h_m = self.schedule.start.h_m
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_start_dt",
+                          "jobRep: '%s', section: 'if self.schedule.start.is_month': start_h_m: %s",
+                          self.name, start_h_m)
             else:
-                if self.schedule["start"]["time"] == "now":
+                if self.schedule.start.is_now:
                     start_h_m = [0, 0]
-                    try_debug("jobRep: '" + self.name + "', section: 'if self.schedule['start']['time'] == 'now''"
-                                                        ": start_h_m: " + str(start_h_m))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "jobRep: '%s', section: 'if self.schedule.start.is_now': start_h_m: %s",
+                              self.name, start_h_m)
                 else:
-                    start_h_m = int_time(self.schedule["start"]["time"])
-                try_debug("jobRep: '" + self.name + "', section: 'if self.schedule['start']['time'] == 'now': else'"
-                                                    ": start_h_m: " + str(start_h_m))
-            if "month" in self.schedule["finish"]:
-                stop_h_m = int_time(self.schedule["finish"]["month"]["time"])
-                try_debug("jobRep: '" + self.name + "', section: 'if 'month' in self.schedule['finish']'"
-                                                    ": start_h_m: " + str(stop_h_m))
+                    start_h_m = self.schedule.start.h_m
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_start_dt",
+                          "jobRep: '%s', section: 'if self.schedule.start.is_now: else': start_h_m: %s",
+                          self.name, start_h_m)
+            if self.schedule.finish.is_month:
+                stop_h_m = self.schedule.finish.h_m
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_start_dt",
+                          "jobRep: '%s', section: 'if self.schedule.finish.is_month': start_h_m: %s",
+                          self.name, stop_h_m)
             else:
-                if self.schedule["finish"]["time"] == "never":
+                if self.schedule.finish.is_never:
                     stop_h_m = [0, 0]
-                    try_debug("jobRep: '" + self.name + "', section: 'if self.schedule['finish']['time'] == 'never''"
-                                                        ": start_h_m: " + str(stop_h_m))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "jobRep: '%s', section: 'if self.schedule.finish.is_never': start_h_m: %s",
+                              self.name, stop_h_m)
                 else:
-                    stop_h_m = int_time(self.schedule["finish"]["time"])
-                    try_debug("jobRep: '" + self.name + "', section: 'if self.schedule['finish']['time'] == 'never'"
-                                                        ": else': start_h_m: " + str(stop_h_m))
+                    stop_h_m = self.schedule.finish.h_m
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "jobRep: '%s', section: 'if self.schedule.finish.is_never: else': "
+                              "start_h_m: %s", self.name, stop_h_m)
 
-            dt_start = datetime.datetime.today()
+            dt_start = now if now is not None else datetime.datetime.today()
             dt_actual_start = datetime.datetime(year=dt_start.year,
                                                 month=dt_start.month,
                                                 day=dt_start.day,
@@ -724,95 +1185,113 @@ class JobRep:
                                                  day=dt_start.day,
                                                  hour=stop_h_m[0],
                                                  minute=stop_h_m[1])
-            try_debug("jobRep: '" + self.name + "', section: 'if self.start_datetime is None': "
-                                                "dt_start: " + str(dt_start))
-            try_debug("jobRep: '" + self.name + "', section: 'if self.start_datetime is None': "
-                                                "dt_actual_start: " + str(dt_actual_start))
-            try_debug("jobRep: '" + self.name + "', section: 'if self.start_datetime is None': "
-                                                "dt_actual_finish: " + str(dt_actual_finish))
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "init_start_dt",
+                      "jobRep: '%s', section: 'if self.start_datetime is None': dt_start: %s", self.name, dt_start)
+                trace(TRACE_DEBUG, self.name, "init_start_dt",
+                      "jobRep: '%s', section: 'if self.start_datetime is None': dt_actual_start: %s",
+                      self.name, dt_actual_start)
+                trace(TRACE_DEBUG, self.name, "init_start_dt",
+                      "jobRep: '%s', section: 'if self.start_datetime is None': dt_actual_finish: %s",
+                      self.name, dt_actual_finish)
 
             if dt_actual_start > dt_actual_finish:
                 dt_actual_finish += timedelta(days=1)
-                try_debug("jobRep: '" + self.name + "', section: 'if dt_actual_start > dt_actual_finish'"
-                                                    ": dt_actual_finish: " + str(dt_actual_finish))
-                try_debug("jobRep: '" + self.name + str(dt_actual_start) + ">" + str(dt_actual_finish))
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_start_dt",
+                          "jobRep: '%s', section: 'if dt_actual_start > dt_actual_finish': dt_actual_finish: %s",
+                          self.name, dt_actual_finish)
+                    trace(TRACE_DEBUG, self.name, "init_start_dt",
+                          "jobRep: '%s%s>%s", self.name, dt_actual_start, dt_actual_finish)
             if not(dt_actual_start < dt_start < dt_actual_finish):
                 if not(dt_start < dt_actual_start and dt_start < dt_actual_finish):
                     dt_start += timedelta(days=1)
-                    try_debug("jobRep: '" + self.name +
-                              "', section: 'if not(dt_start < dt_actual_start and dt_start < dt_actual_finish)'"
-                              ": dt_start: " + str(dt_start))
-
-            if "month" in self.schedule["start"]:
-                start_h_m = int_time(self.schedule["start"]["month"]["time"])
-                try_debug("jobRep: '" + self.name + "', section: 'if 'month' in self.schedule['start']'"
-                                                    ": start_h_m: " + str(start_h_m))
-                if isinstance(self.schedule["start"]["month"]["values"], list):
-                    self.dt_month = DateTimeMonthsJob(dt_start,
-                                                      self.schedule["start"]["month"]["values"])
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "jobRep: '%s', section: 'if not(dt_start < dt_actual_start and dt_start < "
+                              "dt_actual_finish)': dt_start: %s", self.name, dt_start)
+
+            if self.schedule.start.is_month:
+                start_h_m = self.schedule.start.h_m
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_start_dt",
+                          "jobRep: '%s', section: 'if self.schedule.start.is_month': start_h_m: %s",
+                          self.name, start_h_m)
+                if self.schedule.start.months is not None:
+                    self.dt_month = DateTimeMonthsJob(dt_start, self.schedule.start.months, now)
                     start_date = self.dt_month.next_date_time()
-                    try_debug("jobRep: '" + self.name +
-                              "', section: 'if isinstance(self.schedule['start']['month']['values'], list)'"
-                              ": dt_month: " + str(self.dt_month) + ", start_date: " + str(start_date))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "jobRep: '%s', section: 'if self.schedule.start.months is not None"
+                              "': dt_month: %s, start_date: %s", self.name, self.dt_month, start_date)
                 else:
-                    start_date = add_months(dt_start, self.schedule["start"]["month"]["values"])
-                    try_debug("jobRep: '" + self.name +
-                              "', section: 'if isinstance(self.schedule['start']['month']['values'], list): else'"
-                              ": start_date: " + str(start_date))
-                if isinstance(self.schedule["start"]["month"]["day"], str):
-                    for i in range(self.schedule["start"]["month"]["each"]):
-                        start_date = next_weekday(start_date, DOW[self.schedule["start"]["month"]["day"]])
-                    try_debug("jobRep: '" + self.name +
-                              "', section: 'if isinstance(self.schedule['start']['month']['day'], str)'"
-                              ": start_date: " + str(start_date))
-                else:
-                    start_date = datetime.date(year=start_date.year,
-                                               month=start_date.month,
-                                               day=self.schedule["start"]["month"]["day"])
-                    try_debug("jobRep: '" + self.name +
-                              "', section: 'if isinstance(self.schedule['start']['month']['day'], str): else'"
-                              ": start_date: " + str(start_date))
+                    start_date = add_months(dt_start, self.schedule.start.month_step)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "jobRep: '%s', section: 'if self.schedule.start.months is not None"
+                              ": else': start_date: %s", self.name, start_date)
+                start_date = self.schedule.start.month_date(start_date)
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_start_dt",
+                          "jobRep: '%s', section: 'self.schedule.start.month_date': start_date: %s",
+                          self.name, start_date)
             else:
-                if self.schedule["start"]["time"] == "now":
-                    try_debug("jobRep: '" + self.name + "', section: 'if self.schedule['start']['time'] == 'now''"
-                                                        ": return None")
+                if self.schedule.start.is_now:
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "jobRep: '%s', section: 'if self.schedule.start.is_now': return None",
+                              self.name)
                     return None
-                if isinstance(self.schedule["start"]["day"], str):
-                    start_date = next_weekday(dt_start, DOW[self.schedule["start"]["day"]])
-                    try_debug("jobRep: '" + self.name +
-                              "', section: 'if isinstance(self.schedule['start']['day'], str)'"
-                              ": start_date: " + str(start_date))
+                if self.schedule.start.dow is not None:
+                    start_date = next_weekday(dt_start, self.schedule.start.dow)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "jobRep: '%s', section: 'if self.schedule.start.dow is not None': "
+                              "start_date: %s", self.name, start_date)
                 else:
                     start_date = dt_start
-                    try_debug("jobRep: '" + self.name + "', section: 'if isinstance(self.schedule['start']['day'], str)"
-                                                        ": else': start_date: " + str(start_date))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_start_dt",
+                              "jobRep: '%s', section: 'if self.schedule.start.dow is not None: else': "
+                              "start_date: %s", self.name, start_date)
             self.start_datetime = datetime.datetime.combine(
                 start_date,
-                datetime.time(start_h_m[0], start_h_m[1], 0))
-            try_debug("jobRep: '" + self.name + "', section: 'if self.start_datetime is None'"
-                                                ": start_datetime: " + str(self.start_datetime))
-        try_debug("jobRep: '" + self.name + "', section: 'def init_start_dt(self)", DEBUG_SECTION_END)
-
-    def init_stop_dt(self):
-        try_debug("jobRep: '" + self.name + "', section: 'def init_stop_dt(self)", DEBUG_SECTION_BEGIN)
+                self.schedule.start.time)
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "init_start_dt",
+                      "jobRep: '%s', section: 'if self.start_datetime is None': start_datetime: %s",
+                      self.name, self.start_datetime)
+        if TRACE:
+            trace(TRACE_END, self.name, "init_start_dt", "jobRep: '%s', section: 'def init_start_dt(self)", self.name)
+
+    def init_stop_dt(self, now=None):
+        if TRACE:
+            trace(TRACE_BEGIN, self.name, "init_stop_dt", "jobRep: '%s', section: 'def init_stop_dt(self)", self.name)
         if self.start_datetime is None:
-            dt_start = datetime.date.today()
-            try_debug("jobRep: '" + self.name + "', section: 'if self.start_datetime is None'"
-                                                ": dt_start: " + str(dt_start))
+            dt_start = now.date() if now is not None else datetime.date.today()
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                      "jobRep: '%s', section: 'if self.start_datetime is None': dt_start: %s", self.name, dt_start)
         else:
-            if "month" in self.schedule["finish"]:
-                stop_h_m = int_time(self.schedule["finish"]["month"]["time"])
-                try_debug("jobRep: '" + self.name + "', section: 'if 'month' in self.schedule['finish']'"
-                                                    ": stop_h_m: " + str(stop_h_m))
+            if self.schedule.finish.is_month:
+                stop_h_m = self.schedule.finish.h_m
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                          "jobRep: '%s', section: 'if self.schedule.finish.is_month': stop_h_m: %s",
+                          self.name, stop_h_m)
             else:
-                if self.schedule["finish"]["time"] == "never":
+                if self.schedule.finish.is_never:
                     stop_h_m = [0, 0]
-                    try_debug("jobRep: '" + self.name + "', section: 'if self.schedule['finish']['time'] == 'never''"
-                                                        ": stop_h_m: " + str(stop_h_m))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                              "jobRep: '%s', section: 'if self.schedule.finish.is_never': stop_h_m: %s",
+                              self.name, stop_h_m)
                 else:
-                    stop_h_m = int_time(self.schedule["finish"]["time"])
-                    try_debug("jobRep: '" + self.name + "', section: 'if self.schedule['finish']['time'] == 'never'"
-                                                        ": else': stop_h_m: " + str(stop_h_m))
+                    stop_h_m = self.schedule.finish.h_m
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                              "jobRep: '%s', section: 'if self.schedule.finish.is_never: else': "
+                              "stop_h_m: %s", self.name, stop_h_m)
 
             dt_start = self.start_datetime
             dt_actual_finish = datetime.datetime(year=dt_start.year,
@@ -823,369 +1302,424 @@ class JobRep:
 
             if dt_start > dt_actual_finish:
                 dt_start += timedelta(days=1)
-                try_debug("jobRep: '" + self.name +
-                          "', section: 'dt_start > dt_actual_finish': dt_start: " + str(dt_start))
-                try_debug("jobRep: '" + self.name + "', section: '" + str(dt_start) + ">" + str(dt_actual_finish) +
-                          ": dt_start: " + str(dt_start))
-
-            try_debug("jobRep: '" + self.name + "', section: 'if self.start_datetime is None: else': dt_start: " +
-                      str(dt_start) + ", dt_actual_finish: " + str(dt_actual_finish))
-
-        if "month" in self.schedule["finish"]:
-            if isinstance(self.schedule["finish"]["month"]["values"], str):
-                stop_date = add_months(dt_start, self.schedule["finish"]["month"]["values"])
-                try_debug("jobRep: '" + self.name +
-                          "', section: 'if isinstance(self.schedule['finish']['month']['values'], str)': "
-                          "stop_date: " + str(stop_date))
-            else:
-                stop_date = add_months(dt_start, self.schedule["finish"]["month"]["values"])
-                try_debug("jobRep: '" + self.name +
-                          "', section: 'if isinstance(self.schedule['finish']['month']['values'], str): else': "
-                          "stop_date: " + str(stop_date))
-            if isinstance(self.schedule["finish"]["month"]["day"], str):
-                for i in range(self.schedule["finish"]["month"]["each"]):
-                    stop_date = next_weekday(stop_date, DOW[self.schedule["finish"]["month"]["day"]])
-                try_debug("jobRep: '" + self.name +
-                          "', section: 'if isinstance(self.schedule['finish']['month']['day'], str)'"
-                          ": stop_date: " + str(stop_date))
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                          "jobRep: '%s', section: 'dt_start > dt_actual_finish': dt_start: %s", self.name, dt_start)
+                    trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                          "jobRep: '%s', section: '%s>%s: dt_start: %s",
+                          self.name, dt_start, dt_actual_finish, dt_start)
+
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                      "jobRep: '%s', section: 'if self.start_datetime is None: else': dt_start: %s, "
+                      "dt_actual_finish: %s", self.name, dt_start, dt_actual_finish)
+
+        if self.schedule.finish.is_month:
+            if self.schedule.finish.month is not None:
+                stop_date = next_month(dt_start, self.schedule.finish.month)
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                          "jobRep: '%s', section: 'if self.schedule.finish.month is not None': "
+                          "stop_date: %s", self.name, stop_date)
             else:
-                stop_date = datetime.date(year=stop_date.year,
-                                          month=stop_date.month,
-                                          day=self.schedule["finish"]["month"]["day"])
-                try_debug("jobRep: '" + self.name +
-                          "', section: 'if isinstance(self.schedule['finish']['month']['day'], str): else'"
-                          ": stop_date: " + str(stop_date))
-            stop_h_m = int_time(self.schedule["finish"]["month"]["time"])
+                stop_date = add_months(dt_start, self.schedule.finish.month_step)
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                          "jobRep: '%s', section: 'if self.schedule.finish.month is not None: "
+                          "else': stop_date: %s", self.name, stop_date)
+            stop_date = self.schedule.finish.month_date(stop_date)
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                      "jobRep: '%s', section: 'self.schedule.finish.month_date': stop_date: %s",
+                      self.name, stop_date)
+            stop_h_m = self.schedule.finish.h_m
 
             self.stop_datetime = datetime.datetime.combine(
                 stop_date,
-                datetime.time(stop_h_m[0], stop_h_m[1], 0))
+                self.schedule.finish.time)
 
-            try_debug("jobRep: '" + self.name +
-                      "', section: 'if 'month' in self.schedule['finish']': stop_date: " + str(stop_h_m) +
-                      ", stop_datetime: " + str(self.stop_datetime))
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                      "jobRep: '%s', section: 'if self.schedule.finish.is_month': stop_date: %s, "
+                      "stop_datetime: %s", self.name, stop_h_m, self.stop_datetime)
         else:
-            if self.schedule["finish"]["time"] == "never":
-                try_debug("jobRep: '" + self.name + "', section: 'if self.schedule['finish']['time'] == 'never'"
-                                                    ": return None")
-                try_debug("jobRep: '" + self.name + "', section: 'def init_stop_dt(self)", DEBUG_SECTION_END)
+            if self.schedule.finish.is_never:
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                          "jobRep: '%s', section: 'if self.schedule.finish.is_never: return None",
+                          self.name)
+                    trace(TRACE_END, self.name, "init_stop_dt",
+                          "jobRep: '%s', section: 'def init_stop_dt(self)", self.name)
                 return None
 
             if self.stop_datetime is None:
-                stop_h_m = int_time(self.schedule["finish"]["time"])
+                stop_h_m = self.schedule.finish.h_m
                 stop_day = 0
-                try_debug("jobRep: '" + self.name +
-                          "', section: 'if self.schedule['finish']['time'] == 'never': stop_h_m: " + str(stop_h_m))
-                if "day" in self.schedule["finish"]:
-                    if isinstance(self.schedule["finish"]["day"], str):
-                        stop_day = DOW[self.schedule["finish"]["day"]]
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                          "jobRep: '%s', section: 'if self.schedule.finish.is_never: stop_h_m: %s",
+                          self.name, stop_h_m)
+                if self.schedule.finish.has_day:
+                    if self.schedule.finish.dow is not None:
+                        stop_day = self.schedule.finish.dow
                         self.stop_datetime = next_weekday(
                             datetime.datetime.combine(
                                 dt_start,
-                                datetime.time(stop_h_m[0], stop_h_m[1], 0)),
+                                self.schedule.finish.time),
                             stop_day)
-                        try_debug("jobRep: '" + self.name +
-                                  "', section: 'if isinstance(self.schedule['finish']['day'], str)': stop_day: " +
-                                  str(stop_day) + ", stop_datetime: " + str(self.stop_datetime))
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                                  "jobRep: '%s', section: 'if self.schedule.finish.dow is not None': "
+                                  "stop_day: %s, stop_datetime: %s", self.name, stop_day, self.stop_datetime)
                     else:
-                        stop_day = self.schedule["finish"]["day"]
+                        stop_day = self.schedule.finish.day
                         self.stop_datetime = datetime.datetime.combine(
                             dt_start + timedelta(days=stop_day),
-                            datetime.time(stop_h_m[0], stop_h_m[1], 0))
-                        try_debug("jobRep: '" + self.name +
-                                  "', section: 'if isinstance(self.schedule['finish']['day'], str): else': stop_day: " +
-                                  str(stop_day) + ", stop_datetime: " + str(self.stop_datetime))
+                            self.schedule.finish.time)
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                                  "jobRep: '%s', section: 'if self.schedule.finish.dow is not None: "
+                                  "else': stop_day: %s, stop_datetime: %s", self.name, stop_day, self.stop_datetime)
                 else:
                     self.stop_datetime = datetime.datetime.combine(
                         dt_start + timedelta(days=stop_day),
-                        datetime.time(stop_h_m[0], stop_h_m[1], 0))
-                    try_debug("jobRep: '" + self.name +
-                              "', section: 'if 'day' in self.schedule['finish']: else': stop_datetime: " +
-                              str(self.stop_datetime))
-        try_debug("jobRep: '" + self.name + "', section: 'def init_stop_dt(self)", DEBUG_SECTION_END)
+                        self.schedule.finish.time)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "init_stop_dt",
+                              "jobRep: '%s', section: 'if self.schedule.finish.has_day: else': stop_datetime: %s",
+                              self.name, self.stop_datetime)
+        if TRACE:
+            trace(TRACE_END, self.name, "init_stop_dt", "jobRep: '%s', section: 'def init_stop_dt(self)", self.name)
 
     def try_start(self):  # True - job is running, False - job is not running
-        try_debug("jobRep: '" + self.name + "', section: 'def try_start(self)", DEBUG_SECTION_BEGIN)
+        if TRACE:
+            trace(TRACE_BEGIN, self.name, "try_start", "jobRep: '%s', section: 'def try_start(self)", self.name)
         if self.is_stop:
-            try_debug("jobRep: '" + self.name + "', section: 'if self.is_stop: return False")
-            try_debug("jobRep: '" + self.name + "', section: 'def try_start(self)", DEBUG_SECTION_END)
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "try_start",
+                      "jobRep: '%s', section: 'if self.is_stop: return False", self.name)
+                trace(TRACE_END, self.name, "try_start", "jobRep: '%s', section: 'def try_start(self)", self.name)
             return False
         if self.is_start:
-            try_debug("jobRep: '" + self.name + "', section: 'if self.is_start: return True")
-            try_debug("jobRep: '" + self.name + "', section: 'def try_start(self)", DEBUG_SECTION_END)
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "try_start",
+                      "jobRep: '%s', section: 'if self.is_start: return True", self.name)
+                trace(TRACE_END, self.name, "try_start", "jobRep: '%s', section: 'def try_start(self)", self.name)
             return True
-        elif "month" in self.schedule["start"]:
+        elif self.schedule.start.is_month:
             if self.job is None:
                 now = datetime.datetime.now()
-                try_debug("jobRep: '" + self.name + "', section: 'if self.job is None': now: " + str(now))
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_start",
+                          "jobRep: '%s', section: 'if self.job is None': now: %s", self.name, now)
                 if self.start_datetime <= now <= self.stop_datetime:
-                    self.job = subprocess.Popen(self.cmd, shell=self.is_shell)
+                    self.job = spawn(self)
                     self.is_start = True
                     self.next_repeat = calc_repeat(now, self.repeat)
-                    try_debug("jobRep: '" + self.name +
-                              "', section: 'if self.start_datetime <= now <= self.stop_datetime': job: " +
-                              str(self.job) + ", is_start: " + str(self.is_start) + ", next_repeat: " +
-                              str(self.next_repeat))
-                    try_debug("jobRep: '" + self.name + "', " + str(self.start_datetime) + "<=" + str(now) + "<=" +
-                              str(self.stop_datetime))
-                    if isinstance(self.schedule["start"]["month"]["values"], list):
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_start",
+                              "jobRep: '%s', section: 'if self.start_datetime <= now <= self.stop_datetime': job: "
+                              "%s, is_start: %s, next_repeat: %s", self.name, self.job, self.is_start, self.next_repeat)
+                        trace(TRACE_DEBUG, self.name, "try_start",
+                              "jobRep: '%s', %s<=%s<=%s", self.name, self.start_datetime, now, self.stop_datetime)
+                    if self.schedule.start.months is not None:
                         start_date = self.dt_month.next_date_time()
-                        try_debug("jobRep: '" + self.name +
-                                  "', section: 'if isinstance(self.schedule['start']['month']['values'], list)'"
-                                  ": start_date: " + str(start_date))
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "try_start",
+                                  "jobRep: '%s', section: 'if self.schedule.start.months is not None"
+                                  "': start_date: %s", self.name, start_date)
                     else:
-                        start_date = add_months(self.start_datetime, self.schedule["start"]["month"]["values"])
-                        try_debug("jobRep: '" + self.name +
-                                  "', section: 'if isinstance(self.schedule['start']['month']['values'], list): else'"
-                                  ": start_date: " + str(start_date))
-                    if isinstance(self.schedule["start"]["month"]["day"], str):
-                        for i in range(self.schedule["start"]["month"]["each"]):
-                            start_date = next_weekday(start_date, DOW[self.schedule["start"]["month"]["day"]])
-                        try_debug("jobRep: '" + self.name +
-                                  "', section: 'if isinstance(self.schedule['start']['month']['day'], str)'"
-                                  ": start_date: " + str(start_date))
-                    else:
-                        start_date = datetime.date(year=start_date.year,
-                                                   month=start_date.month,
-                                                   day=self.schedule["start"]["month"]["day"])
-                        try_debug("jobRep: '" + self.name +
-                                  "', section: 'if isinstance(self.schedule['start']['month']['day'], str): else'"
-                                  ": start_date: " + str(start_date))
-                    start_h_m = int_time(self.schedule["start"]["month"]["time"])
+                        start_date = add_months(self.start_datetime, self.schedule.start.month_step)
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "try_start",
+                                  "jobRep: '%s', section: 'if self.schedule.start.months is not None"
+                                  ": else': start_date: %s", self.name, start_date)
+                    start_date = self.schedule.start.month_date(start_date)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_start",
+                              "jobRep: '%s', section: 'self.schedule.start.month_date': start_date: %s",
+                              self.name, start_date)
+                    start_h_m = self.schedule.start.h_m
 
                     self.start_datetime = datetime.datetime.combine(
                         start_date,
-                        datetime.time(start_h_m[0], start_h_m[1], 0))
+                        self.schedule.start.time)
 
-                    try_debug("jobRep: '" + self.name +
-                              "', section: 'if self.start_datetime <= now <= self.stop_datetime:'"
-                              ": start_h_m: " + str(start_h_m) + ", start_datetime: " + str(self.start_datetime))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_start",
+                              "jobRep: '%s', section: 'if self.start_datetime <= now <= self.stop_datetime:': "
+                              "start_h_m: %s, start_datetime: %s", self.name, start_h_m, self.start_datetime)
 
                     if self.when_finished:
                         if self.start_datetime < self.stop_datetime:
                             temp_start_date = datetime.date(year=self.stop_datetime.year,
                                                             month=self.stop_datetime.month,
                                                             day=self.stop_datetime.day)
-                            try_debug("jobRep: '" + self.name +
-                                      "', section: 'if self.start_datetime < self.stop_datetime'"
-                                      ": temp_start_date: " + str(temp_start_date))
-                            if isinstance(self.schedule["start"]["day"], str):
-                                temp_start_date += next_weekday(temp_start_date,
-                                                                DOW[self.schedule["start"]["day"]])
-                                try_debug("jobRep: '" + self.name +
-                                          "', section: 'if isinstance(self.schedule['start']['day'], str)'"
-                                          ": temp_start_date: " + str(temp_start_date))
+                            if TRACE:
+                                trace(TRACE_DEBUG, self.name, "try_start",
+                                      "jobRep: '%s', section: 'if self.start_datetime < self.stop_datetime': "
+                                      "temp_start_date: %s", self.name, temp_start_date)
+                            if self.schedule.start.dow is not None:
+                                temp_start_date = next_weekday(temp_start_date, self.schedule.start.dow)
+                                if TRACE:
+                                    trace(TRACE_DEBUG, self.name, "try_start",
+                                          "jobRep: '%s', section: 'if self.schedule.start.dow is not None"
+                                          "': temp_start_date: %s", self.name, temp_start_date)
                             else:
-                                temp_start_date += timedelta(days=self.schedule["start"]["day"])
-                                try_debug("jobRep: '" + self.name +
-                                          "', section: 'if isinstance(self.schedule['start']['day'], str): else'"
-                                          ": temp_start_date: " + str(temp_start_date))
+                                temp_start_date += timedelta(days=self.schedule.start.day)
+                                if TRACE:
+                                    trace(TRACE_DEBUG, self.name, "try_start",
+                                          "jobRep: '%s', section: 'if self.schedule.start.dow is not None"
+                                          ": else': temp_start_date: %s", self.name, temp_start_date)
                             self.start_datetime = datetime.datetime(year=temp_start_date.year,
                                                                     month=temp_start_date.month,
                                                                     day=temp_start_date.day,
                                                                     hour=self.start_datetime.hour,
                                                                     minute=self.start_datetime.minute,
                                                                     second=self.start_datetime.second)
-                            try_debug("jobRep: '" + self.name +
-                                      "', section: 'if self.start_datetime < self.stop_datetime'"
-                                      ": start_datetime: " + str(self.start_datetime))
-                    print(start_msg_full(self.name, str(now), self.stop_datetime, self.start_datetime))
-                    try_debug("jobRep: '" + self.name + "', section: 'def try_start(self)", DEBUG_SECTION_END)
+                            if TRACE:
+                                trace(TRACE_DEBUG, self.name, "try_start",
+                                      "jobRep: '%s', section: 'if self.start_datetime < self.stop_datetime': "
+                                      "start_datetime: %s", self.name, self.start_datetime)
+                    start_msg_full(self.name, str(now), self.stop_datetime, self.start_datetime)
+                    if TRACE:
+                        trace(TRACE_END, self.name, "try_start",
+                              "jobRep: '%s', section: 'def try_start(self)", self.name)
                     return True
                 else:
-                    try_debug("jobRep: '" + self.name +
-                              "', section: 'if self.start_datetime <= now <= self.stop_datetime': return False")
-                    try_debug(str(self.start_datetime) + "<=" + str(now) + "<=" + str(self.stop_datetime))
-                    try_debug("jobRep: '" + self.name + "', section: 'def try_start(self)", DEBUG_SECTION_END)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_start",
+                              "jobRep: '%s', section: 'if self.start_datetime <= now <= self.stop_datetime': return "
+                              "False", self.name)
+                        trace(TRACE_DEBUG, self.name, "try_start",
+                              "%s<=%s<=%s", self.start_datetime, now, self.stop_datetime)
+                        trace(TRACE_END, self.name, "try_start",
+                              "jobRep: '%s', section: 'def try_start(self)", self.name)
                     return False
             else:
-                try_debug("jobRep: '" + self.name + "', section: 'if self.job is None': return True")
-                try_debug("jobRep: '" + self.name + "', section: 'def try_start(self)", DEBUG_SECTION_END)
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_start",
+                          "jobRep: '%s', section: 'if self.job is None': return True", self.name)
+                    trace(TRACE_END, self.name, "try_start", "jobRep: '%s', section: 'def try_start(self)", self.name)
                 return True
         else:
-            if self.schedule["start"]["time"] == "now":
+            if self.schedule.start.is_now:
                 if self.job is None:
-                    self.job = subprocess.Popen(self.cmd, shell=self.is_shell)
-                    try_debug("jobRep: '" + self.name +
-                              "', section: 'if self.schedule['start']['time'] == 'now'': job: " + str(self.job))
-                    print(start_msg_short(self.name, datetime.datetime.now()))
-                try_debug("jobRep: '" + self.name + "', section: 'def try_start(self)", DEBUG_SECTION_END)
+                    self.job = spawn(self)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_start",
+                              "jobRep: '%s', section: 'if self.schedule.start.is_now': job: %s",
+                              self.name, self.job)
+                    start_msg_short(self.name, datetime.datetime.now())
+                if TRACE:
+                    trace(TRACE_END, self.name, "try_start", "jobRep: '%s', section: 'def try_start(self)", self.name)
                 return True
             else:
                 if self.job is None:
                     now = datetime.datetime.now()
-                    try_debug("jobRep: '" + self.name + "', section: 'if self.job is None': now: " + str(now))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_start",
+                              "jobRep: '%s', section: 'if self.job is None': now: %s", self.name, now)
                     if self.start_datetime <= now <= self.stop_datetime:
-                        self.job = subprocess.Popen(self.cmd, shell=self.is_shell)
+                        self.job = spawn(self)
                         self.is_start = True
                         self.next_repeat = calc_repeat(now, self.repeat)
-                        start_h_m = int_time(self.schedule["start"]["time"])
-                        start_day = self.schedule["start"]["day"]
+                        start_h_m = self.schedule.start.h_m
+                        start_day = self.schedule.start.day
                         start_date = datetime.datetime.now()
-                        try_debug("jobRep: '" + self.name +
-                                  "', section: 'if self.start_datetime <= now <= self.stop_datetime': job: " +
-                                  str(self.job) + ", self.is_start: " + str(self.is_start) +
-                                  ", self.next_repeat: " + str(self.next_repeat) + ", start_h_m: " + str(start_h_m) +
-                                  ", start_day" + str(start_day) + ", start_date: " + str(start_date))
-                        if "day" in self.schedule["finish"]:
-                            if isinstance(self.schedule["finish"]["day"], str):
-                                start_date = next_weekday(datetime.date.today(), DOW[self.schedule["finish"]["day"]])
-                                try_debug("jobRep: '" + self.name +
-                                          "', section: 'if isinstance(self.schedule['finish']['day'], str)'"
-                                          ": start_date: " + str(start_date))
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "try_start",
+                                  "jobRep: '%s', section: 'if self.start_datetime <= now <= self.stop_datetime': "
+                                  "job: %s, self.is_start: %s, self.next_repeat: %s, start_h_m: %s, start_day%s, "
+                                  "start_date: %s",
+                                  self.name, self.job, self.is_start, self.next_repeat, start_h_m, start_day,
+                                  start_date)
+                        if self.schedule.finish.has_day:
+                            if self.schedule.finish.dow is not None:
+                                start_date = next_weekday(datetime.date.today(), self.schedule.finish.dow)
+                                if TRACE:
+                                    trace(TRACE_DEBUG, self.name, "try_start",
+                                          "jobRep: '%s', section: 'if self.schedule.finish.dow is not None"
+                                          "': start_date: %s", self.name, start_date)
                             else:
-                                start_day += self.schedule["finish"]["day"]
-                                try_debug("jobRep: '" + self.name +
-                                          "', section: 'if isinstance(self.schedule['finish']['day'], str): else'"
-                                          ": start_day: " + str(start_day))
+                                start_day += self.schedule.finish.day
+                                if TRACE:
+                                    trace(TRACE_DEBUG, self.name, "try_start",
+                                          "jobRep: '%s', section: 'if self.schedule.finish.dow is not None"
+                                          ": else': start_day: %s", self.name, start_day)
                         self.start_datetime = datetime.datetime.combine(
                             start_date + timedelta(days=start_day),
-                            datetime.time(start_h_m[0], start_h_m[1], 0))
+                            self.schedule.start.time)
 
-                        try_debug("jobRep: '" + self.name +
-                                  "', section: 'if self.start_datetime <= now <= self.stop_datetime'"
-                                  ": start_datetime: " + str(self.start_datetime))
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "try_start",
+                                  "jobRep: '%s', section: 'if self.start_datetime <= now <= self.stop_datetime': "
+                                  "start_datetime: %s", self.name, self.start_datetime)
 
                         if self.when_finished:
                             if self.start_datetime < self.stop_datetime:
                                 temp_start_date = datetime.date(year=self.stop_datetime.year,
                                                                 month=self.stop_datetime.month,
                                                                 day=self.stop_datetime.day)
-                                try_debug("jobRep: '" + self.name +
-                                          "', section: 'if self.start_datetime < self.stop_datetime'"
-                                          ": temp_start_date: " + str(temp_start_date))
-                                if isinstance(self.schedule["start"]["day"], str):
-                                    temp_start_date += next_weekday(temp_start_date,
-                                                                    DOW[self.schedule["start"]["day"]])
-                                    try_debug("jobRep: '" + self.name +
-                                              "', section: 'if isinstance(self.schedule['start']['day'], str)'"
-                                              ": temp_start_date: " + str(temp_start_date))
+                                if TRACE:
+                                    trace(TRACE_DEBUG, self.name, "try_start",
+                                          "jobRep: '%s', section: 'if self.start_datetime < self.stop_datetime': "
+                                          "temp_start_date: %s", self.name, temp_start_date)
+                                if self.schedule.start.dow is not None:
+                                    temp_start_date = next_weekday(temp_start_date, self.schedule.start.dow)
+                                    if TRACE:
+                                        trace(TRACE_DEBUG, self.name, "try_start",
+                                              "jobRep: '%s', section: 'if self.schedule.start.dow is not None"
+                                              "': temp_start_date: %s", self.name, temp_start_date)
                                 else:
-                                    temp_start_date += timedelta(days=self.schedule["start"]["day"])
-                                    try_debug("jobRep: '" + self.name +
-                                              "', section: 'if isinstance(self.schedule['start']['day'], str): else'"
-                                              ": temp_start_date: " + str(temp_start_date))
+                                    temp_start_date += timedelta(days=self.schedule.start.day)
+                                    if TRACE:
+                                        trace(TRACE_DEBUG, self.name, "try_start",
+                                              "jobRep: '%s', section: 'if self.schedule.start.dow is not None"
+                                              ": else': temp_start_date: %s", self.name, temp_start_date)
                                 self.start_datetime = datetime.datetime(year=temp_start_date.year,
                                                                         month=temp_start_date.month,
                                                                         day=temp_start_date.day,
                                                                         hour=self.start_datetime.hour,
                                                                         minute=self.start_datetime.minute,
                                                                         second=self.start_datetime.second)
-                                try_debug("jobRep: '" + self.name +
-                                          "', section: 'if self.start_datetime < self.stop_datetime'"
-                                          ": start_datetime" + str(self.start_datetime))
-
-                        print(start_msg_full(self.name, str(now), self.stop_datetime, self.start_datetime))
-                        try_debug("jobRep: '" + self.name + "', section: 'def try_start(self)", DEBUG_SECTION_END)
+                                if TRACE:
+                                    trace(TRACE_DEBUG, self.name, "try_start",
+                                          "jobRep: '%s', section: 'if self.start_datetime < self.stop_datetime': "
+                                          "start_datetime%s", self.name, self.start_datetime)
+
+                        start_msg_full(self.name, str(now), self.stop_datetime, self.start_datetime)
+                        if TRACE:
+                            trace(TRACE_END, self.name, "try_start",
+                                  "jobRep: '%s', section: 'def try_start(self)", self.name)
                         return True
                     else:
-                        try_debug("jobRep: '" + self.name +
-                                  "', section: 'if self.start_datetime <= now <= self.stop_datetime': return False")
-                        try_debug("jobRep: '" + self.name + "', section: 'def try_start(self)", DEBUG_SECTION_END)
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "try_start",
+                                  "jobRep: '%s', section: 'if self.start_datetime <= now <= self.stop_datetime': "
+                                  "return False", self.name)
+                            trace(TRACE_END, self.name, "try_start",
+                                  "jobRep: '%s', section: 'def try_start(self)", self.name)
                         return False
                 else:
-                    try_debug("jobRep: '" + self.name + "', section: 'if self.job is None': return True")
-                    try_debug("jobRep: '" + self.name + "', section: 'def try_start(self)", DEBUG_SECTION_END)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_start",
+                              "jobRep: '%s', section: 'if self.job is None': return True", self.name)
+                        trace(TRACE_END, self.name, "try_start",
+                              "jobRep: '%s', section: 'def try_start(self)", self.name)
                     return True
 
     def try_stop(self):  # true - job is finished, false - job is not finished
-        try_debug("jobRep: '" + self.name + "', section: 'def try_stop(self)", DEBUG_SECTION_BEGIN)
+        if TRACE:
+            trace(TRACE_BEGIN, self.name, "try_stop", "jobRep: '%s', section: 'def try_stop(self)", self.name)
         if self.is_stop:
-            try_debug("jobRep: '" + self.name + "', section: 'if self.is_stop': return True")
-            try_debug("jobRep: '" + self.name + "', section: 'def try_stop(self)", DEBUG_SECTION_END)
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "try_stop",
+                      "jobRep: '%s', section: 'if self.is_stop': return True", self.name)
+                trace(TRACE_END, self.name, "try_stop", "jobRep: '%s', section: 'def try_stop(self)", self.name)
             return True
         if not self.is_start:
-            try_debug("jobRep: '" + self.name + "', section: 'if not self.is_start'")
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "try_stop", "jobRep: '%s', section: 'if not self.is_start'", self.name)
             if self.job.poll() is not None:  # if process is terminated
                 self.job = None
-                try_debug("jobRep: '" + self.name + "', section: 'if self.job.poll() is not None'"
-                                                    ": job: " + str(self.job))
-            try_debug("jobRep: '" + self.name + "', section: 'def try_stop(self)", DEBUG_SECTION_END)
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_stop",
+                          "jobRep: '%s', section: 'if self.job.poll() is not None': job: %s", self.name, self.job)
+            if TRACE:
+                trace(TRACE_END, self.name, "try_stop", "jobRep: '%s', section: 'def try_stop(self)", self.name)
             return True
 
         now = datetime.datetime.now()
-        if "month" in self.schedule["finish"]:
-            try_debug("jobRep: '" + self.name +
-                      "', section: 'if 'month' in self.schedule['finish']': now: " + str(now) +
-                      ", stop_datetime: " + str(self.stop_datetime))
+        if self.schedule.finish.is_month:
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "try_stop",
+                      "jobRep: '%s', section: 'if self.schedule.finish.is_month': now: %s, stop_datetime: %s",
+                      self.name, now, self.stop_datetime)
 
             if now > self.stop_datetime:
                 self.is_start = False
-                print(stop_msg(self.name, str(now)))
-
-                if isinstance(self.schedule["finish"]["month"]["values"], str):
-                    stop_date = add_months(self.stop_datetime, MONTHS[self.schedule["finish"]["month"]["values"]])
-                    try_debug("jobRep: '" + self.name +
-                              "', section: 'if isinstance(self.schedule['finish']['month']['values'], str)'"
-                              ": stop_date: " + str(stop_date))
-                else:
-                    stop_date = add_months(self.stop_datetime, self.schedule["finish"]["month"]["values"])
-                    try_debug("jobRep: '" + self.name +
-                              "', section: 'if isinstance(self.schedule['finish']['month']['values'], str): else'"
-                              ": stop_date: " + str(stop_date))
-                if isinstance(self.schedule["finish"]["month"]["day"], str):
-                    for i in range(self.schedule["finish"]["month"]["each"]):
-                        stop_date = next_weekday(stop_date, DOW[self.schedule["finish"]["month"]["day"]])
-                    try_debug("jobRep: '" + self.name +
-                              "', section: 'if isinstance(self.schedule['finish']['month']['day'], str)'"
-                              ": stop_date: " + str(stop_date))
+                stop_msg(self.name, str(now))
+
+                if self.schedule.finish.month is not None:
+                    stop_date = add_months(self.stop_datetime, self.schedule.finish.month)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_stop",
+                              "jobRep: '%s', section: 'if self.schedule.finish.month is not None"
+                              "': stop_date: %s", self.name, stop_date)
                 else:
-                    stop_date = datetime.date(year=stop_date.year,
-                                              month=stop_date.month,
-                                              day=self.schedule["finish"]["month"]["day"])
-                    try_debug("jobRep: '" + self.name +
-                              "', section: 'if isinstance(self.schedule['finish']['month']['day'], str): else'"
-                              ": stop_date: " + str(stop_date))
-                stop_h_m = int_time(self.schedule["finish"]["month"]["time"])
+                    stop_date = add_months(self.stop_datetime, self.schedule.finish.month_step)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_stop",
+                              "jobRep: '%s', section: 'if self.schedule.finish.month is not None"
+                              ": else': stop_date: %s", self.name, stop_date)
+                stop_date = self.schedule.finish.month_date(stop_date)
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_stop",
+                          "jobRep: '%s', section: 'self.schedule.finish.month_date': stop_date: %s",
+                          self.name, stop_date)
+                stop_h_m = self.schedule.finish.h_m
                 self.stop_datetime = datetime.datetime.combine(
                     stop_date,
-                    datetime.time(stop_h_m[0], stop_h_m[1], 0))
-                try_debug("jobRep: '" + self.name + "', section: 'if now > self.stop_datetime': stop_h_m " +
-                          str(stop_h_m) + ", stop_datetime: " + str(self.stop_datetime))
-                try_debug("jobRep: '" + self.name + "', section: 'def try_stop(self)", DEBUG_SECTION_END)
+                    self.schedule.finish.time)
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_stop",
+                          "jobRep: '%s', section: 'if now > self.stop_datetime': stop_h_m %s, stop_datetime: %s",
+                          self.name, stop_h_m, self.stop_datetime)
+                    trace(TRACE_END, self.name, "try_stop", "jobRep: '%s', section: 'def try_stop(self)", self.name)
                 return True
         else:
-            if self.schedule["finish"]["time"] == "never":
-                try_debug("jobRep: '" + self.name + "', section: 'if self.schedule['finish']['time'] == 'never''"
-                                                    ": return False")
-                try_debug("jobRep: '" + self.name + "', section: 'def try_stop(self)", DEBUG_SECTION_END)
+            if self.schedule.finish.is_never:
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_stop",
+                          "jobRep: '%s', section: 'if self.schedule.finish.is_never': return False",
+                          self.name)
+                    trace(TRACE_END, self.name, "try_stop", "jobRep: '%s', section: 'def try_stop(self)", self.name)
                 return False
             else:
                 if self.start_datetime is None:
                     start_dt = datetime.date.today()
-                    try_debug("jobRep: '" + self.name + "', section: 'if self.start_datetime is None:'"
-                                                        ": start_dt: " + str(start_dt))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_stop",
+                              "jobRep: '%s', section: 'if self.start_datetime is None:': start_dt: %s",
+                              self.name, start_dt)
                 else:
                     start_dt = self.start_datetime
-                    try_debug("jobRep: '" + self.name + "', section: 'if self.start_datetime is None: else:'"
-                                                        ": start_dt: " + str(start_dt))
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_stop",
+                              "jobRep: '%s', section: 'if self.start_datetime is None: else:': start_dt: %s",
+                              self.name, start_dt)
 
                 if now > self.stop_datetime:
                     self.is_start = False
-                    print(stop_msg(self.name, str(now)))
+                    stop_msg(self.name, str(now))
 
-                    stop_h_m = int_time(self.schedule["finish"]["time"])
+                    stop_h_m = self.schedule.finish.h_m
                     stop_day = 0
 
-                    try_debug("jobRep: '" + self.name + "', section: 'if now > self.stop_datetime': is_start: " +
-                              str(self.is_start) + ", stop_h_m: " + str(stop_h_m) + ", stop_day: " + str(stop_day))
-                    if "day" in self.schedule["finish"]:
-                        if isinstance(self.schedule["finish"]["day"], str):
-                            stop_day = DOW[self.schedule["finish"]["day"]]
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_stop",
+                              "jobRep: '%s', section: 'if now > self.stop_datetime': is_start: %s, stop_h_m: %s, "
+                              "stop_day: %s", self.name, self.is_start, stop_h_m, stop_day)
+                    if self.schedule.finish.has_day:
+                        if self.schedule.finish.dow is not None:
+                            stop_day = self.schedule.finish.dow
                             self.stop_datetime = next_weekday(
                                 datetime.datetime.combine(
                                     start_dt,
-                                    datetime.time(stop_h_m[0], stop_h_m[1], 0)),
+                                    self.schedule.finish.time),
                                 stop_day)
-                            try_debug("jobRep: '" + self.name +
-                                      "', section: 'if isinstance(self.schedule['finish']['day'], str)': stop_day: " +
-                                      str(stop_day) + ", stop_datetime: " + str(self.stop_datetime))
+                            if TRACE:
+                                trace(TRACE_DEBUG, self.name, "try_stop",
+                                      "jobRep: '%s', section: 'if self.schedule.finish.dow is not None': "
+                                      "stop_day: %s, stop_datetime: %s", self.name, stop_day, self.stop_datetime)
                             return True
                         else:
-                            stop_day += self.schedule["finish"]["day"]
-                            try_debug("jobRep: '" + self.name +
-                                      "', section: 'if isinstance(self.schedule['finish']['day'], str): else': "
-                                      "stop_day: " + str(stop_day))
+                            stop_day += self.schedule.finish.day
+                            if TRACE:
+                                trace(TRACE_DEBUG, self.name, "try_stop",
+                                      "jobRep: '%s', section: 'if self.schedule.finish.dow is not None: "
+                                      "else': stop_day: %s", self.name, stop_day)
                     else:
                         temp_stop_day_time = datetime.datetime(
                             year=self.start_datetime.year,
@@ -1198,70 +1732,1264 @@ class JobRep:
 
                     self.stop_datetime = datetime.datetime.combine(
                         start_dt + timedelta(days=stop_day),
-                        datetime.time(stop_h_m[0], stop_h_m[1], 0))
-                    try_debug("jobRep: '" + self.name + "', section: 'if now > self.stop_datetime': stop_datetime: " +
-                              str(self.stop_datetime))
-                    try_debug("jobRep: '" + self.name + "', section: 'def try_stop(self)", DEBUG_SECTION_END)
+                        self.schedule.finish.time)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_stop",
+                              "jobRep: '%s', section: 'if now > self.stop_datetime': stop_datetime: %s",
+                              self.name, self.stop_datetime)
+                        trace(TRACE_END, self.name, "try_stop", "jobRep: '%s', section: 'def try_stop(self)", self.name)
                     return True
                 else:
-                    try_debug("jobRep: '" + self.name + "', section: 'if now > self.stop_datetime: else: '"
-                                                        ": return False")
-                    try_debug("jobRep: '" + self.name + "', section: 'def try_stop(self)", DEBUG_SECTION_END)
+                    if TRACE:
+                        trace(TRACE_DEBUG, self.name, "try_stop",
+                              "jobRep: '%s', section: 'if now > self.stop_datetime: else: ': return False", self.name)
+                        trace(TRACE_END, self.name, "try_stop", "jobRep: '%s', section: 'def try_stop(self)", self.name)
                     return False
 
     def try_repeat(self):
-        try_debug("jobRep: '" + self.name + "', section: 'def try_repeat(self)", DEBUG_SECTION_BEGIN)
+        if TRACE:
+            trace(TRACE_BEGIN, self.name, "try_repeat", "jobRep: '%s', section: 'def try_repeat(self)", self.name)
         if not self.is_stop:
             if self.is_start:
                 now = datetime.datetime.now()
-                try_debug("jobRep: '" + self.name + "', section: 'self.is_start': now: " + str(now) + ", next_repeat: "
-                          + str(self.next_repeat))
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_repeat",
+                          "jobRep: '%s', section: 'self.is_start': now: %s, next_repeat: %s",
+                          self.name, now, self.next_repeat)
                 if now > self.next_repeat:
-                    if self.repeat["wait_finished"]:
+                    if self.repeat.wait_finished:
                         if self.job is None:
-                            self.job = subprocess.Popen(self.cmd, shell=self.is_shell)
+                            self.job = spawn(self)
                             self.next_repeat = calc_repeat(now, self.repeat)
-                            try_debug("jobRep: '" + self.name + "', section: 'if self.job is None': job: " +
-                                      str(self.job) + ", next_repeat: " + str(self.next_repeat))
+                            if TRACE:
+                                trace(TRACE_DEBUG, self.name, "try_repeat",
+                                      "jobRep: '%s', section: 'if self.job is None': job: %s, next_repeat: %s",
+                                      self.name, self.job, self.next_repeat)
                         elif self.job.poll() is not None:  # if process is terminated
                             self.next_repeat = calc_repeat(now, self.repeat)
                             self.job = None
-                            try_debug("jobRep: '" + self.name + "', section: 'if self.job is None': job: " +
-                                      str(self.job) + ", next_repeat: " + str(self.next_repeat))
+                            if TRACE:
+                                trace(TRACE_DEBUG, self.name, "try_repeat",
+                                      "jobRep: '%s', section: 'if self.job is None': job: %s, next_repeat: %s",
+                                      self.name, self.job, self.next_repeat)
                     else:
-                        self.job = subprocess.Popen(self.cmd, shell=self.is_shell)
+                        self.job = spawn(self)
                         self.next_repeat = calc_repeat(now, self.repeat)
-                        try_debug("jobRep: '" + self.name + "', section: 'if self.repeat['wait_finished']: else': job: "
-                                  + str(self.job) + ", next_repeat: " + str(self.next_repeat))
-        try_debug("jobRep: '" + self.name + "', section: 'def try_repeat(self)", DEBUG_SECTION_END)
+                        if TRACE:
+                            trace(TRACE_DEBUG, self.name, "try_repeat",
+                                  "jobRep: '%s', section: 'if self.repeat.wait_finished: else': job: %s, "
+                                  "next_repeat: %s", self.name, self.job, self.next_repeat)
+        if TRACE:
+            trace(TRACE_END, self.name, "try_repeat", "jobRep: '%s', section: 'def try_repeat(self)", self.name)
 
     def try_stop_immediately(self):
-        try_debug("jobRep: '" + self.name + "', section: 'def try_stop_immediately(self)", DEBUG_SECTION_BEGIN)
+        if TRACE:
+            trace(TRACE_BEGIN, self.name, "try_stop_immediately",
+                  "jobRep: '%s', section: 'def try_stop_immediately(self)", self.name)
         if not self.is_start:
             self.is_stop = True
-            try_debug("jobRep: '" + self.name + "', section: 'if not self.is_start': is_stop: " + str(self.is_stop))
+            if TRACE:
+                trace(TRACE_DEBUG, self.name, "try_stop_immediately",
+                      "jobRep: '%s', section: 'if not self.is_start': is_stop: %s", self.name, self.is_stop)
 
         if not self.is_stop:
             if self.job is None:
                 self.is_stop = True
-                print(stop_msg(self.name, datetime.datetime.now()))
-                try_debug("jobRep: '" + self.name + "', section: 'if not self.is_stop: if self.job is None': is_stop: "
-                          + str(self.is_stop))
+                stop_msg(self.name, datetime.datetime.now())
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_stop_immediately",
+                          "jobRep: '%s', section: 'if not self.is_stop: if self.job is None': is_stop: %s",
+                          self.name, self.is_stop)
             elif self.job.poll() is not None:  # if process is terminated
                 self.is_stop = True
-                print(stop_msg(self.name, datetime.datetime.now()))
-                try_debug("jobRep: '" + self.name + "', section: 'if not self.is_stop: if self.job is None: else': "
-                                                    "is_stop: " + str(self.is_stop))
-        try_debug("jobRep: '" + self.name + "', section: 'def try_stop_immediately(self)", DEBUG_SECTION_END)
+                stop_msg(self.name, datetime.datetime.now())
+                if TRACE:
+                    trace(TRACE_DEBUG, self.name, "try_stop_immediately",
+                          "jobRep: '%s', section: 'if not self.is_stop: if self.job is None: else': is_stop: %s",
+                          self.name, self.is_stop)
+        if TRACE:
+            trace(TRACE_END, self.name, "try_stop_immediately",
+                  "jobRep: '%s', section: 'def try_stop_immediately(self)", self.name)
+
+    def on_exit(self, proc, end_datetime):  # called by ChildSupervisor after the process is reaped
+        self.exit_code = proc.returncode
+        self.end_datetime = end_datetime
+        if TRACE:
+            trace(TRACE_DEBUG, self.name, "on_exit",
+                  "jobRep: '%s', pid: %s, exit_code: %s, end_datetime: %s",
+                  self.name, proc.pid, self.exit_code, self.end_datetime)
+        return self.job is proc  # False - the job has already noticed the exit itself
+
+    def tick(self):
+        if self.try_start():
+            if not self.try_stop():
+                self.try_repeat()
+        elif (not self.is_stop and self.job is None and self.stop_datetime is not None
+              and self.stop_datetime < datetime.datetime.now()):
+            catch_up(self)  # the run window has passed, it is missed if psd was stalled
+
+    def next_wakeup(self, now):  # None - nothing to wait for
+        if self.is_stop:
+            return None
+        # a running process is woken up by the supervisor as soon as it exits
+        running = self.job is not None and self.job.returncode is None and SUPERVISOR is not None
+        if not self.is_start:
+            if self.job is not None:  # wait for the last run to finish
+                return None if running else now
+            if self.start_datetime is None:  # 'now' job
+                return now
+            return self.start_datetime
+        if running and self.repeat.wait_finished and self.next_repeat <= now:
+            return self.stop_datetime
+        if self.stop_datetime is None:
+            return self.next_repeat
+        return min(self.stop_datetime, self.next_repeat)
+
+
+class Scheduler:
+    # Keeps the next wakeup instant of every job in a heap and sleeps until the earliest one, so
+    # only due jobs are visited. Heap entries are [when, seq, armed, job]; a cancelled entry has job None.
+    # armed is the instant the job was added: a wakeup which had passed before is due from then, not from when.
+    def __init__(self, supervisor=None):
+        self._heap = []
+        self._entries = {}
+        self._seq = itertools.count()
+        self.supervisor = supervisor
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, job, when, armed=None):
+        self.remove(job)
+        if when is None:
+            return
+        entry = [when, next(self._seq), armed or datetime.datetime.now(), job]
+        self._entries[job] = entry
+        heapq.heappush(self._heap, entry)
+
+    def remove(self, job):
+        entry = self._entries.pop(job, None)
+        if entry is not None:
+            entry[-1] = None
+
+    def add_many(self, jobs_when):  # [(job, when)], the heap is rebuilt at once without cancelled entries
+        armed = datetime.datetime.now()
+        for job, when in jobs_when:
+            self.remove(job)
+            if when is not None:
+                entry = [when, next(self._seq), armed, job]
+                self._entries[job] = entry
+                self._heap.append(entry)
+        self._heap = [_e for _e in self._heap if _e[-1] is not None]
+        heapq.heapify(self._heap)
+
+    def next_time(self):
+        while self._heap and self._heap[0][-1] is None:
+            heapq.heappop(self._heap)
+        if self._heap:
+            return self._heap[0][0]
+        return None
+
+    def run_pending(self):
+        now = datetime.datetime.now()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            job = entry[-1]
+            if job is None:
+                continue
+            del self._entries[job]
+            job.due = max(entry[0], entry[2])  # for the schedule lag of its process
+            job.noticed = now
+            due.append(job)
+        if not due:
+            return 0
+        timed = METRICS is not None or TIMING is not None
+        if timed:
+            begin = time.perf_counter()
+        for _job in due:
+            _job.tick()
+        if timed:
+            elapsed = time.perf_counter() - begin
+            if METRICS is not None:
+                METRICS.observe("psd_tick_duration_seconds", (), elapsed)
+            if TIMING is not None:
+                TIMING.tick(elapsed, len(due))
+        now = datetime.datetime.now()
+        for _job in due:
+            when = _job.next_wakeup(now)
+            if when is not None and when <= now:  # nothing changed yet, look again later
+                when = now + RETRY_DELAY
+            self.add(_job, when, now)
+            if STATE is not None:
+                STATE.save(_job)
+        return len(due)
+
+    def delay(self):  # seconds until the next due job
+        when = self.next_time()
+        if when is None:
+            return MAX_SLEEP
+        return max(min((when - datetime.datetime.now()).total_seconds(), MAX_SLEEP), 0)
+
+    def sleep(self):
+        delay = self.delay()
+        if self.supervisor is None:
+            if delay > 0:
+                time.sleep(delay)
+            return
+        for _job in self.supervisor.wait(delay):  # jobs whose process has finished
+            now = datetime.datetime.now()
+            self.add(_job, now, now)
+
+    def run(self):
+        while True:
+            self.run_pending()
+            self.sleep()
+
+    async def run_async(self):  # with AsyncSupervisor, in the event loop
+        while True:
+            self.run_pending()
+            for _job in await self.supervisor.wait(self.delay()):
+                now = datetime.datetime.now()
+                self.add(_job, now, now)
+
+
+class ChildSupervisor:
+    # Reaps job processes as soon as they exit: through a pidfd per process where os.pidfd_open works (Linux),
+    # otherwise through SIGCHLD written to a socket by signal.set_wakeup_fd. On Windows processes are polled.
+    def __init__(self):
+        self._children = {}  # Popen -> job
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self.mode = "poll"
+        if hasattr(os, "pidfd_open"):
+            try:
+                os.close(os.pidfd_open(os.getpid()))
+                self.mode = "pidfd"
+            except OSError:
+                pass
+        if self.mode == "poll" and hasattr(signal, "SIGCHLD"):
+            signal.signal(signal.SIGCHLD, lambda signum, frame: None)  # handler is needed to get the wakeup byte
+            signal.set_wakeup_fd(self._wake_w.fileno(), warn_on_full_buffer=False)
+            self.mode = "sigchld"
+        if TRACE:
+            trace(TRACE_DEBUG, None, "supervisor", "child supervisor mode: %s", self.mode)
+
+    def __len__(self):
+        return len(self._children)
+
+    def running(self):  # [(process, job)]
+        return list(self._children.items())
+
+    def spawn(self, job):
+        proc = popen(job)
+        self.watch(proc, job)
+        return proc
+
+    def watch(self, proc, job):
+        self._children[proc] = job
+        if self.mode == "pidfd" and not isinstance(proc, (ZygoteRun, CallRun)):  # reported by zygote or pool
+            try:
+                fd = os.pidfd_open(proc.pid)
+            except OSError:  # already gone, found by the next wait()
+                self.notify()
+                return
+            self._selector.register(fd, selectors.EVENT_READ, proc)
+
+    def notify(self):  # wakes up wait() from another thread
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:  # buffer is full, wait() wakes up anyway
+            pass
+
+    def wait(self, timeout):  # list of jobs which still wait on a process that has finished
+        if self.mode == "poll" and self._children:
+            timeout = min(timeout, RETRY_DELAY.total_seconds())
+        exited = []
+        check_all = self.mode != "pidfd"
+        for key, events in self._selector.select(timeout):
+            if key.data is None:
+                try:
+                    while self._wake_r.recv(4096):
+                        pass
+                except OSError:
+                    pass
+                check_all = True
+            else:
+                self._selector.unregister(key.fd)
+                os.close(key.fd)
+                if key.data.poll() is not None:
+                    self._reaped(key.data, exited)
+        if check_all:
+            for proc in list(self._children):
+                if proc.poll() is not None:
+                    self._reaped(proc, exited)
+        return exited
+
+    def _reaped(self, proc, exited):
+        job = self._children.pop(proc)
+        if job.on_exit(proc, datetime.datetime.now()):
+            exited.append(job)
+        if METRICS is not None:
+            run_finished(job, proc)
+        if CONCURRENCY is not None:
+            CONCURRENCY.release(job)
+
+
+class AsyncProcess:
+    # Popen-like handle of a process started by AsyncSupervisor: jobs poll() and kill() it as usual,
+    # while the process itself is started, read and awaited by a task of the event loop.
+    def __init__(self, job_name, cmd, is_shell, capture=None):
+        self.job_name = job_name
+        self.cmd = cmd
+        self.is_shell = is_shell
+        self.capture = capture
+        self.pid = None
+        self.returncode = None
+        self.process = None
+        self.task = None
+        self._killed = False
+
+    def __repr__(self):
+        return "<AsyncProcess: pid: " + str(self.pid) + " returncode: " + str(self.returncode) + \
+               " args: " + str(self.cmd) + ">"
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        if self.process is None:  # not started yet
+            self._killed = True
+        elif self.process.returncode is None:
+            try:
+                if IS_WINDOWS:
+                    self.process.kill()
+                else:  # Popen.kill() polls first and would reap the process behind the child watcher
+                    os.kill(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    async def run(self):
+        try:
+            if self.is_shell:
+                self.process = await asyncio.create_subprocess_shell(
+                    self.cmd if isinstance(self.cmd, str) else " ".join(self.cmd),
+                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+            else:
+                self.process = await asyncio.create_subprocess_exec(
+                    *self.cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+        except OSError as e:
+            job_output_msg(self.job_name, "stderr", str(e))
+            if self.capture is not None:
+                self.capture.close()
+            self.returncode = 127
+            return
+        self.pid = self.process.pid
+        if self._killed:
+            self.kill()
+        await asyncio.gather(self.read(self.process.stdout, "stdout"), self.read(self.process.stderr, "stderr"))
+        self.returncode = await self.process.wait()
+
+    async def read(self, stream, stream_name):  # line by line, without a limit of line length
+        if self.capture is not None:
+            captured = getattr(self.capture, stream_name)
+            while True:
+                chunk = await stream.read(CAPTURE_CHUNK)
+                if not chunk:
+                    break
+                captured.write(chunk)
+            captured.close()
+            return
+        pending = b""
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                break
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                job_output_msg(self.job_name, stream_name, line.rstrip(b"\r").decode(ENCODING, "replace"))
+        if pending:
+            job_output_msg(self.job_name, stream_name, pending.decode(ENCODING, "replace"))
+
+
+class AsyncSupervisor:
+    # Starts job processes as AsyncProcess tasks of the event loop and hands finished ones to the scheduler.
+    # All processes are watched by the loop itself, so thousands of them need no thread.
+    def __init__(self):
+        self._children = {}  # AsyncProcess -> job
+        self._exited = []
+        self._wakeup = None
+        self.mode = "asyncio"
+        raise_fd_limit()
+        # before 3.12 asyncio waits for every child in a thread of its own, unless told to use pidfd
+        if sys.version_info < (3, 12) and hasattr(asyncio, "PidfdChildWatcher") and hasattr(os, "pidfd_open"):
+            try:
+                os.close(os.pidfd_open(os.getpid()))
+            except OSError:
+                pass
+            else:
+                asyncio.set_child_watcher(asyncio.PidfdChildWatcher())
+                self.mode = "asyncio, pidfd"
+        if TRACE:
+            trace(TRACE_DEBUG, None, "supervisor", "child supervisor mode: %s", self.mode)
+
+    def __len__(self):
+        return len(self._children)
+
+    def running(self):  # [(process, job)]
+        return list(self._children.items())
+
+    def spawn(self, job):  # called by jobs inside the event loop
+        if job.call is not None:
+            proc = CALL_POOL.submit(job)
+        else:
+            if job.capture:
+                job.captured = RunCapture(job.name, CAPTURE_FOLDER, CAPTURE_MAX_SIZE, CAPTURE_RING_SIZE)
+            proc = AsyncProcess(job.name, job.cmd, job.is_shell, job.captured if job.capture else None)
+        self._children[proc] = job
+        proc.task = asyncio.get_running_loop().create_task(self._run(proc, job))
+        return proc
+
+    async def _run(self, proc, job):
+        await proc.run()
+        del self._children[proc]
+        if job.on_exit(proc, datetime.datetime.now()):
+            self._exited.append(job)
+        if METRICS is not None:
+            run_finished(job, proc)
+        if CONCURRENCY is not None:
+            CONCURRENCY.release(job)
+        self._wakeup.set()  # any exit, ShutdownCoordinator waits for them all
+
+    async def wait(self, timeout):  # list of jobs which still wait on a process that has finished
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if not self._exited:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._wakeup.clear()
+        exited, self._exited = self._exited, []
+        return exited
+
+    def notify(self):  # wakes up wait(), call in the event loop
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def close(self, timeout):  # stops processes which are still running, their output goes through psd
+        tasks = []
+        for proc in self._children:
+            proc.kill()
+            tasks.append(proc.task)
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+
+def raise_fd_limit():  # every running process holds its pipes open
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY:
+        hard = max(soft, 65536)
+    if soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+
+class QueuedRun:
+    # Popen-like handle of a run waiting in the queue of ConcurrencyController. When the run is started,
+    # the job gets the handle of the real process instead.
+    def __init__(self, job):
+        self.job = job
+        self.queued_at = time.monotonic()
+        self.pid = None
+        self.returncode = None
+        self.proc = None  # process of the run, once it is started
+
+    def __repr__(self):
+        return "<QueuedRun: job: " + str(self.job.name) + " returncode: " + str(self.returncode) + ">"
+
+    def poll(self):
+        if self.proc is not None:
+            return self.proc.poll()
+        return self.returncode
+
+    def kill(self):
+        if self.returncode is None:
+            CONCURRENCY.cancel(self)
+
+
+class ConcurrencyController:
+    # Limits job processes running at once: max_running in total, max_instances of a job and the size of pools
+    # shared by jobs. A run over a limit waits in the run queue, at most queue_size runs. Overflow policy:
+    # "drop" - the run is dropped at once, "queue" - it waits, the new run is dropped if the queue is full,
+    # "replace_oldest" - it waits, the oldest waiting run is dropped if the queue is full.
+    def __init__(self, max_running, queue_size, overflow, pools):
+        self.max_running = max_running
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.pools = pools
+        self.running = 0
+        self.instances = collections.Counter()  # job name -> running processes
+        self.pool_running = collections.Counter()  # pool name -> running processes
+        self.queue = collections.deque()
+        self.closed = False
+        self.dropped = 0
+        self.started_queued = 0
+        self.wait_time = 0.0  # seconds, all runs started from the queue
+        self.max_wait_time = 0.0
+
+    def stats(self):
+        return {"running": self.running, "queue_depth": len(self.queue), "dropped": self.dropped,
+                "started_queued": self.started_queued, "wait_time": self.wait_time,
+                "max_wait_time": self.max_wait_time}
+
+    def allowed(self, job):
+        if self.max_running is not None and self.running >= self.max_running:
+            return False
+        if job.max_instances is not None and self.instances[job.name] >= job.max_instances:
+            return False
+        if job.pool is not None and self.pool_running[job.pool] >= self.pools[job.pool]:
+            return False
+        return True
+
+    def spawn(self, job):
+        if self.allowed(job):
+            return self.start(job)
+        run = QueuedRun(job)
+        if self.overflow == "drop" or self.closed:
+            self.drop(run, "concurrency limit is reached")
+            return run
+        if len(self.queue) >= self.queue_size:
+            if self.overflow == "queue":
+                self.drop(run, "run queue is full")
+                return run
+            self.drop(self.queue.popleft(), "replaced by a newer run")
+        self.queue.append(run)
+        if TRACE:
+            trace(TRACE_DEBUG, job.name, "concurrency",
+                  "job: '%s', queued, queue_depth: %s, running: %s", job.name, len(self.queue), self.running)
+        return run
+
+    def start(self, job):
+        proc = start_process(job)
+        self.running += 1
+        self.instances[job.name] += 1
+        if job.pool is not None:
+            self.pool_running[job.pool] += 1
+        return proc
+
+    def release(self, job):  # a process of the job has finished
+        self.running -= 1
+        self.instances[job.name] -= 1
+        if job.pool is not None:
+            self.pool_running[job.pool] -= 1
+        if not self.closed:
+            self.start_queued()
+
+    def start_queued(self):  # the oldest runs which fit into the limits now
+        for run in list(self.queue):
+            if self.max_running is not None and self.running >= self.max_running:
+                break
+            if not self.allowed(run.job):
+                continue
+            self.queue.remove(run)
+            waited = time.monotonic() - run.queued_at
+            self.started_queued += 1
+            self.wait_time += waited
+            self.max_wait_time = max(self.max_wait_time, waited)
+            proc = self.start(run.job)
+            run.proc = proc
+            if run.job.job is run:
+                run.job.job = proc
+            if TRACE:
+                trace(TRACE_DEBUG, run.job.name, "concurrency",
+                      "job: '%s', started from queue, waited: %.3f s, queue_depth: %s",
+                      run.job.name, waited, len(self.queue))
+
+    def cancel(self, run):
+        self.queue.remove(run)
+        run.returncode = -1
+
+    def drop(self, run, reason):
+        run.returncode = -1
+        self.dropped += 1
+        info("Run of job '" + str(run.job.name) + "' is dropped: " + reason + " (queue depth: "
+             + str(len(self.queue)) + ", running: " + str(self.running) + ")")
+
+    def close(self):  # no more runs are started, waiting runs are cancelled
+        self.closed = True
+        while self.queue:
+            self.queue.pop().returncode = -1
+
+
+def spawn(job):  # every job process leads its own process group, see stop_process()
+    if CONCURRENCY is not None:
+        return CONCURRENCY.spawn(job)
+    return start_process(job)
+
+
+def start_process(job):
+    if SUPERVISOR is None:
+        proc = popen(job)
+    else:
+        proc = SUPERVISOR.spawn(job)
+    job.last_start = datetime.datetime.now()
+    if METRICS is not None:
+        run_started(job, proc)
+    if TIMING is not None:
+        TIMING.run(job)
+    return proc
+
+
+@functools.lru_cache(maxsize=None)
+def find_program(name):  # looked up in PATH once for all jobs which run it
+    return shutil.which(name)
+
+
+def exec_command(cmd, is_sh):  # (program, argv) of exec mode "auto", program None - cmd is a string for the shell
+    if not (is_sh and SHELL_SYNTAX.search(cmd)):
+        try:
+            argv = shlex.split(cmd) if ('"' in cmd or "'" in cmd or "\\" in cmd) else cmd.split()
+        except ValueError:  # unbalanced quotes, the shell reports them
+            argv = None
+        if argv and not (is_sh and "=" in argv[0]):  # VAR=value prefix needs the shell
+            program = find_program(argv[0])
+            if program is not None:
+                return program, argv
+    # shell syntax, builtins and programs which are not found: the shell runs them and reports errors as usual
+    if IS_WINDOWS:
+        return None, cmd
+    return "/bin/sh", ["/bin/sh", "-c", cmd]
+
+
+class SpawnedProcess:
+    # Popen-like handle of a process started by os.posix_spawn. The process is reaped by poll() as Popen does.
+    def __init__(self, pid, args):
+        self.pid = pid
+        self.args = args
+        self.returncode = None
+
+    def __repr__(self):
+        return "<SpawnedProcess: pid: " + str(self.pid) + " returncode: " + str(self.returncode) + \
+               " args: " + str(self.args) + ">"
+
+    def poll(self):
+        if self.returncode is None:
+            try:
+                pid, status = os.waitpid(self.pid, os.WNOHANG)
+            except ChildProcessError:  # reaped by someone else, as Popen assumes 0
+                self.returncode = 0
+                return self.returncode
+            if pid != 0:
+                self.returncode = os.waitstatus_to_exitcode(status)
+        return self.returncode
+
+    def kill(self):
+        if self.poll() is None:
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+def spawn_direct(job):
+    # process of exec mode "auto": vfork and exec of the program with argv and environment prepared in advance,
+    # without the Python-level work of Popen and without the shell
+    global SPAWN_ENV
+    if SPAWN_ENV is None:
+        SPAWN_ENV = {os.fsencode(_k): os.fsencode(_v) for _k, _v in os.environ.items()}
+    if not job.capture:
+        return SpawnedProcess(os.posix_spawn(job.program, job.cmd, SPAWN_ENV, setsid=True, setsigdef=SPAWN_SIGDEF),
+                              job.cmd)
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    try:
+        pid = os.posix_spawn(job.program, job.cmd, SPAWN_ENV, setsid=True, setsigdef=SPAWN_SIGDEF,
+                             file_actions=((os.POSIX_SPAWN_DUP2, out_w, 1), (os.POSIX_SPAWN_DUP2, err_w, 2)))
+    except OSError:
+        os.close(out_r)
+        os.close(err_r)
+        raise
+    finally:
+        os.close(out_w)
+        os.close(err_w)
+    job.captured = RunCapture(job.name, CAPTURE_FOLDER, CAPTURE_MAX_SIZE, CAPTURE_RING_SIZE)
+    OUTPUT_PUMP.add(open(out_r, "rb", buffering=0), job.captured.stdout)
+    OUTPUT_PUMP.add(open(err_r, "rb", buffering=0), job.captured.stderr)
+    return SpawnedProcess(pid, job.cmd)
+
+
+# Zygote process: imports the preloaded modules once, then forks a run for every request. The run leads its own
+# session like other job processes and executes the script by runpy. Requests come over a SOCK_SEQPACKET socket with
+# the pipes of a captured run attached; the zygote replies with the pid of the run and later with its exit code.
+ZYGOTE_SOURCE = r"""
+import atexit, gc, json, os, pkgutil, runpy, selectors, signal, socket, sys, threading, traceback
+
+def run(argv, sock, wake, fds):
+    for _f in (sock, wake[0], wake[1]):
+        _f.close()
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    if fds:
+        os.dup2(fds[0], 1)
+        os.dup2(fds[1], 2)
+        for _fd in fds:
+            os.close(_fd)
+    code = 0
+    try:
+        if argv[0] == "-m":
+            sys.argv = argv[1:]
+            sys.path[0] = os.getcwd()
+            runpy.run_module(argv[1], run_name="__main__", alter_sys=True)
+        else:
+            sys.argv = argv
+            sys.path[0] = os.path.dirname(os.path.abspath(argv[0]))
+            runpy.run_path(argv[0], run_name="__main__")
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            code = e.code
+        elif e.code is not None:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    try:
+        threading._shutdown()
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(code)
+
+def main():
+    sock = socket.socket(fileno=int(sys.argv[1]))
+    for _module in json.loads(sys.argv[2]):
+        __import__(_module)
+    gc.freeze()  # objects of the zygote are not touched by collections in runs, their pages stay shared
+    wake = socket.socketpair()
+    for _w in wake:
+        _w.setblocking(False)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    signal.set_wakeup_fd(wake[1].fileno(), warn_on_full_buffer=False)
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ)
+    selector.register(wake[0], selectors.EVENT_READ)
+    while True:
+        for key, events in selector.select():
+            if key.fileobj is sock:
+                message, fds, flags, address = socket.recv_fds(sock, 65536, 2)
+                if not message:  # psd has closed the socket
+                    return
+                request = json.loads(message)
+                sys.stdout.flush()
+                sys.stderr.flush()
+                ready_r, ready_w = os.pipe()
+                pid = os.fork()
+                if pid == 0:
+                    os.setsid()
+                    os.close(ready_r)
+                    os.close(ready_w)
+                    run(request["argv"], sock, wake, fds)
+                os.close(ready_w)
+                os.read(ready_r, 1)  # the run has its session, psd can stop its process group
+                os.close(ready_r)
+                for _fd in fds:
+                    os.close(_fd)
+                sock.send(json.dumps({"id": request["id"], "pid": pid}).encode())
+            else:
+                try:
+                    while wake[0].recv(4096):
+                        pass
+                except OSError:
+                    pass
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            sock.send(json.dumps({"pid": pid, "exit": os.waitstatus_to_exitcode(status)}).encode())
+
+main()
+"""
+
+
+def zygote_argv(cmd):  # argv of a run of zygote, cmd is '[python] script.py [args]' or '[python] -m module [args]'
+    argv = shlex.split(cmd)
+    if argv and path.basename(argv[0]).startswith("python"):
+        argv = argv[1:]
+    return argv
+
+
+class ZygoteRun:
+    # Popen-like handle of a run forked by Zygote: pid is known once the zygote has forked the run, returncode once
+    # the zygote has reaped it. Like AsyncProcess, a run killed before its pid is known is killed when it is known.
+    def __init__(self, zygote, args):
+        self.zygote = zygote
+        self.args = args
+        self.pid = None
+        self.returncode = None
+        self._killed = False
+
+    def __repr__(self):
+        return "<ZygoteRun: zygote: " + self.zygote.name + " pid: " + str(self.pid) + " returncode: " + \
+               str(self.returncode) + " args: " + str(self.args) + ">"
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        with self.zygote.lock:
+            if self.pid is None:
+                self._killed = True
+                return
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+class Zygote:
+    # Warm Python interpreter for jobs with field 'zygote': the interpreter and modules of preload are loaded once
+    # per zygote, not once per run. spawn() only sends a request, the reader thread fills in pid and returncode of
+    # the run and wakes up the supervisor when it has exited. A zygote which has exited is started again by the
+    # next run.
+    def __init__(self, name, python, preload):
+        self.name = name
+        self.python = python
+        self.preload = preload
+        self.lock = threading.Lock()
+        self.sock = None
+        self.process = None
+        self.waiting = {}  # request id -> ZygoteRun, until its pid is known
+        self.runs = {}  # pid -> ZygoteRun
+        self.closing = False
+        self._ids = itertools.count()
+
+    def start(self):
+        sock, zygote_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.process = subprocess.Popen([self.python, "-c", ZYGOTE_SOURCE, str(zygote_sock.fileno()),
+                                         json.dumps(self.preload)], pass_fds=(zygote_sock.fileno(),),
+                                        stdin=subprocess.DEVNULL, start_new_session=True)
+        zygote_sock.close()
+        self.sock = sock
+        self.waiting = {}  # runs of the zygote exited before are reported lost by their reader thread
+        self.runs = {}
+        threading.Thread(target=self.read, args=(sock, self.waiting, self.runs), name="psd-zygote",
+                         daemon=True).start()
+        if TRACE:
+            trace(TRACE_DEBUG, None, "zygote", "zygote '%s' started, pid: %s, preload: %s",
+                  self.name, self.process.pid, self.preload)
+
+    def spawn(self, job):
+        run = ZygoteRun(self, job.zygote_argv)
+        fds = []
+        if job.capture:
+            out_r, out_w = os.pipe()
+            err_r, err_w = os.pipe()
+            fds = [out_w, err_w]
+        request_id = next(self._ids)
+        message = json.dumps({"id": request_id, "argv": run.args}).encode()
+        try:
+            with self.lock:  # the reply is read once the run is waiting for it
+                if self.sock is None:
+                    self.start()
+                try:
+                    socket.send_fds(self.sock, [message], fds)
+                except OSError:  # the zygote has exited, its reader thread reports it
+                    self.start()
+                    socket.send_fds(self.sock, [message], fds)
+                self.waiting[request_id] = run
+        finally:
+            for fd in fds:
+                os.close(fd)
+        if job.capture:
+            job.captured = RunCapture(job.name, CAPTURE_FOLDER, CAPTURE_MAX_SIZE, CAPTURE_RING_SIZE)
+            OUTPUT_PUMP.add(open(out_r, "rb", buffering=0), job.captured.stdout)
+            OUTPUT_PUMP.add(open(err_r, "rb", buffering=0), job.captured.stderr)
+        return run
+
+    def read(self, sock, waiting, runs):
+        while True:
+            try:
+                message = sock.recv(4096)
+            except OSError:
+                message = b""
+            if not message:
+                break
+            report = json.loads(message)
+            with self.lock:
+                if "id" in report:
+                    run = waiting.pop(report["id"])
+                    run.pid = report["pid"]
+                    runs[run.pid] = run
+                    killed = run._killed
+                else:
+                    run = runs.pop(report["pid"])
+                    run.returncode = report["exit"]
+            if "id" in report:
+                if killed:
+                    stop_process(run, True)
+            elif SUPERVISOR is not None:
+                SUPERVISOR.notify()
+
+        with self.lock:  # the zygote has exited, its runs which are not reported are lost
+            lost = list(waiting.values()) + list(runs.values())
+            waiting.clear()
+            runs.clear()
+            if self.sock is sock:
+                self.sock = None
+        sock.close()
+        for run in lost:
+            run.returncode = -1
+        if not self.closing:
+            info("[ Zygote '" + self.name + "' has exited, lost runs: " + str(len(lost)) + " ]")
+        if lost and SUPERVISOR is not None:
+            SUPERVISOR.notify()
+
+    def close(self):  # the zygote exits when its socket is closed, runs go on
+        self.closing = True
+        sock = self.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self.process is not None:
+            try:
+                self.process.wait(1)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def call_in_worker(target, args):  # runs in a worker of CallPool: (exit code, value, error, duration, RSS in MB)
+    begin = time.perf_counter()
+    value = None
+    error_text = None
+    try:
+        module_name, function_name = target.split(":")
+        function = functools.reduce(getattr, function_name.split("."), importlib.import_module(module_name))
+        value = function(*args)
+        code = 0
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        error_text = traceback.format_exc()
+        code = 1
+    duration = time.perf_counter() - begin
+    if value is not None:
+        value = repr(value)[:CALL_RESULT_SIZE]
+    return code, value, error_text, duration, worker_rss()
+
+
+def call_worker_init():  # Ctrl+C reaches the whole process group, calls are stopped by psd only
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def worker_rss():  # MB of the current process, None - unknown
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KB, bytes on macOS
+    return peak / (1048576 if sys.platform == "darwin" else 1024)
+
+
+class CallRun:
+    # Popen-like handle of a call run by CallPool. returncode is 0 if the function returned, the code of
+    # SystemExit, 1 for an exception and -1 if the call was cancelled or its worker was lost. A running call can't
+    # be stopped alone, its worker runs calls of other jobs: it is left to end, see stop_process().
+    def __init__(self, job_name, target):
+        self.job_name = job_name
+        self.args = target
+        self.pid = None
+        self.returncode = None
+        self.future = None
+        self.pool = None
+        self.executor = None  # executor of the pool which runs the call
+        self.stopped = False  # cancelled or killed by psd, counted as killed
+
+    def __repr__(self):
+        return "<CallRun: job: " + str(self.job_name) + " returncode: " + str(self.returncode) + " call: " + \
+               str(self.args) + ">"
+
+    def poll(self):
+        return self.returncode
+
+    def cancel(self):  # a pending call won't run, a running one goes on
+        if self.future is not None and self.future.cancel():
+            self.stopped = True
+
+    def kill(self):  # at shutdown and reload: a running call is stopped with the workers of its executor
+        self.stopped = True
+        if self.future is not None and not self.future.cancel() and not self.future.done():
+            self.pool.terminate(self.executor)
+
+    async def run(self):  # for AsyncSupervisor, returns once returncode is set
+        await asyncio.wait([asyncio.wrap_future(self.future)])
+
+    def done(self, future):  # called in a thread of the executor
+        rss = None
+        if future.cancelled():
+            self.returncode = -1
+            duration = 0
+            value = None
+            error_text = "cancelled"
+        elif future.exception() is not None:  # the worker has died or was stopped
+            self.returncode = -1
+            duration = 0
+            value = None
+            error_text = repr(future.exception())
+        else:
+            self.returncode, value, error_text, duration, rss = future.result()
+        result_msg(self.job_name, self.returncode, duration, value, error_text)
+        if rss is not None and self.pool.max_rss is not None and rss >= self.pool.max_rss:
+            self.pool.recycle(self.executor, "worker RSS " + "%.1f" % rss + " MB")
+        if SUPERVISOR is not None and ENGINE != "asyncio":
+            SUPERVISOR.notify()
+
+
+def worker_processes(executor):  # ProcessPoolExecutor has no public list of its workers
+    return list((getattr(executor, "_processes", None) or {}).values())
+
+
+class CallPool:
+    # ProcessPoolExecutor for jobs with field 'call': a run costs a task of a worker which stays, not a process
+    # start. Workers are spawned, not forked from psd with its threads. The pool is recycled after max_tasks calls
+    # per worker or a call which leaves its worker over max_rss MB: new calls go to a new executor, running calls
+    # end in the old one and its workers exit. max_tasks_per_child is not used, before Python 3.12 it can hang
+    # calls when a worker exits while the others are busy.
+    def __init__(self, workers, max_tasks, max_rss):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_tasks = max_tasks
+        self.max_rss = max_rss
+        self.lock = threading.Lock()
+        self.executor = None
+        self.tasks = 0  # calls submitted to the executor
+        self.retired = {}  # executor -> its worker processes, shutdown() of the executor forgets them
+
+    def _executor(self):
+        if self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(self.workers,
+                                                                   mp_context=multiprocessing.get_context("spawn"),
+                                                                   initializer=call_worker_init)
+            self.tasks = 0
+            if TRACE:
+                trace(TRACE_DEBUG, None, "call_pool", "call pool started, workers: %s, max_tasks: %s, max_rss: %s",
+                      self.workers, self.max_tasks, self.max_rss)
+        return self.executor
+
+    def submit(self, job):
+        run = CallRun(job.name, job.call)
+        run.pool = self
+        with self.lock:
+            run.executor = self._executor()
+            run.future = run.executor.submit(call_in_worker, job.call, job.call_args)
+            self.tasks += 1
+            if self.max_tasks is not None and self.tasks >= self.max_tasks * self.workers:
+                self._retire()
+        run.future.add_done_callback(run.done)
+        return run
+
+    def _retire(self):  # new calls go to a new executor, the old one exits once its calls have ended
+        self.retired = {_e: _ps for _e, _ps in self.retired.items() if any(_p.is_alive() for _p in _ps)}
+        if self.executor is not None:
+            self.retired[self.executor] = worker_processes(self.executor)
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def recycle(self, executor, reason):
+        with self.lock:
+            if self.executor is not executor:  # already recycled
+                return
+            self._retire()
+        info("[ Call pool recycled: " + reason + " ]")
+
+    def terminate(self, executor):  # kills the workers of executor, all its running calls end
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+                processes = worker_processes(executor)
+            else:
+                processes = self.retired.pop(executor, [])
+        for process in processes:
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        with self.lock:
+            executor = self.executor
+            self.executor = None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def popen(job):  # process of the default engine, its output is captured by OUTPUT_PUMP if the job is captured
+    if job.call is not None:
+        return CALL_POOL.submit(job)
+    if job.zygote is not None:
+        return job.zygote.spawn(job)
+    if FAST_SPAWN and job.program is not None:
+        return spawn_direct(job)
+    if not job.capture:
+        return subprocess.Popen(job.cmd, shell=job.is_shell, start_new_session=True)
+    proc = subprocess.Popen(job.cmd, shell=job.is_shell, start_new_session=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    job.captured = RunCapture(job.name, CAPTURE_FOLDER, CAPTURE_MAX_SIZE, CAPTURE_RING_SIZE)
+    OUTPUT_PUMP.add(proc.stdout, job.captured.stdout)
+    OUTPUT_PUMP.add(proc.stderr, job.captured.stderr)
+    return proc
+
+
+class CaptureStream:
+    # One output stream of a run: a file of at most max_size bytes (the rest is counted in dropped) and a ring
+    # buffer with the last ring_size bytes. Without the ring buffer data goes from the pipe to the file by
+    # os.splice, without a copy in psd.
+    def __init__(self, filename, max_size, ring_size):
+        self.filename = filename
+        self.max_size = max_size
+        self.ring_size = ring_size
+        self.size = 0
+        self.dropped = 0
+        self.ring = bytearray()
+        self.use_splice = ring_size == 0 and hasattr(os, "splice")
+        self._fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+
+    def tail(self):  # the last ring_size bytes
+        return bytes(self.ring)
+
+    def write(self, data):
+        if self.ring_size:
+            self.ring += data
+            if len(self.ring) > self.ring_size:
+                del self.ring[:len(self.ring) - self.ring_size]
+        if self.max_size is not None and self.size + len(data) > self.max_size:
+            self.dropped += self.size + len(data) - self.max_size
+            data = data[:self.max_size - self.size]
+        while data:
+            written = os.write(self._fd, data)
+            self.size += written
+            data = data[written:]
+
+    def pump(self, fd):  # moves data ready in the pipe, 0 - end of output
+        if self.use_splice and (self.max_size is None or self.size < self.max_size):
+            count = CAPTURE_CHUNK if self.max_size is None else min(CAPTURE_CHUNK, self.max_size - self.size)
+            moved = os.splice(fd, self._fd, count)
+            self.size += moved
+            return moved
+        data = os.read(fd, CAPTURE_CHUNK)
+        self.write(data)
+        return len(data)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class RunCapture:  # stdout and stderr files of one run: <job name>_<start time>.out and .err
+    def __init__(self, job_name, folder, max_size, ring_size):
+        name = str(job_name).replace("/", "_").replace("\\", "_") + "_" \
+            + datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S-%f")
+        self.stdout = CaptureStream(path.join(folder, name + ".out"), max_size, ring_size)
+        self.stderr = CaptureStream(path.join(folder, name + ".err"), max_size, ring_size)
+
+    def close(self):
+        self.stdout.close()
+        self.stderr.close()
+
+
+class OutputPump(threading.Thread):
+    # Moves output of captured runs of the default engine from pipes to capture files on its own thread, so
+    # a chatty job can't hold up the scheduler or stall on a full pipe. Windows can't select pipes, there every
+    # stream is read by a thread of its own.
+    def __init__(self):
+        super().__init__(name="psd-output", daemon=True)
+        self._selector = selectors.DefaultSelector()
+        self._added = queue.SimpleQueue()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+    def add(self, pipe, stream):
+        if IS_WINDOWS:
+            threading.Thread(target=self.copy, args=(pipe, stream), name="psd-output", daemon=True).start()
+            return
+        self._added.put((pipe, stream))
+        self._wake_w.send(b"\0")
+
+    def copy(self, pipe, stream):
+        try:
+            while stream.pump(pipe.fileno()):
+                pass
+        except OSError:
+            pass
+        pipe.close()
+        stream.close()
+
+    def run(self):
+        while True:
+            for key, events in self._selector.select():
+                if key.data is None:
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except OSError:
+                        pass
+                    while not self._added.empty():
+                        pipe, stream = self._added.get()
+                        self._selector.register(pipe, selectors.EVENT_READ, (pipe, stream))
+                    continue
+                pipe, stream = key.data
+                try:
+                    moved = stream.pump(pipe.fileno())
+                except OSError:
+                    moved = 0
+                if not moved:
+                    self._selector.unregister(pipe)
+                    pipe.close()
+                    stream.close()
+
+
+def stop_process(proc, force):  # SIGTERM, or SIGKILL if force, to the process group of the job process
+    if isinstance(proc, CallRun):  # only the SIGKILL phase of shutdown stops a running call, see CallRun
+        if force and SHUTDOWN is not None:
+            proc.kill()
+        else:
+            proc.cancel()
+        return
+    proc.stopped = True  # counted as killed when the process is reaped
+    if proc.pid is None:  # AsyncProcess which is not started yet
+        proc.kill()
+        return
+    if IS_WINDOWS:
+        if force:
+            subprocess.call(['taskkill', '/F', '/T', '/PID', str(proc.pid)])
+        else:
+            subprocess.call(['taskkill', '/T', '/PID', str(proc.pid)])
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGKILL if force else signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):  # the whole group is gone
+        pass
 
 
 def calc_repeat(dt, repeat):
-    if repeat["unit"] == "s":
-        return dt + timedelta(seconds=repeat["val"])
-    elif repeat["unit"] == "m":
-        return dt + timedelta(minutes=repeat["val"])
-    elif repeat["unit"] == "h":
-        return dt + timedelta(hours=repeat["val"])
+    return dt + repeat.delta
 
 
 def int_time(t):
@@ -1271,11 +2999,7 @@ def int_time(t):
 
 
 def is_time_format(t):
-    try:
-        time.strptime(t, '%H:%M')
-        return True
-    except ValueError:
-        return False
+    return isinstance(t, str) and TIME_FORMAT.fullmatch(t) is not None
 
 
 def next_weekday(dt, weekday):
@@ -1304,354 +3028,2147 @@ def now_in_range(start, end):
 
 
 def compatible_shell():
-    if "aterm" in environ["SHELL"].lower():
-        return False
-    elif "rxvt" in environ["SHELL"].lower():
-        return False
-    elif "tilda" in environ["SHELL"].lower():
-        return False
-    elif "xvt" in environ["SHELL"].lower():
-        return False
-    elif "tty" in environ["SHELL"].lower():
-        return False
-    else:
-        return True
+    shell = environ.get("SHELL", "").lower()
+    for terminal in ("aterm", "rxvt", "tilda", "xvt", "tty"):
+        if terminal in shell:
+            return False
+    return True
 
 
-def start_msg_full(job_name, started_dt, stop_dt, next_dt):
-    if LOG:
-        log("[STARTED ] ['" + str(job_name) + "'] [Started: " +
-            str(started_dt) + "] [Finished: " + str(stop_dt) +
-            "] [Next start: " + str(next_dt) + "]")
-
-    if platform.system() == "Linux":
-        if compatible_shell():
-            return color_msg(GREEN, "[STARTED ]") + " ['" + str(job_name) + "']" + " " + \
-                   color_msg(BLUE, "[Started: " + str(started_dt) + "]") + " " + \
-                   color_msg(YELLOW, "[Finished: " + str(stop_dt) + "]") + " " + \
-                   color_msg(GREEN, "[Next start: " + str(next_dt) + "]")
+def color_supported():  # resolved once at startup
+    return platform.system() == "Linux" and compatible_shell()
+
+
+def start_text_full(job_name, started_dt, stop_dt, next_dt, color=False):
+    if color:
+        return color_msg(GREEN, "[STARTED ]") + " ['" + str(job_name) + "']" + " " + \
+               color_msg(BLUE, "[Started: " + str(started_dt) + "]") + " " + \
+               color_msg(YELLOW, "[Finished: " + str(stop_dt) + "]") + " " + \
+               color_msg(GREEN, "[Next start: " + str(next_dt) + "]")
     return "[STARTED ] ['" + str(job_name) + "'] [Started: " +\
            str(started_dt) + "] [Finished: " + str(stop_dt) +\
            "] [Next start: " + str(next_dt) + "]"
 
 
-def start_msg_short(job_name, started_dt):
+def start_text_short(job_name, started_dt, color=False):
+    if color:
+        return color_msg(GREEN, "[STARTED ]") + " ['" + str(job_name) + "']" + " " + \
+               color_msg(BLUE, "[Started: " + str(started_dt) + "]")
+    return "[STARTED ] ['" + str(job_name) + "'] [Started: " + str(started_dt) + "]"
+
+
+def stop_text(job_name, stop_dt, color=False):
+    if color:
+        return color_msg(YELLOW, "[FINISHED]") + " ['" + str(job_name) + "']" + " " + \
+               color_msg(YELLOW, "[Finished: " + str(stop_dt) + "]")
+    return "[FINISHED] ['" + str(job_name) + "'] [Finished: " + str(stop_dt) + "]"
+
+
+def output_text(job_name, stream_name, line, color=False):
+    banner = "[STDERR  ]" if stream_name == "stderr" else "[STDOUT  ]"
+    if color:
+        return color_msg(RED if stream_name == "stderr" else BLUE, banner) + " ['" + str(job_name) + "'] " + line
+    return banner + " ['" + str(job_name) + "'] " + line
+
+
+def timing_text(job_name, due_dt, noticed_dt, started_dt, color=False):  # lags in ms from the due time
+    noticed = "[Noticed: +" + "%.3f" % ((noticed_dt - due_dt).total_seconds() * 1000) + " ms]"
+    started = "[Started: +" + "%.3f" % ((started_dt - due_dt).total_seconds() * 1000) + " ms]"
+    if color:
+        return color_msg(PURPLE, "[TIMING  ]") + " ['" + str(job_name) + "'] " + \
+               color_msg(BLUE, "[Due: " + str(due_dt) + "]") + " " + color_msg(YELLOW, noticed) + " " + \
+               color_msg(GREEN, started)
+    return "[TIMING  ] ['" + str(job_name) + "'] [Due: " + str(due_dt) + "] " + noticed + " " + started
+
+
+def result_text(job_name, returncode, duration, value, error_text, color=False):  # of a call, see CallRun
+    text = "[Exit: " + str(returncode) + "] [Duration: " + "%.3f" % (duration * 1000) + " ms]"
+    if error_text is not None:
+        text += " [Error: " + error_text.strip().splitlines()[-1] + "]"
+    elif value is not None:
+        text += " [Value: " + value + "]"
+    if color:
+        return color_msg(RED if returncode else GREEN, "[RESULT  ]") + " ['" + str(job_name) + "'] " + text
+    return "[RESULT  ] ['" + str(job_name) + "'] " + text
+
+
+def overrun_text(duration, budget, job_count, color=False):
+    text = "[Tick: " + "%.3f" % (duration * 1000) + " ms] [Budget: " + "%.3f" % (budget * 1000) + " ms] [Jobs: " + \
+           str(job_count) + "]"
+    if color:
+        return color_msg(RED, "[OVERRUN ]") + " " + text
+    return "[OVERRUN ] " + text
+
+
+def timing_summary_text(stats):
+    def ms(*keys):
+        return "/".join("%.3f" % (stats[_k] * 1000) for _k in keys) + " ms"
+    return "[ Timing: " + str(stats["runs"]) + " runs, notice lag p50/p99/max " + \
+           ms("notice_lag_p50", "notice_lag_p99", "notice_lag_max") + ", start lag p50/p99/max " + \
+           ms("start_lag_p50", "start_lag_p99", "start_lag_max") + "; " + str(stats["ticks"]) + \
+           " ticks, p50/p99/max " + ms("tick_p50", "tick_p99", "tick_max") + ", " + str(stats["overruns"]) + \
+           " over " + ms("tick_budget") + " budget ]"
+
+
+def debug_text(message, section='', color=False):
+    if color:
+        if section == DEBUG_SECTION_BEGIN:
+            color_section = color_msg(PURPLE, DEBUG_SECTION_BEGIN)
+        elif section == DEBUG_SECTION_END:
+            color_section = color_msg(PURPLE, DEBUG_SECTION_END)
+        else:
+            color_section = ''
+        return color_msg(LIGHT_BLUE, DEBUG_BANNER) + " " + message + " " + color_section
+    return DEBUG_BANNER + " " + message + " " + section
+
+
+def color_msg(color, msg):
+    return "\033[38;5;" + str(color) + "m" + msg + "\033[0m"
+
+
+def start_msg_full(job_name, started_dt, stop_dt, next_dt):
     if LOG:
-        log("[STARTED ] ['" + str(job_name) + "'] [Started: " + str(started_dt) + "]")
+        log(start_text_full(job_name, started_dt, stop_dt, next_dt))
+    OUTPUT.start_full(job_name, started_dt, stop_dt, next_dt)
 
-    if platform.system() == "Linux":
-        if compatible_shell():
-            return color_msg(GREEN, "[STARTED ]") + " ['" + str(job_name) + "']" + " " + \
-                   color_msg(BLUE, "[Started: " + str(started_dt) + "]")
-    return "[STARTED ] ['" + str(job_name) + "'] [Started: " + str(started_dt) + "]"
+
+def start_msg_short(job_name, started_dt):
+    if LOG:
+        log(start_text_short(job_name, started_dt))
+    OUTPUT.start_short(job_name, started_dt)
 
 
 def stop_msg(job_name, stop_dt):
     if LOG:
-        log("[FINISHED] ['" + job_name + "'] [Finished: " + str(stop_dt) + "]")
+        log(stop_text(job_name, stop_dt))
+    OUTPUT.stop(job_name, stop_dt)
 
-    if platform.system() == "Linux":
-        if compatible_shell():
-            return color_msg(YELLOW, "[FINISHED]") + " ['" + str(job_name) + "']" + " " + \
-                   color_msg(YELLOW, "[Finished: " + str(stop_dt) + "]")
-    return "[FINISHED] ['" + job_name + "'] [Finished: " + str(stop_dt) + "]"
 
+def timing_msg(job_name, due_dt, noticed_dt, started_dt):
+    if LOG:
+        log(timing_text(job_name, due_dt, noticed_dt, started_dt))
+    OUTPUT.timing(job_name, due_dt, noticed_dt, started_dt)
 
-def color_msg(color, msg):
-    return "\033[38;5;" + str(color) + "m" + msg + "\033[0m"
 
+def result_msg(job_name, returncode, duration, value, error_text):
+    if LOG:
+        log(result_text(job_name, returncode, duration, value, error_text))
+    OUTPUT.result(job_name, returncode, duration, value, error_text)
 
-def log(message):
-    log_filename = LOG_FOLDER + LOG_PREFIX + str(datetime.date.today())
-    new_line = "\n"
-    if platform.system() == 'Windows':
-        new_line = "\r\n"
-    with open(log_filename, 'a', encoding=ENCODING) as lg_file:
-        lg_file.write(message + new_line)
-        lg_file.close()
 
+def overrun_msg(duration, budget, job_count):
+    if LOG:
+        log(overrun_text(duration, budget, job_count))
+    OUTPUT.overrun(duration, budget, job_count)
 
-def debug(message, section=''):
-    debug_banner = DEBUG_BANNER
-    debug_msg = debug_banner + " " + message + " " + section
+
+def timing_summary_msg(stats):
     if LOG:
-        log(DEBUG_BANNER + " " + message)
-    if platform.system() == "Linux":
-        if compatible_shell():
-            debug_banner = color_msg(LIGHT_BLUE, DEBUG_BANNER)
-            if section == DEBUG_SECTION_BEGIN:
-                color_section = color_msg(PURPLE, DEBUG_SECTION_BEGIN)
-            elif section == DEBUG_SECTION_END:
-                color_section = color_msg(PURPLE, DEBUG_SECTION_END)
-            else:
-                color_section = ''
-            debug_msg = debug_banner + " " + message + " " + color_section
-    print(debug_msg)
+        log(timing_summary_text(stats))
+    OUTPUT.timing_summary(stats)
 
 
-def try_debug(message, section=''):
-    if DEBUG:
-        debug(message, section)
+def job_output_msg(job_name, stream_name, line):
+    if LOG:
+        log(output_text(job_name, stream_name, line))
+    OUTPUT.output(job_name, stream_name, line)
 
 
-def error(message):
+def info(message):
     if LOG:
         log(message)
+    OUTPUT.info(message)
+
+
+class ConsoleWriter(threading.Thread):
+    # Writes lines to the stream on its own thread, so a slow terminal doesn't hold up the scheduler.
+    # Pending lines are kept in a bounded buffer: when it is full, the oldest lines are dropped and
+    # the number of dropped lines is reported.
+    def __init__(self, stream, max_lines):
+        super().__init__(name="psd-console", daemon=True)
+        self.stream = stream
+        self.dropped = 0
+        self._lines = collections.deque(maxlen=max_lines)
+        self._ready = queue.SimpleQueue()  # reentrant, so write() is safe in signal handlers
+        self._closed = False
+
+    def write(self, line):
+        if len(self._lines) == self._lines.maxlen:
+            self.dropped += 1
+        self._lines.append(line)
+        self._ready.put(True)
+
+    def close(self):
+        if self.is_alive():
+            self._closed = True
+            self._ready.put(True)
+            self.join()
+
+    def run(self):
+        while True:
+            self._ready.get()
+            while not self._ready.empty():
+                self._ready.get()
+            lines = []
+            while self._lines:
+                lines.append(self._lines.popleft())
+            if self.dropped:
+                lines.append("[ " + str(self.dropped) + " messages dropped ]")
+                self.dropped = 0
+            if lines:
+                self.stream.write("\n".join(lines) + "\n")
+                self.stream.flush()
+            if self._closed and not self._lines:
+                break
+
+
+class ConsoleSink:
+    def __init__(self, color, max_lines):
+        self.color = color
+        self.writer = ConsoleWriter(sys.stdout, max_lines)
+        self.writer.start()
+
+    def start_full(self, job_name, started_dt, stop_dt, next_dt):
+        self.writer.write(start_text_full(job_name, started_dt, stop_dt, next_dt, self.color))
+
+    def start_short(self, job_name, started_dt):
+        self.writer.write(start_text_short(job_name, started_dt, self.color))
+
+    def stop(self, job_name, stop_dt):
+        self.writer.write(stop_text(job_name, stop_dt, self.color))
+
+    def output(self, job_name, stream_name, line):
+        self.writer.write(output_text(job_name, stream_name, line, self.color))
+
+    def timing(self, job_name, due_dt, noticed_dt, started_dt):
+        self.writer.write(timing_text(job_name, due_dt, noticed_dt, started_dt, self.color))
+
+    def result(self, job_name, returncode, duration, value, error_text):
+        self.writer.write(result_text(job_name, returncode, duration, value, error_text, self.color))
+        if error_text is not None and "\n" in error_text.strip():  # traceback
+            self.writer.write(error_text.rstrip())
+
+    def overrun(self, duration, budget, job_count):
+        self.writer.write(overrun_text(duration, budget, job_count, self.color))
+
+    def timing_summary(self, stats):
+        self.writer.write(timing_summary_text(stats))
+
+    def debug(self, message, section):
+        self.writer.write(debug_text(message, section, self.color))
+
+    def error(self, message):
+        self.writer.write(color_msg(RED, message) if self.color else message)
+
+    def info(self, message):
+        self.writer.write(message)
+
+    def close(self):
+        self.writer.close()
+
 
-    if compatible_shell():
-        print(color_msg(RED, message))
+class JsonSink:  # one JSON object per line
+    def __init__(self, max_lines):
+        self.writer = ConsoleWriter(sys.stdout, max_lines)
+        self.writer.start()
+
+    def event(self, name, **fields):
+        line = {"event": name, "time": str(datetime.datetime.now())}
+        line.update(fields)
+        self.writer.write(json.dumps(line, default=str))
+
+    def start_full(self, job_name, started_dt, stop_dt, next_dt):
+        self.event("started", job=job_name, started=started_dt, finish=stop_dt, next_start=next_dt)
+
+    def start_short(self, job_name, started_dt):
+        self.event("started", job=job_name, started=started_dt)
+
+    def stop(self, job_name, stop_dt):
+        self.event("finished", job=job_name, finished=stop_dt)
+
+    def output(self, job_name, stream_name, line):
+        self.event("output", job=job_name, stream=stream_name, line=line)
+
+    def timing(self, job_name, due_dt, noticed_dt, started_dt):
+        self.event("timing", job=job_name, due=due_dt, noticed=noticed_dt, started=started_dt,
+                   notice_lag=(noticed_dt - due_dt).total_seconds(), start_lag=(started_dt - due_dt).total_seconds())
+
+    def result(self, job_name, returncode, duration, value, error_text):
+        self.event("result", job=job_name, exit_code=returncode, duration=duration, value=value, error=error_text)
+
+    def overrun(self, duration, budget, job_count):
+        self.event("overrun", duration=duration, budget=budget, jobs=job_count)
+
+    def timing_summary(self, stats):
+        self.event("timing_summary", **stats)
+
+    def debug(self, message, section):
+        self.event("debug", message=message, section=section)
+
+    def error(self, message):
+        self.event("error", message=message)
+
+    def info(self, message):
+        if message:
+            self.event("info", message=message)
+
+    def close(self):
+        self.writer.close()
+
+
+class NullSink:
+    def start_full(self, job_name, started_dt, stop_dt, next_dt):
+        pass
+
+    def start_short(self, job_name, started_dt):
+        pass
+
+    def stop(self, job_name, stop_dt):
+        pass
+
+    def output(self, job_name, stream_name, line):
+        pass
+
+    def timing(self, job_name, due_dt, noticed_dt, started_dt):
+        pass
+
+    def result(self, job_name, returncode, duration, value, error_text):
+        pass
+
+    def overrun(self, duration, budget, job_count):
+        pass
+
+    def timing_summary(self, stats):
+        pass
+
+    def debug(self, message, section):
+        pass
+
+    def error(self, message):
+        pass
+
+    def info(self, message):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_output(sink, max_lines):
+    if sink == "console":
+        return ConsoleSink(color_supported(), max_lines)
+    elif sink == "plain":
+        return ConsoleSink(False, max_lines)
+    elif sink == "json":
+        return JsonSink(max_lines)
+    elif sink == "null":
+        return NullSink()
+    return None
+
+
+def set_output(output):
+    global OUTPUT
+    old_output = OUTPUT
+    OUTPUT = output
+    if old_output is not None:
+        old_output.close()
+
+
+def close_output():
+    OUTPUT.close()
+
+
+class LogWriter(threading.Thread):
+    # Holds the log file of the current day open and writes queued messages in batches, so log()
+    # only puts the message to the queue. Batches are written when LOG_BUFFER_SIZE characters are pending,
+    # every LOG_FLUSH_INTERVAL seconds and on close(). The file is switched at midnight.
+    def __init__(self, folder, prefix, encoding, buffer_size, flush_interval, compress):
+        super().__init__(name="psd-log", daemon=True)
+        self.folder = folder
+        self.prefix = prefix
+        self.encoding = encoding
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.compress = compress
+        self.new_line = "\r\n" if IS_WINDOWS else "\n"
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._filename = None
+        self._midnight = 0
+
+    def write(self, message):
+        self._queue.put(message)
+
+    def close(self):
+        if self.is_alive():
+            self._queue.put(None)
+            self.join()
+
+    def run(self):
+        pending = []
+        size = 0
+        flush_at = 0
+        while True:
+            timeout = max(flush_at - time.monotonic(), 0) if pending else None
+            try:
+                message = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                message = ""
+            if message is None:
+                break
+            if message:
+                if not pending:
+                    flush_at = time.monotonic() + self.flush_interval
+                pending.append(message + self.new_line)
+                size += len(message)
+            if pending and (size >= self.buffer_size or time.monotonic() >= flush_at):
+                self._write(pending)
+                pending = []
+                size = 0
+        if pending:
+            self._write(pending)
+        if self._file is not None:
+            self._file.close()
+
+    def _write(self, lines):
+        if time.time() >= self._midnight:
+            self._rotate()
+        self._file.write("".join(lines))
+        self._file.flush()
+
+    def _rotate(self):
+        today = datetime.date.today()
+        tomorrow = datetime.datetime.combine(today + timedelta(days=1), datetime.time())
+        self._midnight = tomorrow.timestamp()
+        old_filename = self._filename
+        if self._file is not None:
+            self._file.close()
+        self._filename = self.folder + self.prefix + str(today)
+        self._file = open(self._filename, 'a', encoding=self.encoding, newline='')
+        if self.compress and old_filename is not None and old_filename != self._filename:
+            threading.Thread(target=compress_log, args=(old_filename,), name="psd-log-gzip", daemon=True).start()
+
+
+def compress_log(filename):
+    try:
+        with open(filename, 'rb') as src, gzip.open(filename + ".gz", 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        remove(filename)
+    except OSError as e:
+        info("Compression of the log file '" + filename + "' failed: " + str(e))
+
+
+def log(message):
+    LOG_WRITER.write(message)
+
+
+def debug(message, section=''):
+    if LOG:
+        log(DEBUG_BANNER + " " + message)
+    OUTPUT.debug(message, section)
+
+
+def trace(level, job, section, message, *args):  # call only under 'if TRACE:'
+    if level < TRACE_LEVEL:
+        return
+    if TRACE_JOBS is not None and job is not None and job not in TRACE_JOBS:
+        return
+    if TRACE_SECTIONS is not None and section not in TRACE_SECTIONS:
+        return
+    if args:
+        message = message % args
+    if level == TRACE_BEGIN:
+        debug(message, DEBUG_SECTION_BEGIN)
+    elif level == TRACE_END:
+        debug(message, DEBUG_SECTION_END)
     else:
-        print(message)
+        debug(message)
+
+
+def set_trace(enabled, trace_settings=None):
+    global TRACE, TRACE_LEVEL, TRACE_JOBS, TRACE_SECTIONS
+    if trace_settings is None:
+        trace_settings = {}
+    TRACE_LEVEL = TRACE_LEVELS[trace_settings.get("level", "section")]
+    TRACE_JOBS = set(trace_settings["jobs"]) if "jobs" in trace_settings else None
+    TRACE_SECTIONS = set(trace_settings["sections"]) if "sections" in trace_settings else None
+    TRACE = enabled
+
+
+def trace_settings_error(trace_settings):  # None - field 'trace' is right, else what is wrong
+    if not isinstance(trace_settings, dict):
+        return "Field 'trace' is not object! Found " + str(trace_settings) + "."
+    level = trace_settings.get("level", "section")
+    if not isinstance(level, str) or level not in TRACE_LEVELS:
+        return "Field 'level' in trace is not trace level! Found " + str(level) + \
+               ".\nPossible values: 'section', 'debug', 'info'."
+    for field in ("jobs", "sections"):
+        if field in trace_settings and not isinstance(trace_settings[field], list):
+            return "Field '" + field + "' in trace is not list! Found " + str(trace_settings[field]) + "."
+    return None
+
+
+def sigusr2_handler(signum, frame):  # toggle tracing at runtime, filters are re-read from settings file
+    global TRACE
+    try:
+        with open(f_name, encoding=ENCODING) as f:
+            trace_settings = json.load(f).get("trace", {})
+    except (OSError, ValueError, AttributeError):
+        trace_settings = settings.get("trace", {})
+    message = trace_settings_error(trace_settings)
+    if message is None:
+        set_trace(not TRACE, trace_settings)
+    else:  # a wrong edit of the file doesn't stop psd, tracing is toggled with the filters it has
+        info("[ " + message.replace("\n", " ") + " Previous trace filters are kept. ]")
+        TRACE = not TRACE
+    info("[ Trace " + ("on" if TRACE else "off") + " at " + str(datetime.datetime.now()) + " ]")
+
+
+def error(message):
+    if LOG:
+        log(message)
+    OUTPUT.error(message)
     exit(-1)
 
 
-def sigint_handler(signum, frame):
-    for _j in jobs:
-        _j.stop_immediately()
-    print()
-    if wait_rep_jobs:
-        print("Wait repeated jobs finished...")
-        is_run = True
-        stop_j = [False] * len(jobs_r)
-        while is_run:
-            i = 0
-            for _jr in jobs_r:
+class ConfigError(Exception):  # wrong job in settings, fatal at start, ignored with its reload
+    pass
+
+
+class ShutdownCoordinator:
+    # Stops all jobs at once: SIGTERM goes to the process group of every running job, they are all waited for
+    # with one deadline and the groups still running after the grace period get SIGKILL. Repeated jobs are
+    # waited for if wait_repeated_jobs is set (at most timeout seconds), otherwise they are stopped the same way.
+    # start() and step() return the number of seconds to wait for a process exit, None - all is finished.
+    def __init__(self, supervisor, jobs, jobs_r, wait_repeated, grace, timeout):
+        self.supervisor = supervisor
+        self.jobs = jobs
+        self.jobs_r = jobs_r
+        self.wait_repeated = wait_repeated
+        self.grace = grace
+        self.timeout = timeout
+        self.stopping = {}  # process -> job name
+        self.kill_at = None
+        self.wait_until = None
+        self.reported_at = None
+
+    def start(self):
+        info("")
+        if CONCURRENCY is not None:
+            CONCURRENCY.close()
+        now = time.monotonic()
+        if self.wait_repeated:
+            info("Wait repeated jobs finished...")
+            if self.timeout is not None:
+                self.wait_until = now + self.timeout
+            repeated = set(self.jobs_r)
+            self.terminate([(proc, _j) for proc, _j in self.supervisor.running() if _j not in repeated], now)
+        else:
+            self.stop_repeated(now)
+        return self.step()
+
+    def stop_repeated(self, now):  # repeated jobs won't be started again, all running processes are stopped
+        for _jr in self.jobs_r:
+            _jr.is_stop = True
+        self.terminate([(proc, _j) for proc, _j in self.supervisor.running() if proc not in self.stopping], now)
+
+    def terminate(self, procs, now):
+        if not procs:
+            return
+        for proc, _j in procs:
+            self.stopping[proc] = _j.name
+            stop_process(proc, False)
+        self.kill_at = now + self.grace
+        info("Stopping " + str(len(procs)) + " job processes, SIGKILL in " + str(self.grace)
+             + " s (press Ctrl+C to kill now)...")
+
+    def force(self):  # second SIGINT
+        now = time.monotonic()
+        self.kill_at = now
+        if self.wait_repeated:
+            self.wait_until = now
+
+    def step(self):
+        now = time.monotonic()
+        for proc in list(self.stopping):
+            if proc.poll() is not None:
+                stop_msg(self.stopping.pop(proc), datetime.datetime.now())
+
+        waiting = []
+        if self.wait_repeated:
+            for _jr in self.jobs_r:
                 _jr.try_stop_immediately()
-                if _jr.is_stop:
-                    stop_j[i] = True
-                i += 1
-            stop_count = 0
-            for s_j in stop_j:
-                if s_j is True:
-                    stop_count += 1
-            if stop_count == len(stop_j):
-                is_run = False
-                continue
-            time.sleep(1)
-        print()
+            waiting = [proc for proc, _j in self.supervisor.running() if proc not in self.stopping]
+            if waiting and self.wait_until is not None and now >= self.wait_until:
+                info("Repeated jobs are not finished in time")
+                self.stop_repeated(now)
+                waiting = []
+
+        if self.stopping and self.kill_at is not None and now >= self.kill_at:
+            info("Killing " + str(len(self.stopping)) + " job processes: " + ", ".join(sorted(self.stopping.values())))
+            for proc in self.stopping:
+                stop_process(proc, True)
+            self.kill_at = None
+
+        if not self.stopping and not waiting:
+            info("")
+            return None
+        if self.reported_at is None or now - self.reported_at >= 1:  # progress, once a second
+            self.reported_at = now
+            info("Waiting for " + str(len(self.stopping) + len(waiting)) + " job processes...")
+        deadlines = [1]
+        if self.stopping and self.kill_at is not None:
+            deadlines.append(self.kill_at - now)
+        if waiting and self.wait_until is not None:
+            deadlines.append(self.wait_until - now)
+        return max(min(deadlines), 0)
+
+
+def shutdown():
+    global SHUTDOWN
+    if PROFILE is not None:
+        PROFILE.shutdown_began = time.perf_counter()
+    SHUTDOWN = ShutdownCoordinator(SUPERVISOR, jobs, jobs_r, wait_rep_jobs, SHUTDOWN_GRACE, SHUTDOWN_TIMEOUT)
+    return SHUTDOWN.start()
+
+
+def sigint_handler(signum, frame):
+    if SHUTDOWN is not None:
+        SHUTDOWN.force()
+        SUPERVISOR.notify()
+        return
+    timeout = shutdown()
+    while timeout is not None:
+        SUPERVISOR.wait(timeout)
+        timeout = SHUTDOWN.step()
     exit(1)
 
 
-working_path = path.realpath(__file__)[:-6]  # remove psd.py
+async def run_async(scheduler):  # asyncio engine: SIGINT cancels the scheduler, then jobs are stopped in the loop
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+
+    def handler(signum, frame):
+        if SHUTDOWN is not None:
+            SHUTDOWN.force()
+            loop.call_soon_threadsafe(SUPERVISOR.notify)
+        else:
+            loop.call_soon_threadsafe(task.cancel)
+    signal.signal(signal.SIGINT, handler)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, handler)
+    try:
+        await scheduler.run_async()
+    except asyncio.CancelledError:
+        timeout = shutdown()
+        while timeout is not None:
+            await SUPERVISOR.wait(timeout)
+            timeout = SHUTDOWN.step()
+        await SUPERVISOR.close(SHUTDOWN_GRACE)
+        exit(1)
+
+
+def expect_object(value):  # checks of job fields: None - value is right, else what is expected
+    if not isinstance(value, dict):
+        return "object"
+
+
+def expect_section(value):
+    if not isinstance(value, dict):
+        return "object"
+    if "time" not in value and "month" not in value:
+        return "object with 'time' or 'month'"
+
+
+def expect_str(value):
+    if not isinstance(value, str):
+        return "string"
+
+
+def expect_bool(value):
+    if not isinstance(value, bool):
+        return "true or false"
+
+
+def expect_int(value):
+    if not isinstance(value, int) or isinstance(value, bool):
+        return "int"
+
+
+def expect_positive_int(value):
+    if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+        return "positive int"
+
+
+def expect_number(value):
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0:
+        return "positive number"
+
+
+def expect_day(value):
+    if not (isinstance(value, str) and is_dow(value)) and expect_int(value) is not None:
+        return "int or day of week ('" + "', '".join(DOW) + "')"
+
+
+def expect_time(value):
+    if not is_time_format(value):
+        return "time 'hh:MM'"
 
-f_name = None
-if len(sys.argv) == 1:
-    f_name = working_path + "psd.json"
-else:
-    for arg in sys.argv:
-        if arg == "psd.py":
+
+def expect_start_time(value):
+    if value != "now" and not is_time_format(value):
+        return "time 'hh:MM' or 'now'"
+
+
+def expect_finish_time(value):
+    if value != "never" and not is_time_format(value):
+        return "time 'hh:MM' or 'never'"
+
+
+def expect_months(value):
+    if isinstance(value, list) and value and all(isinstance(_m, str) and is_month(_m) for _m in value):
+        return None
+    if expect_int(value) is not None:
+        return "int or list of months ('" + "', '".join(sorted(MONTHS, key=MONTHS.get)) + "')"
+
+
+def expect_month(value):
+    if not (isinstance(value, str) and is_month(value)) and expect_int(value) is not None:
+        return "int or month ('" + "', '".join(sorted(MONTHS, key=MONTHS.get)) + "')"
+
+
+def expect_unit(value):
+    if not isinstance(value, str) or value not in REPEAT_UNITS:
+        return "'" + "', '".join(REPEAT_UNITS) + "'"
+
+
+def expect_catch_up(value):
+    if not isinstance(value, str) or value not in CATCH_UP_POLICIES:
+        return "'" + "', '".join(CATCH_UP_POLICIES) + "'"
+
+
+def expect_call(value):
+    if not isinstance(value, str) or not re.fullmatch(r"[\w.]+:[\w.]+", value):
+        return "'module:function'"
+
+
+def expect_list(value):
+    if not isinstance(value, list):
+        return "list"
+
+
+def cmd_required(js):
+    return "call" not in js
+
+
+def expect_zygote(value):
+    if not isinstance(value, str) or value not in ZYGOTES:
+        return "zygote of zygotes"
+
+
+def expect_pool(value):
+    if not isinstance(value, str) or value not in CONCURRENCY_POOLS:
+        return "pool of concurrency{pools}"
+
+
+def month_each_required(month):
+    return isinstance(month.get("day"), str)
+
+
+def month_used(section):
+    return "time" not in section
+
+
+def schedule_rules(section, expect_section_time, expect_values):
+    return (
+        (("schedule", section), True, expect_section, None),
+        (("schedule", section, "day"), False, expect_day, None),
+        (("schedule", section, "time"), False, expect_section_time, None),
+        (("schedule", section, "month"), False, expect_object, month_used),
+        (("schedule", section, "month", "values"), True, expect_values, None),
+        (("schedule", section, "month", "day"), True, expect_day, None),
+        (("schedule", section, "month", "each"), month_each_required, expect_int, None),
+        (("schedule", section, "month", "time"), True, expect_time, None),
+    )
+
+
+def compile_rules(rules):  # (path, parent path, field, required, check, when)
+    return tuple((_rule[0], _rule[0][:-1], _rule[0][-1]) + _rule[1:] for _rule in rules)
+
+
+# Job format, checked in one pass. Rule: (path, required, check, when); required is bool or function of the parent
+# object, when - function of the parent object, False - the field is not used. Fields of a missing or wrong
+# object are not checked.
+JOB_RULES = compile_rules((
+    (("name",), True, expect_str, None),
+    (("cmd",), cmd_required, expect_str, None),
+    (("call",), False, expect_call, None),
+    (("args",), False, expect_list, None),
+    (("schedule",), True, expect_object, None),
+) + schedule_rules("start", expect_start_time, expect_months) + (
+    (("schedule", "start", "when_finished"), False, expect_bool, None),
+) + schedule_rules("finish", expect_finish_time, expect_month) + (
+    (("repeat",), False, expect_object, None),
+    (("repeat", "unit"), True, expect_unit, None),
+    (("repeat", "val"), True, expect_number, None),
+    (("repeat", "wait_finished"), True, expect_bool, None),
+    (("max_instances",), False, expect_positive_int, None),
+    (("pool",), False, expect_pool, None),
+    (("capture",), False, expect_bool, None),
+    (("catch_up",), False, expect_catch_up, None),
+    (("catch_up_max",), False, expect_positive_int, None),
+    (("zygote",), False, expect_zygote, None),
+))
+
+
+def json_path(path):
+    return "".join("[" + str(_k) + "]" if isinstance(_k, int) else "." + _k for _k in path)
+
+
+def validate(js, rules, location):  # list of errors in job js
+    errors = []
+    values = {(): js}  # right objects by path, so every object is looked up once
+    for rule_path, parent_path, field, required, check, when in rules:
+        parent = values.get(parent_path)
+        if parent is None or (when is not None and not when(parent)):
             continue
-        if arg == '--debug':
-            DEBUG = True
+        if field not in parent:
+            if required is True or (required and required(parent)):
+                errors.append(location + json_path(rule_path) + ": field is required")
+            continue
+        value = parent[field]
+        expected = check(value)
+        if expected is not None:
+            errors.append(location + json_path(rule_path) + ": expected " + expected + ", found "
+                          + json.dumps(value))
+            continue
+        values[rule_path] = value
+    return errors
+
+
+def read_include(file_name):  # (content, None) or (None, error)
+    try:
+        with open(file_name, encoding=ENCODING) as f:
+            return json.load(f), None
+    except (OSError, ValueError) as e:
+        return None, str(e)
+
+
+def load_includes(settings, working_dir):
+    # Jobs of settings in declaration order: [(location, job, name from file)]; job is None if location is an error.
+    # Job files are read by a thread pool, a file included several times is read once.
+    entries = []
+    files = []
+    for i, js in enumerate(settings["jobs"]):
+        location = "$.jobs[" + str(i) + "]"
+        if isinstance(js, dict) and "file" in js:
+            files.append(working_dir + js["file"])
+            entries.append((js["file"] + ": $", working_dir + js["file"], path.splitext(js["file"])[0]))
+        elif isinstance(js, dict) and "dir" in js:
+            if not isinstance(js["dir"], str):
+                entries.append((location + ".dir: expected string, found " + json.dumps(js["dir"]), None, None))
+                continue
+            pattern = working_dir + js["dir"]
+            if not any(_c in js["dir"] for _c in "*?["):  # directory
+                if not path.isdir(pattern):
+                    entries.append((location + ".dir: directory '" + pattern + "' is not found", None, None))
+                    continue
+                pattern = path.join(pattern, "*.json")
+            if path.isdir(path.dirname(pattern)):  # new files in it change the jobs
+                files.append(path.dirname(pattern))
+            for file_name in sorted(glob.glob(pattern)):
+                files.append(file_name)
+                entries.append((file_name + ": $", file_name, path.splitext(path.basename(file_name))[0]))
         else:
-            f_name = arg
-
-if f_name is None:
-    f_name = working_path + "psd.json"
-if f_name == '':
-    f_name = working_path + "psd.json"
-
-try_debug("debug mode on")
-try_debug("working_path: '" + working_path + "'")
-try_debug("f_name: " + f_name)
-
-jobs = []
-jobs_r = []
-
-settings = json.load(open(f_name, encoding=ENCODING))
-if "is_shell" not in settings:
-    is_shell = True
-else:
-    is_shell = settings["is_shell"]
-try_debug("is_shell: " + str(is_shell))
-if "wait_repeated_jobs" not in settings:
-    error("Field 'wait_repeated_jobs' not found in " + str(f_name) + "!")
-else:
-    wait_rep_jobs = settings["wait_repeated_jobs"]
-    try_debug("wait_repeated_jobs: " + str(wait_rep_jobs))
-
-working_dir = working_path
-if "working_dir" in settings:
-    working_dir = settings["working_dir"]
-try_debug("working_dir: " + working_dir)
-
-if "encoding" in settings:
-    ENCODING = settings["encoding"]
-try_debug("encoding: " + ENCODING)
-
-if "log" in settings:
-    LOG = settings["log"]["enabled"]
-    if "folder" in settings["log"]:
-        LOG_FOLDER = settings["log"]["folder"]
-    if "prefix" in settings["log"]:
-        LOG_PREFIX = settings["log"]["prefix"]
-
-    try_debug("log: " + str(LOG))
-    try_debug("log_folder: " + LOG_FOLDER)
-    try_debug("log_prefix: " + LOG_PREFIX)
+            entries.append((location, js, None))
 
-    if LOG:
-        if not path.isdir(LOG_FOLDER):
-            try:
-                mkdir(LOG_FOLDER)
-            except OSError:
-                error("Creation of the log directory '" + LOG_FOLDER + "' failed")
-            else:
-                print("The log directory '" + LOG_FOLDER + "' is created.")
-                try_debug("log_folder: " + LOG_FOLDER)
-
-for js in settings["jobs"]:
-    _when_finished = False
-    js_f_name = None
-    if "file" in js:
-        js_f_name = path.splitext(js["file"])[0]
-        js = json.load(open(working_dir + js["file"], encoding=ENCODING))
-
-    if "name" not in js:
-        if js_f_name is not None:
-            js["name"] = js_f_name
+    names = list(dict.fromkeys(_f for _l, _f, _n in entries if _n is not None))
+    if len(names) > 1:
+        with concurrent.futures.ThreadPoolExecutor(min(INCLUDE_WORKERS, len(names))) as pool:
+            loaded = dict(zip(names, pool.map(read_include, names)))
+    else:
+        loaded = {_f: read_include(_f) for _f in names}
+
+    jobs = []
+    for location, js, name in entries:
+        if name is None:
+            jobs.append((location, js, None))
+            continue
+        content, e = loaded[js]
+        if e is not None:
+            jobs.append((location + ": " + e, None, None))
+        elif isinstance(content, list):  # several jobs in one file
+            for k, _js in enumerate(content):
+                jobs.append((location + "[" + str(k) + "]", _js, None))
+        else:
+            jobs.append((location, content, name))
+    return jobs, list(dict.fromkeys(files))
+
+
+def compile_jobs(settings, working_dir):  # validated jobs of settings, ([JobSpec], [included file])
+    specs = []
+    errors = []
+    if not isinstance(settings.get("jobs"), list):
+        raise ConfigError("$.jobs: expected list of jobs")
+    jobs, files = load_includes(settings, working_dir)
+    for location, js, name in jobs:
+        if js is None:
+            errors.append(location)
+            continue
+        if not isinstance(js, dict):
+            errors.append(location + ": expected object, found " + json.dumps(js))
+            continue
+        if name is not None and "name" not in js:
+            js = dict(js, name=name)  # the same file can be included again
+        job_errors = validate(js, JOB_RULES, location)
+        if job_errors:
+            if isinstance(js.get("name"), str):
+                job_errors = [_e + " (job '" + js["name"] + "')" for _e in job_errors]
+            errors.extend(job_errors)
+            continue
+        specs.append(JobSpec(js, js["schedule"]["start"].get("when_finished", False)))
+    if errors:
+        raise ConfigError(str(len(errors)) + " errors in jobs:\n" + "\n".join(errors))
+    return specs, files
+
+
+def make_job(spec, is_sh, now=None):
+    if spec.repeat is not None:
+        _job = JobRep(spec.name, spec.cmd, spec.schedule, is_sh, spec.when_finished, spec.repeat, now)
+    else:
+        _job = Job(spec.name, spec.cmd, spec.schedule, spec.when_finished, is_sh, now)
+    _job.max_instances = spec.max_instances
+    _job.pool = spec.pool
+    _job.capture = spec.capture
+    _job.catch_up = spec.catch_up
+    _job.catch_up_max = spec.catch_up_max
+    if spec.call is not None:
+        _job.call = spec.call
+        _job.call_args = spec.call_args
+        return _job
+    if EXEC_MODE == "auto":
+        _job.program, _job.cmd = exec_command(spec.cmd, is_sh)
+        _job.is_shell = _job.program is None
+    if spec.zygote is not None:
+        _job.zygote = ZYGOTES[spec.zygote]
+        _job.zygote_argv = zygote_argv(spec.cmd)
+    return _job
+
+
+def prepare_jobs(_jobs):  # starts concurrency control, output capture and the call pool if jobs need them
+    global CONCURRENCY, CAPTURE_FOLDER, OUTPUT_PUMP, CALL_POOL
+    if CONCURRENCY is None and any(_j.max_instances is not None for _j in _jobs):
+        CONCURRENCY = ConcurrencyController(CONCURRENCY_MAX_RUNNING, CONCURRENCY_QUEUE_SIZE, CONCURRENCY_OVERFLOW,
+                                            CONCURRENCY_POOLS)
+    if any(_j.capture for _j in _jobs):
+        if CAPTURE_FOLDER is None:
+            CAPTURE_FOLDER = LOG_FOLDER + "runs/"
+        try:
+            os.makedirs(CAPTURE_FOLDER, exist_ok=True)
+        except OSError:
+            error("Creation of the capture directory '" + CAPTURE_FOLDER + "' failed")
+        if TRACE:
+            trace(TRACE_DEBUG, None, "settings", "capture_folder: %s", CAPTURE_FOLDER)
+        if ENGINE != "asyncio" and OUTPUT_PUMP is None:
+            OUTPUT_PUMP = OutputPump()
+            OUTPUT_PUMP.start()
+    if ENGINE != "asyncio":  # cold start of zygotes is paid before the first run
+        for _zygote in {_j.zygote for _j in _jobs if _j.zygote is not None}:
+            if _zygote.sock is None:
+                _zygote.start()
+    if CALL_POOL is None and any(_j.call is not None for _j in _jobs):
+        CALL_POOL = CallPool(CALL_WORKERS, CALL_MAX_TASKS, CALL_MAX_RSS)
+        atexit.register(CALL_POOL.close)
+
+
+def file_digest(file_name):
+    if path.isdir(file_name):  # included directory, changed by added and removed files
+        return hashlib.sha256("\n".join(sorted(os.listdir(file_name))).encode()).hexdigest()
+    with open(file_name, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_config_cache(cache_file):  # (settings, [JobSpec], [included file]) or None if any input file has changed
+    paused = gc.isenabled()
+    gc.disable()  # collections triggered by every few hundred loaded objects take most of the time
+    try:
+        with open(cache_file, "rb") as f:
+            cache = pickle.load(f)
+    except Exception:  # missing, damaged or written by other psd
+        return None
+    finally:
+        if paused:
+            gc.enable()
+    if cache.get("version") != CONFIG_CACHE_VERSION:
+        return None
+    for file_name, mtime, size, digest in cache["files"]:
+        try:
+            st = os.stat(file_name)
+        except OSError:
+            return None
+        if st.st_size != size:
+            return None
+        # mtime can miss a change made in the same second the cache was written
+        if st.st_mtime_ns == mtime and mtime < cache["written"] - 2 * 10 ** 9:
+            continue
+        if file_digest(file_name) != digest:
+            return None
+    return cache["settings"], cache["specs"], [_f[0] for _f in cache["files"][2:]]
+
+
+def save_config_cache(cache_file, settings, specs, files):
+    settings = {_k: _v for _k, _v in settings.items() if _k != "jobs"}  # jobs are kept compiled in specs
+    cache = {"version": CONFIG_CACHE_VERSION, "written": time.time_ns(), "settings": settings, "specs": specs,
+             "files": []}
+    for file_name in files:
+        st = os.stat(file_name)
+        cache["files"].append((file_name, st.st_mtime_ns, st.st_size, file_digest(file_name)))
+    try:
+        with open(cache_file + ".tmp", "wb") as f:
+            pickle.dump(cache, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(cache_file + ".tmp", cache_file)
+    except OSError as e:
+        info("Config cache '" + cache_file + "' is not written: " + str(e))
+
+
+def missed_starts(schedule, first, upto):
+    # starts in [first, upto), counted from the rules of schedule without stepping through the missed windows
+    if upto is None or first >= upto:
+        return 0
+    start = schedule.start
+    if start.is_month:
+        months = (upto.year - first.year) * 12 + upto.month - first.month
+        if start.months is not None:
+            years, rest = divmod(months, 12)
+            count = years * len(start.months) + sum(1 for _i in range(rest)
+                                                    if (first.month + _i - 1) % 12 + 1 in start.months)
         else:
-            error("Field 'name' is not found in job!")
-    if "cmd" not in js:
-        error("Field 'cmd' is not found in job!\nJob name: " + js["name"])
-    if "schedule" not in js:
-        error("Field 'schedule' is not found in job!\nJob name: " + js["name"])
-    if "start" not in js["schedule"]:
-        error("Field 'start' is not found in job{schedule}!\nJob name: " + js["name"])
-    if "when_finished" in js["schedule"]["start"]:
-        if not isinstance(js["schedule"]["start"]["when_finished"], bool):
-            error("Field 'when_finished' in job{schedule{start}} is not bool! Found "
-                  + str(js["schedule"]["start"]["day"])
-                  + ".\nPossible values:true, false."
-                  + "\nJob name: " + js["name"])
+            count = -(-months // start.month_step)
+    else:
+        if start.dow is not None or schedule.finish.dow is not None:
+            period = timedelta(days=7)
         else:
-            _when_finished = js["schedule"]["start"]["when_finished"]
-    if "day" in js["schedule"]["start"]:
-        if isinstance(js["schedule"]["start"]["day"], str):
-            if not is_dow(js["schedule"]["start"]["day"]):
-                error("Field 'day' in job{schedule{start}} is not days of week! Found "
-                      + str(js["schedule"]["start"]["day"])
-                      + ".\nPossible values:'mon', 'tue', 'wed', 'thu', 'fri','sat', 'sun'."
-                      + "\nJob name: " + js["name"])
-        elif not isinstance(js["schedule"]["start"]["day"], int):
-            error("Field 'day' in job{schedule{start}} is not int!\nJob name: " + js["name"])
-    if "time" not in js["schedule"]["start"]:
-        if "month" in js["schedule"]["start"]:
-            if isinstance(js["schedule"]["start"]["month"]["values"], list):
-                for month in js["schedule"]["start"]["month"]["values"]:
-                    if not is_month(month):
-                        error("Element of list 'values' in job{schedule{start{month}}} is not month! Found "
-                              + str(month)
-                              + ".\nPossible values: 'jan', 'feb', 'mar', 'apr', 'may','jun', 'jul', 'aug', 'sep', "
-                                "'oct', 'nov', 'dec'.\nJob name: " + js["name"])
-            elif not isinstance(js["schedule"]["start"]["month"]["values"], int):
-                error("Field 'values' in job{schedule{start{month}}} is not int!\nJob name: " + js["name"])
-            if isinstance(js["schedule"]["start"]["month"]["day"], str):
-                if not is_dow(js["schedule"]["start"]["month"]["day"]):
-                    error("Field 'day' in job{schedule{start{month}}} is not day of week! Found "
-                          + str(js["schedule"]["start"]["month"]["day"])
-                          + ".\nPossible values: 'mon', 'tue', 'wed', 'thu', 'fri','sat', 'sun'.\nJob name: " + js[
-                              "name"])
-                if "each" in js["schedule"]["start"]["month"]:
-                    if not isinstance(js["schedule"]["start"]["month"]["each"], int):
-                        error("Field 'each' in job{schedule{start{month}}} is not int!\nJob name: " + js["name"])
+            period = timedelta(days=max(start.day + schedule.finish.day, 1))
+        count = -((first - upto) // period)
+    return max(count, 1)
+
+
+def ran_in_window(job):  # a run of job has started in its current run window
+    return job.last_start is not None and job.start_datetime is not None and job.last_start >= job.start_datetime
+
+
+def next_window(job, now):  # the run window has passed, job moves to its next window
+    job.job = None
+    job.start_datetime = None
+    job.stop_datetime = None
+    job.dt_month = None
+    if isinstance(job, JobRep):
+        job.is_start = False
+        job.next_repeat = None
+    job.init_start_dt(now)
+    job.init_stop_dt(now)
+
+
+def missed_runs(job, first, cause):  # job has been moved past the starts it missed, catch-up runs follow its policy
+    count = missed_starts(job.schedule, first, job.start_datetime)
+    runs = 0
+    if job.catch_up == "once":
+        runs = 1
+    elif job.catch_up == "all":
+        runs = min(count, job.catch_up_max)
+    info("[ Job '" + job.name + "' missed " + str(count) + " starts since " + str(first) + " while psd was " + cause
+         + ", catch-up runs: " + str(runs) + ", the next start is " + str(job.start_datetime) + " ]")
+    if METRICS is not None:
+        METRICS.inc("psd_job_missed_starts_total", (("job", job.name),), count)
+    if runs > 0 and CATCH_UP is not None:
+        CATCH_UP.add(job, runs)
+
+
+def pass_window(job, now):  # job moves past its passed run window, None or the first start it has missed
+    if ran_in_window(job):  # try_stop leaves the window of a job without start "day" as it was
+        next_window(job, job.stop_datetime)
+        if job.stop_datetime is None or job.stop_datetime >= now:
+            return None
+    first = job.start_datetime
+    next_window(job, now)
+    return first
+
+
+def catch_up(job):  # run window of job has passed while the job was idle, without a run psd was stalled
+    first = pass_window(job, datetime.datetime.now())
+    if first is not None:
+        missed_runs(job, first, "stalled")
+
+
+class CatchUpRunner:
+    # Starts runs missed by jobs while psd was stopped or stalled. Catch-up runs of all jobs are started one at a
+    # time, at most one every interval seconds, so a restart after a long outage doesn't start them all at once.
+    # The next catch-up run of a job waits for its previous one. A catch-up run is stopped like a run of its job
+    # once it has lasted as long as the run window of the job, at the latest at the finish time of the window the
+    # job has been moved to. Sits in the scheduler heap like a job.
+    def __init__(self, interval):
+        self.name = "catch-up"
+        self.interval = timedelta(seconds=interval)
+        self.scheduler = None  # set when the schedule starts
+        self.pending = collections.deque()  # [job, runs left]
+        self.running = {}  # job -> [its catch-up run, when the run is stopped or None]
+        self.next_start = datetime.datetime.min
+        self.started = 0
+
+    def attach(self, scheduler):
+        self.scheduler = scheduler
+        scheduler.add(self, self.next_wakeup(datetime.datetime.now()))
+
+    def add(self, job, runs):
+        self.pending.append([job, runs])
+        if self.scheduler is not None and len(self.pending) == 1:
+            self.scheduler.add(self, self.next_wakeup(datetime.datetime.now()))
+
+    def forget(self, job):  # job is dropped by reload, its catch-up run is stopped as at the finish time
+        self.pending = collections.deque(_e for _e in self.pending if _e[0] is not job)
+        run = self.running.pop(job, None)
+        if run is not None and run[0].poll() is None:
+            stop_process(run[0], True)
+
+    def deadline(self, job, now):  # None - the job has no finish time
+        if job.start_datetime is None or job.stop_datetime is None:
+            return None
+        return min(now + (job.stop_datetime - job.start_datetime), job.stop_datetime)
+
+    def tick(self):
+        now = datetime.datetime.now()
+        if SHUTDOWN is not None:
+            return
+        for job, run in list(self.running.items()):
+            if run[0].poll() is not None:
+                del self.running[job]
+            elif run[1] is not None and run[1] <= now:
+                stop_process(run[0], True)
+                stop_msg(job.name, str(now))
+                run[1] = None  # the next catch-up run of the job waits until this one is reaped
+        if now < self.next_start:
+            return
+        for entry in self.pending:
+            job = entry[0]
+            if job in self.running:
+                continue
+            job.due = now  # lag of a catch-up run is counted from its start, not from the missed one
+            job.noticed = now
+            self.running[job] = [spawn(job), self.deadline(job, now)]
+            start_msg_short(job.name, now)
+            self.started += 1
+            self.next_start = now + self.interval
+            entry[1] -= 1
+            if entry[1] == 0:
+                self.pending.remove(entry)
+            break
+
+    def next_wakeup(self, now):  # None - nothing to start or stop
+        if SHUTDOWN is not None:
+            return None
+        wakeups = [_r[1] for _r in self.running.values() if _r[1] is not None]
+        if self.pending:
+            wakeups.append(max(self.next_start, now))
+        return min(wakeups, default=None)
+
+
+class RestoredRun:
+    # Popen-like handle of a run which took place before psd was restarted: the job is not started again in the same
+    # run window and is finished at its finish time as usual.
+    def __init__(self, returncode):
+        self.pid = None
+        self.returncode = returncode if returncode is not None else 0
+
+    def __repr__(self):
+        return "<RestoredRun: returncode: " + str(self.returncode) + ">"
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        pass
+
+
+def job_snapshot(job):  # schedule state of job which is kept by StateStore, is_stop is set by shutdown only
+    month = None
+    if job.dt_month is not None:
+        month = (job.dt_month._dt, job.dt_month._iterator)
+    if isinstance(job, JobRep):
+        return (job.start_datetime, job.stop_datetime, month, job.next_repeat, job.is_start, False,
+                job.last_start, job.exit_code, job.end_datetime)
+    return (job.start_datetime, job.stop_datetime, month, None, False, job.job is not None,
+            job.last_start, job.exit_code, job.end_datetime)
+
+
+def state_text(value):
+    return str(value) if value is not None else None
+
+
+def state_dt(value):
+    return datetime.datetime.fromisoformat(value) if value is not None else None
+
+
+def state_row(name, digest, snapshot, updated):  # row of table job_state
+    start, stop, month, repeat, is_start, ran, last_start, exit_code, end = snapshot
+    state = json.dumps({"start": state_text(start), "stop": state_text(stop),
+                        "month": [state_text(month[0]), month[1]] if month is not None else None,
+                        "repeat": state_text(repeat), "is_start": is_start, "ran": ran,
+                        "last_start": state_text(last_start), "exit_code": exit_code, "end": state_text(end)})
+    next_fire = repeat if is_start else start
+    return (name, digest, state, state_text(last_start), state_text(end), exit_code, state_text(next_fire), updated)
+
+
+def restore_job(job, state, now):  # None, or the first start missed while psd was stopped, job moves past it
+    start = state_dt(state["start"])
+    stop = state_dt(state["stop"])
+    job.start_datetime = start
+    job.stop_datetime = stop
+    if job.dt_month is not None and state["month"] is not None:
+        job.dt_month._dt = state_dt(state["month"][0])
+        job.dt_month._iterator = state["month"][1]
+    job.last_start = state_dt(state["last_start"])
+    job.exit_code = state["exit_code"]
+    job.end_datetime = state_dt(state["end"])
+    if isinstance(job, JobRep):
+        job.next_repeat = state_dt(state["repeat"])
+        job.is_start = state["is_start"]
+    elif state["ran"]:
+        job.job = RestoredRun(job.exit_code)
+    if stop is None or stop >= now:
+        return None
+
+    # the run window has closed while psd was stopped, the finish of the next window follows the next start
+    job.job = None
+    if isinstance(job, JobRep):
+        job.is_start = False
+    job.stop_datetime = None
+    job.init_stop_dt(now)
+    if start is None or start >= now or job.stop_datetime is None or job.stop_datetime >= now:
+        return None
+    return pass_window(job, now)
+
+
+class StateStore(threading.Thread):
+    # Keeps schedule state of every job in SQLite database in WAL mode: start and finish of the run window, the next
+    # repeat, the last run and its exit code. save() only compares the state with the saved one and puts a changed
+    # state to the queue, the thread commits the queued states every commit_interval seconds in one transaction.
+    # At start the state of a job is restored if the job is not changed in settings.
+    def __init__(self, file_name, commit_interval):
+        super().__init__(name="psd-state", daemon=True)
+        self.file_name = file_name
+        self.commit_interval = commit_interval
+        self.digests = {}  # job name -> digest of its spec
+        self.saved = {}  # job name -> the last saved snapshot
+        self.failed = False
+        self._queue = queue.SimpleQueue()
+        db = sqlite3.connect(file_name)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS job_state (name TEXT PRIMARY KEY, spec TEXT NOT NULL, "
+                       "state TEXT NOT NULL, last_start TEXT, last_end TEXT, exit_code INTEGER, next_fire TEXT, "
+                       "updated TEXT NOT NULL)")
+            rows = db.execute("SELECT name, spec, state FROM job_state")
+            self.records = {_row[0]: (_row[1], _row[2]) for _row in rows}  # name -> (digest, state)
+        finally:
+            db.close()
+
+    def track(self, loaded):  # [(JobSpec, job)] of settings, states of other jobs are deleted
+        digests = {_spec.name: hashlib.sha1(repr(_spec.row()).encode()).hexdigest() for _spec, _job in loaded}
+        for name in set(self.records) | set(self.digests):
+            if name not in digests:
+                self._queue.put((name, None, None))
+        for name, digest in digests.items():
+            if self.digests.get(name) != digest:
+                self.saved.pop(name, None)
+        self.records = {_name: _r for _name, _r in self.records.items() if _name in digests}
+        self.digests = digests
+
+    def restore(self, loaded, now):  # every job is saved, so starts missed before its first run are found too
+        restored = 0
+        for spec, _job in loaded:
+            record = self.records.get(spec.name)
+            if record is not None and record[0] == self.digests[spec.name] and not _job.schedule.start.is_now:
+                first = restore_job(_job, json.loads(record[1]), now)
+                if first is None:
+                    restored += 1
                 else:
-                    error("Field 'each' is not found in job{schedule{start{month}}}!\nJob name: " + js["name"])
-            elif not isinstance(js["schedule"]["start"]["month"]["day"], int):
-                error("Field 'day' in job{schedule{start{month}}} is not int!\nJob name: " + js["name"])
-            if "time" not in js["schedule"]["start"]["month"]:
-                error("Field 'time' is not found in job{schedule{start{month}}}!\nJob name: " + js["name"])
-            elif not is_time_format(js["schedule"]["start"]["month"]["time"]):
-                error("Field 'time' has wrong pattern! Expected ##:##, actual " + str(
-                    js["schedule"]["start"]["month"]["time"]) + "\nJob name: " + js["name"])
+                    missed_runs(_job, first, "stopped")
+            self.save(_job)
+        self.records = {}
+        info("[ State of " + str(restored) + " jobs is restored from '" + self.file_name + "' ]")
+
+    def save(self, job):  # called after every tick of the job
+        if SHUTDOWN is not None or not isinstance(job, (Job, JobRep)):
+            return
+        snapshot = job_snapshot(job)
+        if self.saved.get(job.name) != snapshot:
+            self.saved[job.name] = snapshot
+            self._queue.put((job.name, self.digests.get(job.name), snapshot))
+
+    def close(self):
+        if self.is_alive():
+            self._queue.put(None)
+            self.join()
+
+    def run(self):
+        db = sqlite3.connect(self.file_name)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        pending = {}
+        commit_at = 0
+        while True:
+            timeout = max(commit_at - time.monotonic(), 0) if pending else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ""
+            if item is None:
+                break
+            if item:
+                if not pending:
+                    commit_at = time.monotonic() + self.commit_interval
+                pending[item[0]] = item
+            if pending and time.monotonic() >= commit_at:
+                self._commit(db, pending)
+                pending = {}
+        if pending:
+            self._commit(db, pending)
+        db.close()
+
+    def _commit(self, db, pending):
+        updated = str(datetime.datetime.now())
+        rows = [state_row(_name, _digest, _snapshot, updated) for _name, _digest, _snapshot in pending.values()
+                if _digest is not None]
+        forgotten = [(_name,) for _name, _digest, _snapshot in pending.values() if _digest is None]
+        try:
+            with db:
+                db.executemany("INSERT OR REPLACE INTO job_state VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                db.executemany("DELETE FROM job_state WHERE name = ?", forgotten)
+            self.failed = False
+        except sqlite3.Error as e:
+            if not self.failed:  # reported once until the next successful commit
+                info("[ Job state is not saved to '" + self.file_name + "': " + str(e) + " ]")
+            self.failed = True
+
+
+def retire_job(job):  # job is dropped by reload, its process is stopped as at the finish time
+    if isinstance(job, JobRep):
+        job.is_stop = True
+    if CATCH_UP is not None:
+        CATCH_UP.forget(job)
+    proc = job.job
+    job.job = None  # exit of the process doesn't wake the job up
+    if proc is not None and proc.poll() is None:
+        if isinstance(proc, CallRun):  # the call of a dropped job may be stuck, its executor is stopped
+            proc.kill()
+        else:
+            stop_process(proc, True)
+        stop_msg(job.name, str(datetime.datetime.now()))
+
+
+class ConfigReloader:
+    # Polls mtime and size of settings file and job files. On a change the jobs are compiled again and matched
+    # with the running ones by name: only added, changed and removed jobs are rebuilt, unchanged jobs keep their
+    # processes and schedule state. Sits in the scheduler heap like a job.
+    def __init__(self, scheduler, f_name, working_dir, settings, loaded, included, interval):
+        self.scheduler = scheduler
+        self.name = "reload"
+        self.f_name = f_name
+        self.working_dir = working_dir
+        self.settings = {_k: _v for _k, _v in settings.items() if _k != "jobs"}
+        self.loaded = loaded  # [(JobSpec, job)]
+        self.interval = timedelta(seconds=interval)
+        self.files = [f_name] + included
+        self.stamp = self.file_stamp()
+
+    def file_stamp(self):
+        stamp = []
+        for file_name in self.files:
+            try:
+                st = os.stat(file_name)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return stamp
+
+    def tick(self):
+        stamp = self.file_stamp()
+        if stamp != self.stamp:
+            self.stamp = stamp
+            gc.disable()  # jobs are built as a batch, see the start of psd
+            try:
+                self.reload()
+            finally:
+                gc.enable()
+
+    def next_wakeup(self, now):
+        return now + self.interval
+
+    def reload(self):
+        try:
+            settings = json.load(open(self.f_name, encoding=ENCODING))
+            specs, included = compile_jobs(settings, self.working_dir)
+        except Exception as e:  # half-written or wrong settings, the running jobs are kept
+            info("[ Reload of '" + self.f_name + "' failed, jobs are not changed: " + str(e) + " ]")
+            return
+        self.files = [self.f_name] + included
+        self.stamp = self.file_stamp()
+        if CONFIG_CACHE:
+            save_config_cache(self.f_name + ".cache", settings, specs,
+                              [self.f_name, path.realpath(__file__)] + included)
+        if {_k: _v for _k, _v in settings.items() if _k != "jobs"} != self.settings:
+            info("[ Settings other than jobs are applied after restart ]")
+
+        old = collections.defaultdict(list)
+        for spec, _job in self.loaded:
+            old[spec.name].append((spec, _job))
+        loaded = []
+        added = []
+        changed = 0
+        now = datetime.datetime.now()
+        for spec in specs:
+            if old[spec.name]:
+                old_spec, _job = old[spec.name].pop(0)
+                if old_spec.row() == spec.row():
+                    loaded.append((old_spec, _job))
+                    continue
+                self.scheduler.remove(_job)
+                retire_job(_job)
+                changed += 1
+            _job = make_job(spec, is_shell, now)
+            loaded.append((spec, _job))
+            added.append(_job)
+        removed = [_job for _pairs in old.values() for _spec, _job in _pairs]
+        for _job in removed:
+            self.scheduler.remove(_job)
+            retire_job(_job)
+
+        self.loaded = loaded
+        if STATE is not None:
+            STATE.track(loaded)
+            for _job in added:
+                STATE.save(_job)
+        jobs[:] = [_job for spec, _job in loaded if spec.repeat is None]
+        jobs_r[:] = [_job for spec, _job in loaded if spec.repeat is not None]
+        prepare_jobs(added)
+        now = datetime.datetime.now()
+        self.scheduler.add_many([(_job, _job.next_wakeup(now)) for _job in added])
+        gc.unfreeze()  # dropped jobs and garbage of the reload are collected, then the table is frozen again
+        gc.collect()
+        gc.freeze()
+        info("[ Jobs reloaded at " + str(now) + ": " + str(len(added) - changed) + " added, " + str(changed)
+             + " changed, " + str(len(removed)) + " removed ]")
+
+
+class Metrics:
+    # Counters, gauges and histograms of psd in Prometheus text format. Updated by the scheduler, read by the HTTP
+    # endpoint thread and the textfile exporter. An update is a dict lookup and an addition under a lock, the text
+    # is formatted from a copy taken under the lock.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kinds = {}  # name -> (type, help)
+        self._values = {}  # name -> {labels: value}, labels - tuple of (label, value), histogram value - counts
+        self._buckets = {}  # histogram name -> upper bounds
+        self._functions = {}  # name -> function, value read at render time, None - no value
+
+    def register(self, name, kind, help_text, function=None, buckets=None):
+        self._kinds[name] = (kind, help_text)
+        if function is not None:
+            self._functions[name] = function
         else:
-            error("Field 'month' in job{schedule{start}} is not defined! Define 'time' or 'month'\n"
-                  "Job name: " + js["name"])
+            self._values[name] = {}
+        if buckets is not None:
+            self._buckets[name] = buckets
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            values = self._values[name]
+            values[labels] = values.get(labels, 0) + value
+
+    def set(self, name, labels, value):
+        with self._lock:
+            self._values[name][labels] = value
+
+    def observe(self, name, labels, value):  # counts of every bucket and +Inf, then the sum
+        buckets = self._buckets[name]
+        with self._lock:
+            values = self._values[name]
+            counts = values.get(labels)
+            if counts is None:
+                counts = values[labels] = [0] * (len(buckets) + 1) + [0]
+            counts[bisect.bisect_left(buckets, value)] += 1
+            counts[-1] += value
+
+    def render(self):
+        computed = {_name: _function() for _name, _function in self._functions.items()}
+        with self._lock:
+            values = {_name: {_labels: list(_v) if isinstance(_v, list) else _v for _labels, _v in _values.items()}
+                      for _name, _values in self._values.items()}
+        lines = []
+        for name, (kind, help_text) in self._kinds.items():
+            lines.append("# HELP " + name + " " + help_text)
+            lines.append("# TYPE " + name + " " + kind)
+            if name in computed:
+                if computed[name] is not None:
+                    lines.append(name + " " + str(computed[name]))
+                continue
+            if kind != "histogram":
+                for labels, value in values[name].items():
+                    lines.append(name + metric_labels(labels) + " " + str(value))
+                continue
+            bounds = ["le=\"" + str(_b) + "\"}" for _b in self._buckets[name] + ("+Inf",)]
+            for labels, counts in values[name].items():
+                text = metric_labels(labels)
+                prefix = name + "_bucket" + (text[:-1] + "," if text else "{")
+                total = 0
+                for bound, count in zip(bounds, counts):
+                    total += count
+                    lines.append(prefix + bound + " " + str(total))
+                lines.append(name + "_sum" + text + " " + str(counts[-1]))
+                lines.append(name + "_count" + text + " " + str(total))
+        return "\n".join(lines) + "\n"
+
+
+def metric_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(_k + '="' + _v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+                          for _k, _v in labels) + "}"
+
+
+def make_metrics(jobs, jobs_r):
+    metrics = Metrics()
+    metrics.register("psd_job_runs_started_total", "counter", "Processes started, by job.")
+    metrics.register("psd_job_runs_finished_total", "counter", "Processes finished, by job and exit code.")
+    metrics.register("psd_job_runs_killed_total", "counter",
+                     "Processes stopped by psd at finish time, on reload or shutdown, by job.")
+    metrics.register("psd_job_last_exit_code", "gauge", "Exit code of the last finished process, by job.")
+    metrics.register("psd_job_run_duration_seconds", "histogram", "Run time of processes, by job.",
+                     buckets=METRICS_DURATION_BUCKETS)
+    metrics.register("psd_job_schedule_lag_seconds", "histogram",
+                     "Time from the due time of job to the start of its process, by job.", buckets=METRICS_LAG_BUCKETS)
+    metrics.register("psd_tick_duration_seconds", "histogram", "Time of one scheduler pass over due jobs.",
+                     buckets=METRICS_TICK_BUCKETS)
+    metrics.register("psd_running_processes", "gauge", "Job processes running now.",
+                     lambda: len(SUPERVISOR) if SUPERVISOR is not None else 0)
+    metrics.register("psd_jobs", "gauge", "Jobs in the job table.", lambda: len(jobs) + len(jobs_r))
+    metrics.register("psd_run_queue_depth", "gauge", "Runs waiting for a concurrency limit.",
+                     lambda: len(CONCURRENCY.queue) if CONCURRENCY is not None else None)
+    metrics.register("psd_runs_dropped_total", "counter", "Runs dropped by concurrency limits.",
+                     lambda: CONCURRENCY.dropped if CONCURRENCY is not None else None)
+    metrics.register("psd_job_missed_starts_total", "counter",
+                     "Starts missed while psd was stopped or stalled, by job.")
+    metrics.register("psd_catch_up_runs_total", "counter", "Catch-up runs of missed starts.",
+                     lambda: CATCH_UP.started if CATCH_UP is not None else None)
+    metrics.register("psd_tick_overruns_total", "counter", "Scheduler passes longer than the tick budget.",
+                     lambda: TIMING.overruns if TIMING is not None else None)
+    return metrics
+
+
+def run_started(job, proc):  # call only if METRICS is set
+    proc.started_at = time.monotonic()
+    labels = (("job", job.name),)
+    METRICS.inc("psd_job_runs_started_total", labels)
+    due = getattr(job, "due", None)  # not before the job was armed, see Scheduler
+    if due is not None:
+        METRICS.observe("psd_job_schedule_lag_seconds", labels,
+                        max((datetime.datetime.now() - due).total_seconds(), 0))
+
+
+def run_finished(job, proc):  # call only if METRICS is set
+    labels = (("job", job.name),)
+    METRICS.inc("psd_job_runs_finished_total", labels + (("exit_code", str(proc.returncode)),))
+    METRICS.set("psd_job_last_exit_code", labels, proc.returncode)
+    if getattr(proc, "stopped", False):
+        METRICS.inc("psd_job_runs_killed_total", labels)
+    started_at = getattr(proc, "started_at", None)
+    if started_at is not None:
+        METRICS.observe("psd_job_run_duration_seconds", labels, time.monotonic() - started_at)
+
+
+class TimingStats:
+    # For every run: the instant it was due (its wakeup in the scheduler heap), the instant the scheduler noticed
+    # it and the start of its process. For every scheduler pass over due jobs: its duration, passes longer than
+    # tick_budget are overruns. Percentiles are taken from the last TIMING_WINDOW samples.
+    def __init__(self, tick_budget):
+        self.tick_budget = tick_budget
+        self.runs = 0
+        self.ticks = 0
+        self.overruns = 0
+        self.notice_lag = collections.deque(maxlen=TIMING_WINDOW)  # seconds
+        self.start_lag = collections.deque(maxlen=TIMING_WINDOW)
+        self.tick_time = collections.deque(maxlen=TIMING_WINDOW)
+        self.notice_lag_max = 0.0
+        self.start_lag_max = 0.0
+        self.tick_max = 0.0
+
+    def run(self, job):  # process of the job has just started
+        due = getattr(job, "due", None)
+        if due is None:
+            return
+        started = datetime.datetime.now()
+        notice_lag = (job.noticed - due).total_seconds()
+        start_lag = (started - due).total_seconds()
+        self.runs += 1
+        self.notice_lag.append(notice_lag)
+        self.start_lag.append(start_lag)
+        self.notice_lag_max = max(self.notice_lag_max, notice_lag)
+        self.start_lag_max = max(self.start_lag_max, start_lag)
+        timing_msg(job.name, due, job.noticed, started)
+
+    def tick(self, duration, job_count):
+        self.ticks += 1
+        self.tick_time.append(duration)
+        self.tick_max = max(self.tick_max, duration)
+        if duration > self.tick_budget:
+            self.overruns += 1
+            overrun_msg(duration, self.tick_budget, job_count)
+
+    def summary(self):
+        return {"runs": self.runs,
+                "notice_lag_p50": percentile(self.notice_lag, 0.5), "notice_lag_p99": percentile(self.notice_lag, 0.99),
+                "notice_lag_max": self.notice_lag_max,
+                "start_lag_p50": percentile(self.start_lag, 0.5), "start_lag_p99": percentile(self.start_lag, 0.99),
+                "start_lag_max": self.start_lag_max,
+                "ticks": self.ticks, "tick_p50": percentile(self.tick_time, 0.5),
+                "tick_p99": percentile(self.tick_time, 0.99), "tick_max": self.tick_max,
+                "overruns": self.overruns, "tick_budget": self.tick_budget}
+
+    def report(self):
+        timing_summary_msg(self.summary())
+
+
+def percentile(values, share):  # 0 for no values
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+class Profiler:
+    # --profile: calls of the functions wrapped by start_profile() are added to their phase (a phase includes the
+    # phases called inside it), tick time is also added to its job. Mode "cprofile" adds a pstats dump of the main
+    # thread, "sample" - stacks of the main thread taken every PROFILE_SAMPLE_INTERVAL seconds, in the collapsed
+    # format of flame graphs. Files '<settings file>.profile', '.pstats' and '.stacks' are written at exit and on
+    # SIGUSR1.
+    def __init__(self, mode, file_prefix):
+        self.mode = mode
+        self.file_prefix = file_prefix
+        self.began = time.perf_counter()
+        self.phases = {}  # phase -> [calls, seconds, max seconds]
+        self.job_cost = {}  # job name -> [ticks, seconds]
+        self.shutdown_began = None
+        self.cprofile = None
+        self.stacks = None
+        self.stacks_lock = threading.Lock()
+        if mode == "cprofile":
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        elif mode == "sample":
+            self.stacks = collections.Counter()
+            threading.Thread(target=self.sample, args=(threading.get_ident(),), name="profile", daemon=True).start()
+
+    def add(self, phase, seconds):
+        stat = self.phases.get(phase)
+        if stat is None:
+            stat = self.phases[phase] = [0, 0.0, 0.0]
+        stat[0] += 1
+        stat[1] += seconds
+        if seconds > stat[2]:
+            stat[2] = seconds
+
+    def timed(self, phase, function, per_job=False):  # function whose calls are added to phase
+        def wrapper(*args, **kwargs):
+            begin = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - begin
+                self.add(phase, elapsed)
+                if per_job:
+                    cost = self.job_cost.get(args[0].name)
+                    if cost is None:
+                        cost = self.job_cost[args[0].name] = [0, 0.0]
+                    cost[0] += 1
+                    cost[1] += elapsed
+        return wrapper
+
+    def sample(self, thread_id):
+        while True:
+            time.sleep(PROFILE_SAMPLE_INTERVAL)
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code.co_name + "@" + path.basename(frame.f_code.co_filename) + ":"
+                             + str(frame.f_lineno))
+                frame = frame.f_back
+            with self.stacks_lock:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def report_text(self):
+        phases = dict(self.phases)
+        if self.shutdown_began is not None:
+            elapsed = time.perf_counter() - self.shutdown_began
+            phases["shutdown"] = [1, elapsed, elapsed]
+        lines = ["psd profile at " + str(datetime.datetime.now()) + ", mode: " + self.mode + ", "
+                 + "%.3f" % (time.perf_counter() - self.began) + " s since start",
+                 "",
+                 "%-20s %12s %12s %12s %12s" % ("phase", "calls", "total s", "mean ms", "max ms")]
+        for phase, (calls, seconds, longest) in sorted(phases.items(), key=lambda _p: -_p[1][1]):
+            lines.append("%-20s %12d %12.3f %12.3f %12.3f" % (phase, calls, seconds, seconds / calls * 1000,
+                                                              longest * 1000))
+        lines += ["",
+                  "jobs by tick cost, top " + str(PROFILE_TOP_JOBS) + " of " + str(len(self.job_cost)) + ":",
+                  "%-40s %12s %12s %12s" % ("job", "ticks", "total s", "mean ms")]
+        top = sorted(self.job_cost.items(), key=lambda _j: -_j[1][1])[:PROFILE_TOP_JOBS]
+        for name, (ticks, seconds) in top:
+            lines.append("%-40s %12d %12.3f %12.3f" % (name, ticks, seconds, seconds / ticks * 1000))
+        return "\n".join(lines) + "\n"
+
+    def report(self):
+        written = [self.file_prefix + ".profile"]
+        try:
+            with open(self.file_prefix + ".profile", "w", encoding="utf-8") as f:
+                f.write(self.report_text())
+            if self.cprofile is not None:
+                self.cprofile.dump_stats(self.file_prefix + ".pstats")  # stops the profiler
+                self.cprofile.enable()
+                written.append(self.file_prefix + ".pstats")
+            if self.stacks is not None:
+                with self.stacks_lock:
+                    stacks = list(self.stacks.items())
+                with open(self.file_prefix + ".stacks", "w", encoding="utf-8") as f:
+                    for stack, count in stacks:
+                        f.write(stack + " " + str(count) + "\n")
+                written.append(self.file_prefix + ".stacks")
+        except OSError as e:
+            info("[ Profile is not written: " + str(e) + " ]")
+            return
+        info("[ Profile is written to " + ", ".join("'" + _f + "'" for _f in written) + " ]")
+
+
+def start_profile(mode, file_prefix):  # wraps the timed functions, nothing is added to them without --profile
+    global PROFILE
+    PROFILE = Profiler(mode, file_prefix)
+    for cls in (Job, JobRep):
+        cls.tick = PROFILE.timed("tick", cls.tick, True)
+        for name in ("try_start", "try_stop", "try_repeat"):
+            if hasattr(cls, name):
+                setattr(cls, name, PROFILE.timed(name, getattr(cls, name)))
+    Scheduler.run_pending = PROFILE.timed("scheduler pass", Scheduler.run_pending)
+    ConfigReloader.tick = PROFILE.timed("reload", ConfigReloader.tick)
+    phases = {"load_config_cache": "config load", "compile_jobs": "config load", "save_config_cache": "config load",
+              "make_job": "job construction", "prepare_jobs": "job construction", "start_process": "spawn",
+              "start_msg_full": "logging", "start_msg_short": "logging",
+              "stop_msg": "logging", "job_output_msg": "logging", "info": "logging", "timing_msg": "logging",
+              "overrun_msg": "logging"}
+    module = globals()
+    for name, phase in phases.items():
+        module[name] = PROFILE.timed(phase, module[name])
+
+
+def sigusr1_handler(signum, frame):  # profile report at runtime
+    PROFILE.report()
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = METRICS.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # requests are not printed
+        pass
+
+
+def start_metrics_server(address, port):  # None if the port can't be bound
+    try:
+        server = http.server.ThreadingHTTPServer((address, port), MetricsHandler)
+    except OSError as e:
+        info("[ Metrics endpoint is not started on " + str(address) + ":" + str(port) + ": " + str(e) + " ]")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    info("[ Metrics endpoint: http://" + str(address) + ":" + str(server.server_address[1]) + "/metrics ]")
+    return server
+
+
+class MetricsExporter:
+    # Writes metrics to a file in Prometheus text format (for textfile collector of node_exporter) every interval
+    # seconds and at exit. Sits in the scheduler heap like a job.
+    def __init__(self, file_name, interval):
+        self.name = "metrics"
+        self.file_name = file_name
+        self.interval = timedelta(seconds=interval)
+        self.failed = False
+
+    def write(self):
+        try:
+            with open(self.file_name + ".tmp", "w", encoding="utf-8") as f:
+                f.write(METRICS.render())
+            os.replace(self.file_name + ".tmp", self.file_name)
+            self.failed = False
+        except OSError as e:
+            if not self.failed:  # reported once until the next successful write
+                info("[ Metrics are not written to '" + self.file_name + "': " + str(e) + " ]")
+            self.failed = True
+
+    def tick(self):
+        self.write()
+
+    def next_wakeup(self, now):
+        return now + self.interval
+
+
+if __name__ == "__main__":
+    OUTPUT = make_output("console", OUTPUT_BUFFER)
+    atexit.register(close_output)
+
+    working_path = path.realpath(__file__)[:-6]  # remove psd.py
+
+    f_name = None
+    check_only = False
+    profile_mode = None
+    if len(sys.argv) == 1:
+        f_name = working_path + "psd.json"
     else:
-        if not is_time_format(js["schedule"]["start"]["time"]):
-            if js["schedule"]["start"]["time"] != "now":
-                error("Field 'time' has wrong pattern! Expected ##:##, actual " + str(js["schedule"]["start"]["time"])
-                      + "\nJob name: " + js["name"])
-    if "finish" not in js["schedule"]:
-        error("Field 'finish' is not found in job{schedule}!\nJob name: " + js["name"])
-    if "day" in js["schedule"]["finish"]:
-        if isinstance(js["schedule"]["finish"]["day"], str):
-            if not is_dow(js["schedule"]["finish"]["day"]):
-                error("Field 'day' in job{schedule{finish}} is not day of week! Found "
-                      + str(js["schedule"]["finish"]["day"])
-                      + ".\nPossible values: 'mon', 'tue', 'wed', 'thu', 'fri','sat', 'sun'.\nJob name: " + js["name"])
-        elif not isinstance(js["schedule"]["finish"]["day"], int):
-            error("Field 'day' in job{schedule{finish}} is not int!\nJob name: " + js["name"])
-    if "time" not in js["schedule"]["finish"]:
-        if "month" in js["schedule"]["finish"]:
-            if isinstance(js["schedule"]["finish"]["month"]["values"], str):
-                if not is_month(js["schedule"]["finish"]["month"]["values"]):
-                    error("Field 'values' in job{schedule{finish{month}}} is not month! Found "
-                          + str(js["schedule"]["finish"]["month"]["values"])
-                          + ".\nPossible values: 'jan', 'feb', 'mar', 'apr', 'may','jun', 'jul', 'aug', 'sep', "
-                            "'oct', 'nov', 'dec'.\nJob name: " + js["name"])
-            elif not isinstance(js["schedule"]["finish"]["month"]["values"], int):
-                error("Field 'values' in job{schedule{finish{month}}} is not int!\nJob name: " + js["name"])
-            if isinstance(js["schedule"]["finish"]["month"]["day"], str):
-                if not is_dow(js["schedule"]["finish"]["month"]["day"]):
-                    error("Field 'day' in job{schedule{finish{month}}} is not day of week! Found "
-                          + str(js["schedule"]["finish"]["month"]["day"])
-                          + ".\nPossible values: 'mon', 'tue', 'wed', 'thu', 'fri','sat', 'sun'.\nJob name: " + js[
-                              "name"])
-                if "each" in js["schedule"]["finish"]["month"]:
-                    if not isinstance(js["schedule"]["finish"]["month"]["each"], int):
-                        error("Field 'each' in job{schedule{finish{month}}} is not int!\nJob name: " + js["name"])
+        for arg in sys.argv[1:]:
+            if arg == '--debug':
+                set_trace(True)
+            elif arg == '--cache':
+                CONFIG_CACHE = True
+            elif arg == '--check':
+                check_only = True
+            elif arg == '--profile' or arg.startswith('--profile='):
+                profile_mode = arg[len('--profile='):] if '=' in arg else "phases"
+                if profile_mode not in PROFILE_MODES:
+                    error("Mode of --profile is not profile mode! Found " + profile_mode
+                          + ".\nPossible values: 'phases', 'cprofile', 'sample'.")
+            else:
+                f_name = arg
+
+    if f_name is None:
+        f_name = working_path + "psd.json"
+    if f_name == '':
+        f_name = working_path + "psd.json"
+
+    if TRACE:
+        trace(TRACE_DEBUG, None, "settings", "debug mode on")
+        trace(TRACE_DEBUG, None, "settings", "working_path: '%s'", working_path)
+        trace(TRACE_DEBUG, None, "settings", "f_name: %s", f_name)
+
+    jobs = []
+    jobs_r = []
+    if profile_mode is not None and not check_only:
+        start_profile(profile_mode, f_name)
+        atexit.register(PROFILE.report)
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, sigusr1_handler)
+
+    # The job table is built as one batch: no collections while it grows, then it is frozen, so that collections
+    # at run time don't walk through every job.
+    gc.disable()
+    cache_file = f_name + ".cache"
+    config = load_config_cache(cache_file) if CONFIG_CACHE and not check_only else None
+    if config is not None:
+        settings, specs, included = config
+        if TRACE:
+            trace(TRACE_DEBUG, None, "settings", "config cache: %s", cache_file)
+    else:
+        load_began = time.perf_counter()
+        settings = json.load(open(f_name, encoding=ENCODING))
+        if PROFILE is not None:
+            PROFILE.add("config load", time.perf_counter() - load_began)
+    if "output" in settings:
+        if "buffer" in settings["output"]:
+            OUTPUT_BUFFER = settings["output"]["buffer"]
+        output_sink = settings["output"].get("sink", "console")
+        if output_sink not in OUTPUT_SINKS:
+            error("Field 'sink' in output is not output sink! Found " + str(output_sink)
+                  + ".\nPossible values: 'console', 'plain', 'json', 'null'.")
+        set_output(make_output(output_sink, OUTPUT_BUFFER))
+    if "is_shell" not in settings:
+        is_shell = True
+    else:
+        is_shell = settings["is_shell"]
+    if TRACE:
+        trace(TRACE_DEBUG, None, "settings", "is_shell: %s", is_shell)
+    if "wait_repeated_jobs" not in settings:
+        error("Field 'wait_repeated_jobs' not found in " + str(f_name) + "!")
+    else:
+        wait_rep_jobs = settings["wait_repeated_jobs"]
+        if TRACE:
+            trace(TRACE_DEBUG, None, "settings", "wait_repeated_jobs: %s", wait_rep_jobs)
+
+    working_dir = working_path
+    if "working_dir" in settings:
+        working_dir = settings["working_dir"]
+    if TRACE:
+        trace(TRACE_DEBUG, None, "settings", "working_dir: %s", working_dir)
+
+    if "trace" in settings:
+        trace_error = trace_settings_error(settings["trace"])
+        if trace_error is not None:
+            error(trace_error)
+        set_trace(TRACE or settings["trace"].get("enabled", False), settings["trace"])
+
+    if "encoding" in settings:
+        ENCODING = settings["encoding"]
+    if TRACE:
+        trace(TRACE_DEBUG, None, "settings", "encoding: %s", ENCODING)
+
+    if "engine" in settings:
+        ENGINE = settings["engine"]
+        if ENGINE not in ENGINES:
+            error("Field 'engine' is not engine! Found " + str(ENGINE) + ".\nPossible values: 'default', 'asyncio'.")
+    if "exec_mode" in settings:
+        EXEC_MODE = settings["exec_mode"]
+        if EXEC_MODE not in EXEC_MODES:
+            error("Field 'exec_mode' is not exec mode! Found " + str(EXEC_MODE)
+                  + ".\nPossible values: 'legacy', 'auto'.")
+    if TRACE:
+        trace(TRACE_DEBUG, None, "settings", "engine: %s", ENGINE)
+        trace(TRACE_DEBUG, None, "settings", "exec_mode: %s, fast spawn: %s", EXEC_MODE, FAST_SPAWN)
+
+    if "shutdown" in settings:
+        if "grace" in settings["shutdown"]:
+            SHUTDOWN_GRACE = settings["shutdown"]["grace"]
+        if "timeout" in settings["shutdown"]:
+            SHUTDOWN_TIMEOUT = settings["shutdown"]["timeout"]
+    if TRACE:
+        trace(TRACE_DEBUG, None, "settings", "shutdown_grace: %s", SHUTDOWN_GRACE)
+        trace(TRACE_DEBUG, None, "settings", "shutdown_timeout: %s", SHUTDOWN_TIMEOUT)
+
+    if "concurrency" in settings:
+        if "max_running" in settings["concurrency"]:
+            CONCURRENCY_MAX_RUNNING = settings["concurrency"]["max_running"]
+        if "queue_size" in settings["concurrency"]:
+            CONCURRENCY_QUEUE_SIZE = settings["concurrency"]["queue_size"]
+        if "overflow" in settings["concurrency"]:
+            CONCURRENCY_OVERFLOW = settings["concurrency"]["overflow"]
+            if CONCURRENCY_OVERFLOW not in CONCURRENCY_OVERFLOWS:
+                error("Field 'overflow' in concurrency is not overflow policy! Found " + str(CONCURRENCY_OVERFLOW)
+                      + ".\nPossible values: 'drop', 'queue', 'replace_oldest'.")
+        if "pools" in settings["concurrency"]:
+            CONCURRENCY_POOLS = settings["concurrency"]["pools"]
+        if CONCURRENCY_MAX_RUNNING is not None and expect_positive_int(CONCURRENCY_MAX_RUNNING) is not None:
+            error("Field 'max_running' in concurrency is not positive int! Found " + str(CONCURRENCY_MAX_RUNNING) + ".")
+        if expect_positive_int(CONCURRENCY_QUEUE_SIZE) is not None:
+            error("Field 'queue_size' in concurrency is not positive int! Found " + str(CONCURRENCY_QUEUE_SIZE) + ".")
+        for pool_name, pool_size in CONCURRENCY_POOLS.items():
+            if expect_positive_int(pool_size) is not None:
+                error("Size of pool '" + str(pool_name) + "' in concurrency{pools} is not positive int! Found "
+                      + str(pool_size) + ".")
+    if "capture" in settings:
+        CAPTURE = settings["capture"].get("enabled", CAPTURE)
+        if "folder" in settings["capture"]:
+            CAPTURE_FOLDER = settings["capture"]["folder"]
+        if "max_size" in settings["capture"]:
+            CAPTURE_MAX_SIZE = settings["capture"]["max_size"]
+        if "ring_size" in settings["capture"]:
+            CAPTURE_RING_SIZE = settings["capture"]["ring_size"]
+    if "reload" in settings:
+        RELOAD = settings["reload"].get("enabled", RELOAD)
+        RELOAD_INTERVAL = settings["reload"].get("interval", RELOAD_INTERVAL)
+        if not isinstance(RELOAD_INTERVAL, (int, float)) or RELOAD_INTERVAL <= 0:
+            error("Field 'interval' in reload is not positive number! Found " + str(RELOAD_INTERVAL) + ".")
+    if "metrics" in settings:
+        METRICS_ENABLED = settings["metrics"].get("enabled", METRICS_ENABLED)
+        METRICS_ADDRESS = settings["metrics"].get("address", METRICS_ADDRESS)
+        METRICS_PORT = settings["metrics"].get("port", METRICS_PORT)
+        METRICS_TEXTFILE = settings["metrics"].get("textfile", METRICS_TEXTFILE)
+        METRICS_INTERVAL = settings["metrics"].get("interval", METRICS_INTERVAL)
+        if METRICS_PORT is not None and (not isinstance(METRICS_PORT, int) or not 0 <= METRICS_PORT <= 65535):
+            error("Field 'port' in metrics is not port number! Found " + str(METRICS_PORT) + ".")
+        if not isinstance(METRICS_INTERVAL, (int, float)) or METRICS_INTERVAL <= 0:
+            error("Field 'interval' in metrics is not positive number! Found " + str(METRICS_INTERVAL) + ".")
+    if "state" in settings:
+        STATE_ENABLED = settings["state"].get("enabled", STATE_ENABLED)
+        STATE_FILE = settings["state"].get("file", STATE_FILE)
+        STATE_COMMIT_INTERVAL = settings["state"].get("commit_interval", STATE_COMMIT_INTERVAL)
+        if not isinstance(STATE_COMMIT_INTERVAL, (int, float)) or STATE_COMMIT_INTERVAL <= 0:
+            error("Field 'commit_interval' in state is not positive number! Found " + str(STATE_COMMIT_INTERVAL)
+                  + ".")
+        if STATE_ENABLED and sqlite3 is None:
+            error("Field 'enabled' in state needs Python with sqlite3 module!")
+    if "zygotes" in settings:
+        if not hasattr(os, "fork"):
+            error("Field 'zygotes' needs os.fork, which this platform doesn't have!")
+        for zygote_name, zygote in settings["zygotes"].items():
+            preload = zygote.get("preload", [])
+            if not isinstance(preload, list) or not all(isinstance(_m, str) for _m in preload):
+                error("Field 'preload' in zygotes{" + str(zygote_name) + "} is not list of module names! Found "
+                      + str(preload) + ".")
+            ZYGOTES[zygote_name] = Zygote(zygote_name, zygote.get("python", sys.executable), preload)
+            atexit.register(ZYGOTES[zygote_name].close)
+    if "call_pool" in settings:
+        CALL_WORKERS = settings["call_pool"].get("workers", CALL_WORKERS)
+        CALL_MAX_TASKS = settings["call_pool"].get("max_tasks", CALL_MAX_TASKS)
+        CALL_MAX_RSS = settings["call_pool"].get("max_rss", CALL_MAX_RSS)
+        for field, value in (("workers", CALL_WORKERS), ("max_tasks", CALL_MAX_TASKS)):
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value <= 0):
+                error("Field '" + field + "' in call_pool is not positive int! Found " + str(value) + ".")
+        if CALL_MAX_RSS is not None and (not isinstance(CALL_MAX_RSS, (int, float)) or CALL_MAX_RSS <= 0):
+            error("Field 'max_rss' in call_pool is not positive number! Found " + str(CALL_MAX_RSS) + ".")
+    if "catch_up" in settings:
+        CATCH_UP_POLICY = settings["catch_up"].get("policy", CATCH_UP_POLICY)
+        CATCH_UP_MAX = settings["catch_up"].get("max", CATCH_UP_MAX)
+        CATCH_UP_INTERVAL = settings["catch_up"].get("interval", CATCH_UP_INTERVAL)
+        if CATCH_UP_POLICY not in CATCH_UP_POLICIES:
+            error("Field 'policy' in catch_up is not catch-up policy! Found " + str(CATCH_UP_POLICY)
+                  + ".\nPossible values: 'skip', 'once', 'all'.")
+        if expect_positive_int(CATCH_UP_MAX) is not None:
+            error("Field 'max' in catch_up is not positive int! Found " + str(CATCH_UP_MAX) + ".")
+        if not isinstance(CATCH_UP_INTERVAL, (int, float)) or CATCH_UP_INTERVAL < 0:
+            error("Field 'interval' in catch_up is not number >= 0! Found " + str(CATCH_UP_INTERVAL) + ".")
+    if "timing" in settings:
+        TIMING_ENABLED = settings["timing"].get("enabled", TIMING_ENABLED)
+        TIMING_TICK_BUDGET = settings["timing"].get("tick_budget", TIMING_TICK_BUDGET)
+        if not isinstance(TIMING_TICK_BUDGET, (int, float)) or TIMING_TICK_BUDGET <= 0:
+            error("Field 'tick_budget' in timing is not positive number! Found " + str(TIMING_TICK_BUDGET) + ".")
+
+    if TRACE:
+        trace(TRACE_DEBUG, None, "settings", "concurrency_max_running: %s", CONCURRENCY_MAX_RUNNING)
+        trace(TRACE_DEBUG, None, "settings", "concurrency_queue_size: %s", CONCURRENCY_QUEUE_SIZE)
+        trace(TRACE_DEBUG, None, "settings", "concurrency_overflow: %s", CONCURRENCY_OVERFLOW)
+        trace(TRACE_DEBUG, None, "settings", "concurrency_pools: %s", CONCURRENCY_POOLS)
+        trace(TRACE_DEBUG, None, "settings", "capture: %s", CAPTURE)
+        trace(TRACE_DEBUG, None, "settings", "capture_max_size: %s", CAPTURE_MAX_SIZE)
+        trace(TRACE_DEBUG, None, "settings", "capture_ring_size: %s", CAPTURE_RING_SIZE)
+        trace(TRACE_DEBUG, None, "settings", "reload: %s, interval: %s", RELOAD, RELOAD_INTERVAL)
+        trace(TRACE_DEBUG, None, "settings", "metrics: %s, endpoint: %s:%s, textfile: %s, interval: %s",
+              METRICS_ENABLED, METRICS_ADDRESS, METRICS_PORT, METRICS_TEXTFILE, METRICS_INTERVAL)
+        trace(TRACE_DEBUG, None, "settings", "timing: %s, tick_budget: %s", TIMING_ENABLED, TIMING_TICK_BUDGET)
+        trace(TRACE_DEBUG, None, "settings", "state: %s, file: %s, commit_interval: %s",
+              STATE_ENABLED, STATE_FILE, STATE_COMMIT_INTERVAL)
+        trace(TRACE_DEBUG, None, "settings", "catch_up: %s, max: %s, interval: %s",
+              CATCH_UP_POLICY, CATCH_UP_MAX, CATCH_UP_INTERVAL)
+        trace(TRACE_DEBUG, None, "settings", "zygotes: %s",
+              {_name: _z.preload for _name, _z in ZYGOTES.items()})
+        trace(TRACE_DEBUG, None, "settings", "call_pool: workers: %s, max_tasks: %s, max_rss: %s",
+              CALL_WORKERS, CALL_MAX_TASKS, CALL_MAX_RSS)
+
+    if check_only:  # validate settings and jobs, nothing is started
+        try:
+            specs, included = compile_jobs(settings, working_dir)
+        except ConfigError as e:
+            error(str(e))
+        info("Settings file '" + f_name + "' is correct: " + str(len(specs)) + " jobs")
+        exit(0)
+
+    if "log" in settings:
+        LOG = settings["log"]["enabled"]
+        if "folder" in settings["log"]:
+            LOG_FOLDER = settings["log"]["folder"]
+        if "prefix" in settings["log"]:
+            LOG_PREFIX = settings["log"]["prefix"]
+
+        if "buffer_size" in settings["log"]:
+            LOG_BUFFER_SIZE = settings["log"]["buffer_size"]
+        if "flush_interval" in settings["log"]:
+            LOG_FLUSH_INTERVAL = settings["log"]["flush_interval"]
+        if "compress" in settings["log"]:
+            LOG_COMPRESS = settings["log"]["compress"]
+
+        if LOG:
+            log_folder_created = False
+            if not path.isdir(LOG_FOLDER):
+                try:
+                    mkdir(LOG_FOLDER)
+                except OSError:
+                    LOG = False
+                    error("Creation of the log directory '" + LOG_FOLDER + "' failed")
                 else:
-                    error("Field 'each' is not found in job{schedule{finish{month}}}!\nJob name: " + js["name"])
-            elif not isinstance(js["schedule"]["finish"]["month"]["day"], int):
-                error("Field 'day' in job{schedule{finish{month}}} is not int!\nJob name: " + js["name"])
-            if "time" not in js["schedule"]["finish"]["month"]:
-                error("Field 'time' is not found in job{schedule{finish{month}}}!\nJob name: " + js["name"])
-            elif not is_time_format(js["schedule"]["finish"]["month"]["time"]):
-                error("Field 'time' has wrong pattern! Expected ##:##, actual " + str(
-                    js["schedule"]["finish"]["month"]["time"]) + "\nJob name: " + js["name"])
+                    log_folder_created = True
+            LOG_WRITER = LogWriter(LOG_FOLDER, LOG_PREFIX, ENCODING,
+                                   LOG_BUFFER_SIZE, LOG_FLUSH_INTERVAL, LOG_COMPRESS)
+            LOG_WRITER.start()
+            atexit.register(LOG_WRITER.close)
+            if log_folder_created:  # info() writes to the log too, so only once LOG_WRITER is started
+                info("The log directory '" + LOG_FOLDER + "' is created.")
+
+        if TRACE:
+            trace(TRACE_DEBUG, None, "settings", "log: %s", LOG)
+            trace(TRACE_DEBUG, None, "settings", "log_folder: %s", LOG_FOLDER)
+            trace(TRACE_DEBUG, None, "settings", "log_prefix: %s", LOG_PREFIX)
+            trace(TRACE_DEBUG, None, "settings", "log_buffer_size: %s", LOG_BUFFER_SIZE)
+            trace(TRACE_DEBUG, None, "settings", "log_flush_interval: %s", LOG_FLUSH_INTERVAL)
+            trace(TRACE_DEBUG, None, "settings", "log_compress: %s", LOG_COMPRESS)
+
+    if config is None:
+        try:
+            specs, included = compile_jobs(settings, working_dir)
+        except ConfigError as e:
+            error(str(e))
+        if CONFIG_CACHE:
+            save_config_cache(cache_file, settings, specs, [f_name, path.realpath(__file__)] + included)
+    loaded = []
+    schedule_now = datetime.datetime.now()
+    precompute_month_tables(schedule_now.year)
+    for spec in specs:
+        _job = make_job(spec, is_shell, schedule_now)
+        loaded.append((spec, _job))
+        if spec.repeat is not None:
+            jobs_r.append(_job)
         else:
-            error("Field 'month' in job{schedule{finish}} is not defined! Define 'time' or 'month'\n"
-                  "Job name: " + js["name"])
+            jobs.append(_job)
+    CATCH_UP = CatchUpRunner(CATCH_UP_INTERVAL)
+    if METRICS_ENABLED:
+        METRICS = make_metrics(jobs, jobs_r)
+    if STATE_ENABLED:
+        try:
+            STATE = StateStore(STATE_FILE if STATE_FILE is not None else f_name + ".state", STATE_COMMIT_INTERVAL)
+        except sqlite3.Error as e:
+            error("State file can't be opened: " + str(e))
+        STATE.track(loaded)
+        STATE.restore(loaded, datetime.datetime.now())
+        STATE.start()
+        atexit.register(STATE.close)
+
+    if "concurrency" in settings:
+        CONCURRENCY = ConcurrencyController(CONCURRENCY_MAX_RUNNING, CONCURRENCY_QUEUE_SIZE, CONCURRENCY_OVERFLOW,
+                                            CONCURRENCY_POOLS)
+    prepare_jobs(jobs + jobs_r)
+
+    if ENGINE == "asyncio":
+        SUPERVISOR = AsyncSupervisor()
     else:
-        if not is_time_format(js["schedule"]["finish"]["time"]):
-            if js["schedule"]["finish"]["time"] != "never":
-                error("Field 'time' has wrong pattern! Expected ##:##, actual " + str(js["schedule"]["finish"]["time"])
-                      + "\nJob name: " + js["name"])
-
-    if "repeat" in js:
-        if "unit" not in js["repeat"]:
-            error("Field 'unit' is not found in job{repeat}!\nJob name: " + js["name"])
-        if "val" not in js["repeat"]:
-            error("Field 'val' is not found in job{repeat}!\nJob name: " + js["name"])
-        if "wait_finished" not in js["repeat"]:
-            error("Field 'wait_finished' is not found in job{repeat}!\nJob name: " + js["name"])
-
-        jobs_r.append(JobRep(
-            js["name"],
-            js["cmd"],
-            js["schedule"],
-            is_shell,
-            _when_finished,
-            js["repeat"]))
+        SUPERVISOR = ChildSupervisor()
+    info("[ Schedule started at " + str(datetime.datetime.now()) + " ]")
+    signal.signal(signal.SIGINT, sigint_handler)
+    signal.signal(signal.SIGTERM, sigint_handler)
+    if hasattr(signal, "SIGUSR2"):
+        signal.signal(signal.SIGUSR2, sigusr2_handler)
+
+    scheduler = Scheduler(SUPERVISOR)
+    schedule_now = datetime.datetime.now()
+    scheduler.add_many([(_j, _j.next_wakeup(schedule_now)) for _j in jobs + jobs_r])
+    if RELOAD:
+        reloader = ConfigReloader(scheduler, f_name, working_dir, settings, loaded, included, RELOAD_INTERVAL)
+        scheduler.add(reloader, reloader.next_wakeup(schedule_now))
+    if TIMING_ENABLED:
+        TIMING = TimingStats(TIMING_TICK_BUDGET)
+        atexit.register(TIMING.report)
+    CATCH_UP.attach(scheduler)
+    if METRICS_ENABLED:
+        if METRICS_PORT is not None:
+            start_metrics_server(METRICS_ADDRESS, METRICS_PORT)
+        if METRICS_TEXTFILE is not None:
+            exporter = MetricsExporter(METRICS_TEXTFILE, METRICS_INTERVAL)
+            scheduler.add(exporter, exporter.next_wakeup(schedule_now))
+            atexit.register(exporter.write)
+    if TRACE:
+        trace(TRACE_DEBUG, None, "settings",
+              "scheduler: %s jobs armed, next wakeup: %s", len(scheduler), scheduler.next_time())
+    gc.freeze()
+    gc.enable()
+    if ENGINE == "asyncio":
+        asyncio.run(run_async(scheduler))
     else:
-        jobs.append(Job(
-            js["name"],
-            js["cmd"],
-            js["schedule"],
-            _when_finished,
-            is_shell))
-
-print("[ Schedule started at " + str(datetime.datetime.now()) + " ]")
-signal.signal(signal.SIGINT, sigint_handler)
-
-while True:
-    for j in jobs:
-        if j.try_start():
-            j.try_stop()
-    for jr in jobs_r:
-        if jr.try_start():
-            if not jr.try_stop():
-                jr.try_repeat()
-    time.sleep(1)
-
+        scheduler.run()
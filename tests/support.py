@@ -0,0 +1,96 @@
+# Copyright (C) 2020  ViiSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# psd.py loaded as a module for the tests: the output is dropped, info() messages are kept in psd.messages, job
+# processes are FakeRun objects kept in psd.runs and the time is read from a Clock which the test sets.
+
+import datetime
+import pathlib
+import sys
+import types
+
+PSD_FILE = pathlib.Path(__file__).absolute().parent.parent / "psd.py"
+CODE = compile(PSD_FILE.read_text(), str(PSD_FILE), "exec")
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def set(self, *args):  # clock.set(2020, 5, 4, 10, 0)
+        self.now = datetime.datetime(*args)
+
+    def move(self, **kwargs):  # clock.move(minutes=1)
+        self.now += datetime.timedelta(**kwargs)
+
+
+class FakeRun:  # Popen-like run of a job, ends when the test calls end()
+    def __init__(self, job):
+        self.job = job
+        self.args = job.cmd
+        self.pid = None
+        self.returncode = None
+        self.stopped = False
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):  # stop_process() of a run without pid
+        self.returncode = -9
+
+    def end(self, returncode=0):
+        self.returncode = returncode
+
+
+def clock_datetime(clock):  # datetime module of psd with now() and today() read from clock
+    class ClockDateTime(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock.now
+
+        @classmethod
+        def today(cls):
+            return clock.now
+
+    class ClockDate(datetime.date):
+        @classmethod
+        def today(cls):
+            return clock.now.date()
+
+    module = types.ModuleType("datetime")
+    module.__dict__.update(datetime.__dict__)
+    module.datetime = ClockDateTime
+    module.date = ClockDate
+    return module
+
+
+def load(now):  # (psd module, Clock), every test gets its own psd with the default settings
+    clock = Clock(now)
+    psd = types.ModuleType("psd")
+    psd.__file__ = str(PSD_FILE)
+    sys.modules["psd"] = psd
+    exec(CODE, psd.__dict__)
+    psd.set_output(psd.make_output("null", psd.OUTPUT_BUFFER))
+    psd.datetime = clock_datetime(clock)
+    psd.runs = []  # every FakeRun started, in order
+    psd.popen = lambda _job: psd.runs.append(FakeRun(_job)) or psd.runs[-1]
+    psd.messages = []  # every info() message, in order
+    psd.info = psd.messages.append
+    return psd, clock
+
+
+def job(psd, js, now=None):  # job of psd built from the settings of one job as make_job() does at start
+    spec = psd.JobSpec(js, js["schedule"]["start"].get("when_finished", False))
+    return psd.make_job(spec, False, now)
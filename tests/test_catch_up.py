@@ -0,0 +1,187 @@
+# Copyright (C) 2020  ViiSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Catch-up: a run window which has passed without a run is missed, the job moves to its next window and catch-up
+# runs follow its policy. A window with a run is never missed.
+
+import datetime
+import json
+import unittest
+
+import support
+
+T0 = datetime.datetime(2020, 5, 4, 9, 59)
+
+
+def window_job(catch_up, start=None, repeat=None, **fields):
+    js = {"name": "j", "cmd": "true", "catch_up": catch_up,
+          "schedule": {"start": dict({"time": "10:00"}, **(start or {})), "finish": {"time": "10:30"}}}
+    if repeat is not None:
+        js["repeat"] = repeat
+    js.update(fields)
+    return js
+
+
+class CatchUpTest(unittest.TestCase):
+    def setUp(self):
+        self.psd, self.clock = support.load(T0)
+        self.psd.CATCH_UP = self.psd.CatchUpRunner(0)
+
+    def at(self, day, hour, minute, second=0):
+        return datetime.datetime(2020, 5, day, hour, minute, second)
+
+    def missed(self):
+        return [_m for _m in self.psd.messages if " missed " in _m]
+
+    def pending(self):
+        return [_e[1] for _e in self.psd.CATCH_UP.pending]
+
+    def run_window(self, job):  # the job runs through its window of May 4 as psd ticks it, every run is short
+        for second in (0, 900, 1801, 1802, 1803):
+            self.clock.now = self.at(4, 10, 0) + datetime.timedelta(seconds=second)
+            job.tick()
+            for run in self.psd.runs:
+                if run.returncode is None:
+                    run.end()
+
+    def test_window_with_run_is_not_missed(self):
+        for start in ({"day": 1}, {}):  # without "day" try_stop leaves the window as it was
+            self.setUp()
+            job = support.job(self.psd, window_job("once", start), T0)
+            self.run_window(job)
+            self.assertEqual(len(self.psd.runs), 1)
+            self.assertEqual(self.missed(), [])
+            self.assertEqual(self.pending(), [])
+            self.assertEqual((job.start_datetime, job.stop_datetime), (self.at(5, 10, 0), self.at(5, 10, 30)))
+            self.clock.now = self.at(5, 10, 0)
+            job.tick()
+            self.assertEqual(len(self.psd.runs), 2)
+
+    def test_window_with_run_of_repeated_job_is_not_missed(self):
+        job = support.job(self.psd, window_job("once", repeat={"unit": "m", "val": 10, "wait_finished": False}), T0)
+        self.run_window(job)
+        self.assertEqual(len(self.psd.runs), 2)
+        self.assertEqual(self.missed(), [])
+        self.assertEqual(self.pending(), [])
+        self.assertEqual(job.start_datetime, self.at(5, 10, 0))
+
+    def test_stalled_window_is_missed(self):
+        job = support.job(self.psd, window_job("once", {"day": 1}), T0)
+        self.clock.now = self.at(4, 10, 31)
+        job.tick()
+        self.assertEqual(self.psd.runs, [])
+        self.assertEqual(len(self.missed()), 1)
+        self.assertIn("missed 1 starts since 2020-05-04 10:00:00 while psd was stalled", self.missed()[0])
+        self.assertEqual(self.pending(), [1])
+        self.assertEqual(job.start_datetime, self.at(5, 10, 0))
+
+    def test_policies(self):
+        for policy, runs in (("skip", []), ("once", [1]), ("all", [3])):
+            self.setUp()
+            job = support.job(self.psd, window_job(policy, {"day": 1}, catch_up_max=3), T0)
+            self.clock.now = self.at(9, 10, 31)  # stalled for the windows of May 4..9
+            job.tick()
+            self.assertIn("missed 6 starts", self.missed()[0])
+            self.assertEqual(self.pending(), runs)
+
+    def test_missed_starts_follow_the_rules(self):
+        def count(start, finish, first, upto):
+            schedule = self.psd.Schedule({"start": start, "finish": finish})
+            return self.psd.missed_starts(schedule, first, upto)
+        self.assertEqual(count({"time": "10:00", "day": 1}, {"time": "10:30"}, self.at(4, 10, 0), self.at(9, 10, 0)), 5)
+        self.assertEqual(count({"time": "10:00", "day": 2}, {"time": "10:30"}, self.at(4, 10, 0), self.at(9, 10, 0)), 3)
+        self.assertEqual(count({"time": "10:00", "day": "mon"}, {"time": "10:30"}, self.at(4, 10, 0),
+                               self.at(25, 10, 0)), 3)
+        self.assertEqual(count({"time": "10:00", "day": 1}, {"time": "10:30"}, self.at(4, 10, 0), self.at(4, 10, 0)),
+                         0)
+
+    def test_catch_up_run_is_stopped_at_its_deadline(self):
+        job = support.job(self.psd, window_job("all", {"day": 1}, catch_up_max=2), T0)
+        self.clock.now = self.at(6, 9, 0)
+        job.tick()
+        runner = self.psd.CatchUpRunner(0)
+        runner.add(job, 2)
+        runner.tick()
+        self.assertEqual(len(self.psd.runs), 1)
+        self.assertIsNone(job.job)  # catch-up runs are not runs of the window
+        self.assertEqual(runner.next_wakeup(self.clock.now), self.clock.now)  # the next run waits for this one
+        runner.tick()
+        self.assertEqual(len(self.psd.runs), 1)
+
+        self.clock.now = self.at(6, 9, 30)
+        runner.tick()
+        self.assertEqual(self.psd.runs[0].returncode, -9)
+        self.assertTrue(self.psd.runs[0].stopped)
+        runner.tick()
+        self.assertEqual(len(self.psd.runs), 2)
+        self.assertEqual(runner.next_wakeup(self.clock.now), self.at(6, 10, 0))  # 30 minutes of the window
+        self.psd.runs[1].end()
+        self.clock.now = self.at(6, 9, 45)
+        runner.tick()
+        self.assertEqual(runner.running, {})
+        self.assertIsNone(runner.next_wakeup(self.clock.now))
+
+    def test_catch_up_run_ends_by_the_finish_of_the_next_window(self):
+        job = support.job(self.psd, window_job("once", {"day": 1}), T0)
+        self.clock.now = self.at(5, 9, 0)
+        job.tick()
+        self.assertEqual(job.stop_datetime, self.at(5, 10, 30))
+        runner = self.psd.CatchUpRunner(0)
+        self.assertEqual(runner.deadline(job, self.at(5, 9, 0)), self.at(5, 9, 30))
+        self.assertEqual(runner.deadline(job, self.at(5, 10, 15)), self.at(5, 10, 30))
+        never = support.job(self.psd, {"name": "never", "cmd": "true", "schedule": {"start": {"time": "10:00",
+                                                                                              "day": 1},
+                                                                                    "finish": {"time": "never"}}})
+        self.assertIsNone(runner.deadline(never, self.at(5, 9, 0)))
+
+    def test_dropped_job_loses_its_catch_up_run(self):
+        job = support.job(self.psd, window_job("all", {"day": 1}), T0)
+        runner = self.psd.CatchUpRunner(0)
+        runner.add(job, 3)
+        runner.tick()
+        runner.forget(job)
+        self.assertEqual(self.psd.runs[0].returncode, -9)
+        self.assertEqual(runner.pending, self.psd.collections.deque())
+
+    def test_restored_window_with_run_is_not_missed(self):
+        job = support.job(self.psd, window_job("once"), T0)  # without "day" the window stays after the run
+        self.clock.now = self.at(4, 10, 0)
+        job.tick()
+        state = json.loads(self.psd.state_row("j", "", self.psd.job_snapshot(job), "")[2])
+        self.clock.now = self.at(4, 11, 0)  # psd was stopped during the run and started after the window
+        job = support.job(self.psd, window_job("once"), self.clock.now)
+        self.assertIsNone(self.psd.restore_job(job, state, self.clock.now))
+        self.assertEqual(job.start_datetime, self.at(5, 10, 0))
+
+        self.clock.now = self.at(6, 11, 0)  # psd was stopped for the windows of May 5 and 6 too
+        job = support.job(self.psd, window_job("once"), self.clock.now)
+        self.assertEqual(self.psd.restore_job(job, state, self.clock.now), self.at(5, 10, 0))
+        self.assertEqual(job.start_datetime, self.at(7, 10, 0))
+
+    def test_stall_after_window_with_run_misses_the_next_windows(self):
+        job = support.job(self.psd, window_job("once"), T0)
+        self.clock.now = self.at(4, 10, 0)
+        job.tick()
+        self.clock.now = self.at(4, 10, 30, 1)
+        job.tick()  # try_stop leaves the window of May 4, then psd is stalled until May 6
+        self.assertEqual(job.start_datetime, self.at(4, 10, 0))
+        self.clock.now = self.at(6, 11, 0)
+        job.tick()
+        self.assertIn("missed 2 starts since 2020-05-05 10:00:00", self.missed()[0])
+        self.assertEqual(job.start_datetime, self.at(7, 10, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+# Copyright (C) 2020  ViiSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Reload: unchanged jobs keep their runs and schedule, changed and removed jobs are stopped, added jobs are armed.
+
+import datetime
+import gc
+import json
+import os
+import tempfile
+import unittest
+
+import support
+
+T0 = datetime.datetime(2020, 5, 4, 10, 5)
+
+
+def window_job(name, cmd="true", finish="11:00"):
+    return {"name": name, "cmd": cmd, "schedule": {"start": {"time": "10:00", "day": 1}, "finish": {"time": finish}}}
+
+
+class ReloadTest(unittest.TestCase):
+    def setUp(self):
+        self.psd, self.clock = support.load(T0)
+        self.psd.is_shell = False
+        self.psd.jobs = []
+        self.psd.jobs_r = []
+        self.tmp = tempfile.TemporaryDirectory()
+        self.f_name = os.path.join(self.tmp.name, "psd.json")
+        self.scheduler = self.psd.Scheduler()
+
+    def tearDown(self):
+        gc.unfreeze()
+        self.tmp.cleanup()
+
+    def write(self, jobs):
+        with open(self.f_name, "w") as f:
+            json.dump({"is_shell": False, "wait_repeated_jobs": False, "jobs": jobs}, f)
+        stat = os.stat(self.f_name)
+        os.utime(self.f_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))  # a new stamp in the same second
+
+    def start(self, jobs):  # jobs are loaded and started as at the start of psd, returns the reloader
+        self.write(jobs)
+        with open(self.f_name) as f:
+            settings = json.load(f)
+        specs, included = self.psd.compile_jobs(settings, self.tmp.name)
+        loaded = [(_spec, self.psd.make_job(_spec, False, T0)) for _spec in specs]
+        for _spec, _job in loaded:
+            _job.tick()
+            self.scheduler.add(_job, _job.next_wakeup(T0))
+        return self.psd.ConfigReloader(self.scheduler, self.f_name, self.tmp.name, settings, loaded, included, 1)
+
+    def jobs(self, reloader):
+        return {_spec.name: _job for _spec, _job in reloader.loaded}
+
+    def test_jobs_are_matched_by_name(self):
+        reloader = self.start([window_job("kept"), window_job("changed"), window_job("removed")])
+        before = self.jobs(reloader)
+        runs = {_run.job.name: _run for _run in self.psd.runs}
+        self.write([window_job("kept"), window_job("changed", finish="12:00"), window_job("added")])
+        reloader.tick()
+        after = self.jobs(reloader)
+        self.assertIs(after["kept"], before["kept"])
+        self.assertIsNone(runs["kept"].returncode)
+        self.assertIsNot(after["changed"], before["changed"])
+        self.assertEqual(runs["changed"].returncode, -9)
+        self.assertEqual(runs["removed"].returncode, -9)
+        self.assertNotIn("removed", after)
+        self.assertIn(after["added"], self.scheduler._entries)
+        self.assertNotIn(before["removed"], self.scheduler._entries)
+        self.assertEqual(self.psd.jobs, [after["kept"], after["changed"], after["added"]])
+        self.assertIn("1 added, 1 changed, 1 removed", self.psd.messages[-1])
+
+    def test_added_job_in_its_window_is_due_now(self):
+        reloader = self.start([window_job("a")])
+        self.write([window_job("a"), window_job("b")])
+        reloader.tick()
+        self.assertEqual(self.scheduler.run_pending(), 1)
+        self.assertEqual([_run.job.name for _run in self.psd.runs], ["a", "b"])
+
+    def test_unchanged_file_is_not_reloaded(self):
+        reloader = self.start([window_job("a")])
+        job = self.jobs(reloader)["a"]
+        reloader.tick()
+        self.assertIs(self.jobs(reloader)["a"], job)
+        self.assertEqual(self.psd.messages, [])
+
+    def test_wrong_settings_keep_the_jobs(self):
+        reloader = self.start([window_job("a")])
+        job = self.jobs(reloader)["a"]
+        self.write([{"name": "b", "cmd": "true", "schedule": {"start": {"time": "25:00"}}}])
+        reloader.tick()
+        self.assertIs(self.jobs(reloader)["a"], job)
+        self.assertIsNone(self.psd.runs[0].returncode)
+        self.assertIn("failed, jobs are not changed", self.psd.messages[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
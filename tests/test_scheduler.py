@@ -0,0 +1,120 @@
+# Copyright (C) 2020  ViiSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Heap scheduler: only due jobs are ticked, in order of their wakeup, and every ticked job is armed again.
+
+import datetime
+import unittest
+
+import support
+
+T0 = datetime.datetime(2020, 5, 4, 9, 0)
+
+
+class Probe:  # job-like object which records its ticks, next_wakeup() returns wakeups one by one
+    def __init__(self, name, ticks, wakeups=()):
+        self.name = name
+        self.ticks = ticks
+        self.wakeups = list(wakeups)
+
+    def tick(self):
+        self.ticks.append(self.name)
+
+    def next_wakeup(self, now):
+        return self.wakeups.pop(0) if self.wakeups else None
+
+
+class SchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.psd, self.clock = support.load(T0)
+        self.scheduler = self.psd.Scheduler()
+        self.ticks = []
+
+    def at(self, minutes):
+        return T0 + datetime.timedelta(minutes=minutes)
+
+    def test_only_due_jobs_are_ticked_in_order(self):
+        for name, minutes in (("c", 3), ("a", 1), ("b", 2)):
+            self.scheduler.add(Probe(name, self.ticks), self.at(minutes))
+        self.clock.set(2020, 5, 4, 9, 2)
+        self.assertEqual(self.scheduler.run_pending(), 2)
+        self.assertEqual(self.ticks, ["a", "b"])
+        self.assertEqual(self.scheduler.next_time(), self.at(3))
+        self.assertEqual(len(self.scheduler), 1)  # a and b have no next wakeup
+
+    def test_ticked_job_is_armed_at_its_next_wakeup(self):
+        self.scheduler.add(Probe("a", self.ticks, [self.at(5)]), self.at(1))
+        self.clock.set(2020, 5, 4, 9, 1)
+        self.scheduler.run_pending()
+        self.assertEqual(self.scheduler.next_time(), self.at(5))
+        self.clock.set(2020, 5, 4, 9, 4)
+        self.assertEqual(self.scheduler.run_pending(), 0)
+        self.clock.set(2020, 5, 4, 9, 5)
+        self.assertEqual(self.scheduler.run_pending(), 1)
+        self.assertEqual(self.ticks, ["a", "a"])
+
+    def test_passed_wakeup_is_retried_later(self):
+        self.scheduler.add(Probe("a", self.ticks, [self.at(0)]), self.at(1))
+        self.clock.set(2020, 5, 4, 9, 1)
+        self.scheduler.run_pending()
+        self.assertEqual(self.scheduler.next_time(), self.at(1) + self.psd.RETRY_DELAY)
+
+    def test_add_replaces_and_remove_cancels(self):
+        a = Probe("a", self.ticks)
+        b = Probe("b", self.ticks)
+        self.scheduler.add(a, self.at(1))
+        self.scheduler.add(a, self.at(2))
+        self.scheduler.add(b, self.at(1))
+        self.scheduler.remove(b)
+        self.assertEqual(self.scheduler.next_time(), self.at(2))
+        self.clock.set(2020, 5, 4, 9, 3)
+        self.assertEqual(self.scheduler.run_pending(), 1)
+        self.assertEqual(self.ticks, ["a"])
+
+    def test_add_many_drops_cancelled_entries(self):
+        probes = [Probe(str(_i), self.ticks) for _i in range(5)]
+        for _i, probe in enumerate(probes):
+            self.scheduler.add(probe, self.at(_i + 1))
+        self.scheduler.add_many([(probes[0], self.at(10)), (probes[1], None)])
+        self.assertEqual(len(self.scheduler._heap), 4)
+        self.assertEqual(self.scheduler.next_time(), self.at(3))
+
+    def test_delay_is_capped(self):
+        self.assertEqual(self.scheduler.delay(), self.psd.MAX_SLEEP)
+        self.scheduler.add(Probe("a", self.ticks), self.at(0) + datetime.timedelta(seconds=1.5))
+        self.assertEqual(self.scheduler.delay(), min(1.5, self.psd.MAX_SLEEP))
+        self.scheduler.add(Probe("a", self.ticks), self.at(-1))
+        self.assertEqual(self.scheduler.delay(), 0)
+
+    def test_job_wakes_up_at_its_start_and_finish(self):
+        job = support.job(self.psd, {"name": "j", "cmd": "true", "schedule": {"start": {"time": "10:00", "day": 1},
+                                                                              "finish": {"time": "10:30"}}}, T0)
+        self.scheduler.add(job, job.next_wakeup(T0))
+        self.assertEqual(self.scheduler.next_time(), datetime.datetime(2020, 5, 4, 10, 0))
+        self.clock.set(2020, 5, 4, 9, 59)
+        self.scheduler.run_pending()
+        self.assertEqual(self.psd.runs, [])
+        self.clock.set(2020, 5, 4, 10, 0)
+        self.scheduler.run_pending()
+        self.assertEqual(len(self.psd.runs), 1)
+        self.assertEqual(self.scheduler.next_time(), datetime.datetime(2020, 5, 4, 10, 30))
+        self.clock.set(2020, 5, 4, 10, 31)
+        self.scheduler.run_pending()
+        self.assertEqual(self.psd.runs[0].returncode, -9)  # stopped at the finish time
+        self.assertEqual(self.scheduler.next_time(), datetime.datetime(2020, 5, 5, 10, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
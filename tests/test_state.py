@@ -0,0 +1,116 @@
+# Copyright (C) 2020  ViiSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Job state: after restart jobs continue their schedule from the SQLite file instead of starting anew.
+
+import datetime
+import importlib.util
+import os
+import tempfile
+import unittest
+
+import support
+
+T0 = datetime.datetime(2020, 5, 4, 10, 5)
+DAILY = {"name": "daily", "cmd": "true", "schedule": {"start": {"time": "10:00", "day": 1},
+                                                      "finish": {"time": "11:00"}}}
+
+
+@unittest.skipIf(importlib.util.find_spec("sqlite3") is None, "Python without sqlite3 module")
+class StateTest(unittest.TestCase):
+    def setUp(self):
+        self.psd, self.clock = support.load(T0)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.f_name = os.path.join(self.tmp.name, "psd.state")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def load(self, *jobs):  # jobs of a started psd with their state restored, as at the start of psd
+        specs = [self.psd.JobSpec(_js, False) for _js in jobs]
+        loaded = [(_spec, self.psd.make_job(_spec, False, self.clock.now)) for _spec in specs]
+        store = self.psd.StateStore(self.f_name, 0.01)
+        store.track(loaded)
+        store.restore(loaded, self.clock.now)
+        store.start()
+        return store, [_job for _spec, _job in loaded]
+
+    def test_job_which_ran_is_not_run_again_in_its_window(self):
+        store, (job,) = self.load(DAILY)
+        job.tick()
+        store.save(job)
+        store.close()
+        self.assertEqual(len(self.psd.runs), 1)
+
+        self.clock.set(2020, 5, 4, 10, 30)
+        store, (job,) = self.load(DAILY)
+        store.close()
+        self.assertIn("State of 1 jobs is restored", self.psd.messages[-1])
+        self.assertEqual(job.start_datetime, datetime.datetime(2020, 5, 5, 10, 0))
+        self.assertEqual(job.stop_datetime, datetime.datetime(2020, 5, 4, 11, 0))
+        self.assertIsInstance(job.job, self.psd.RestoredRun)
+        self.assertEqual(job.last_start, T0)
+        job.tick()
+        self.assertEqual(len(self.psd.runs), 1)
+        self.clock.set(2020, 5, 4, 11, 1)
+        job.tick()
+        self.assertIsNone(job.job)
+        self.assertEqual(job.stop_datetime, datetime.datetime(2020, 5, 5, 11, 0))
+
+    def test_state_of_changed_job_is_dropped(self):
+        store, (job,) = self.load(DAILY)
+        job.tick()
+        store.save(job)
+        store.close()
+
+        self.clock.set(2020, 5, 4, 10, 30)
+        changed = dict(DAILY, cmd="false")
+        store, (job,) = self.load(changed)
+        store.close()
+        self.assertIn("State of 0 jobs is restored", self.psd.messages[-1])
+        self.assertIsNone(job.job)
+        job.tick()
+        self.assertEqual(len(self.psd.runs), 2)
+
+    def test_window_passed_while_stopped_is_missed(self):
+        self.clock.set(2020, 5, 4, 9, 0)
+        store, (job,) = self.load(dict(DAILY, catch_up="once"))
+        store.save(job)
+        store.close()
+
+        self.clock.set(2020, 5, 7, 9, 0)
+        self.psd.CATCH_UP = self.psd.CatchUpRunner(0)
+        store, (job,) = self.load(dict(DAILY, catch_up="once"))
+        store.close()
+        self.assertIn("missed 3 starts since 2020-05-04 10:00:00 while psd was stopped", self.psd.messages[-2])
+        self.assertEqual(job.start_datetime, datetime.datetime(2020, 5, 7, 10, 0))
+        self.assertEqual([(_e[0], _e[1]) for _e in self.psd.CATCH_UP.pending], [(job, 1)])
+
+    def test_now_job_is_started_anew(self):
+        now_job = {"name": "now", "cmd": "true", "schedule": {"start": {"time": "now"}, "finish": {"time": "never"}}}
+        store, (job,) = self.load(now_job)
+        job.tick()
+        store.save(job)
+        store.close()
+
+        store, (job,) = self.load(now_job)
+        store.close()
+        self.assertIsNone(job.job)
+        job.tick()
+        self.assertEqual(len(self.psd.runs), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
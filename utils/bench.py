@@ -0,0 +1,249 @@
+# Copyright (C) 2020  ViiSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Benchmarks of psd hot paths on generated settings files with every schedule shape:
+# startup and config load, tick cost, memory per job, spawn latency and shutdown time.
+# Results are written to a JSON file, --compare prints the change against an older result file.
+# Usage: python bench.py [--sizes 1,100,10000,100000] [--out bench.json] [--compare old.json]
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+PSD_FILE = pathlib.Path(__file__).absolute().parent.parent / "psd.py"
+
+
+def load():
+    module = types.ModuleType("psd")
+    module.__file__ = str(PSD_FILE)
+    sys.modules["psd"] = module  # compiled jobs are pickled by the config cache
+    exec(compile(PSD_FILE.read_text(), str(PSD_FILE), "exec"), module.__dict__)
+    module.set_output(module.make_output("null", module.OUTPUT_BUFFER))
+    return module
+
+
+def shapes():  # schedules of every kind, none of them starts within an hour
+    now = datetime.datetime.now()
+    start = (now + datetime.timedelta(hours=2)).strftime("%H:%M")
+    finish = (now + datetime.timedelta(hours=3)).strftime("%H:%M")
+    day = (now + datetime.timedelta(days=2)).day
+    return [
+        {"schedule": {"start": {"time": start, "day": day}, "finish": {"time": finish}}},
+        {"schedule": {"start": {"time": start, "day": "mon"}, "finish": {"time": finish, "day": "fri"}}},
+        {"schedule": {"start": {"month": {"values": ["jan", "jul"], "day": "mon", "each": 2, "time": start}},
+                      "finish": {"month": {"values": "dec", "day": 1, "time": finish}}}},
+        {"schedule": {"start": {"month": {"values": 2, "day": 15, "time": start}}, "finish": {"time": "never"}}},
+        {"schedule": {"start": {"time": start, "when_finished": True}, "finish": {"time": finish}}},
+        {"schedule": {"start": {"time": start}, "finish": {"time": finish}},
+         "repeat": {"unit": "m", "val": 5, "wait_finished": True}},
+        {"schedule": {"start": {"time": start, "day": "wed"}, "finish": {"time": "never"}},
+         "repeat": {"unit": "s", "val": 30, "wait_finished": False}},
+    ]
+
+
+def make_settings(count):
+    jobs = []
+    job_shapes = shapes()
+    for i in range(count):
+        job = {"name": "job" + str(i), "cmd": "true"}
+        job.update(job_shapes[i % len(job_shapes)])
+        jobs.append(job)
+    return {"wait_repeated_jobs": False, "is_shell": False, "output": {"sink": "null"}, "jobs": jobs}
+
+
+def make_jobs(psd, specs):
+    return [psd.make_job(_spec, False) for _spec in specs]
+
+
+def measure_load(psd, f_name, working_dir):
+    begin = time.perf_counter()
+    with open(f_name) as f:
+        settings = json.load(f)
+    specs, included = psd.compile_jobs(settings, working_dir)
+    compiled = time.perf_counter()
+    make_jobs(psd, specs)
+    end = time.perf_counter()
+
+    cache_file = f_name + ".cache"
+    psd.save_config_cache(cache_file, settings, specs, [f_name])
+    cache_begin = time.perf_counter()
+    cached = psd.load_config_cache(cache_file)
+    cache_end = time.perf_counter()
+    assert cached is not None
+    return {"load_s": end - begin, "compile_s": compiled - begin, "cache_load_s": cache_end - cache_begin}, specs
+
+
+def measure_check(f_name):  # whole process: interpreter start, parsing and validation
+    begin = time.perf_counter()
+    subprocess.run([sys.executable, str(PSD_FILE), f_name, "--check"], check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - begin
+
+
+def measure_memory(psd, f_name, working_dir):  # compiled job and its Job object, settings excluded
+    with open(f_name) as f:
+        settings = json.load(f)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    specs, included = psd.compile_jobs(settings, working_dir)
+    jobs = make_jobs(psd, specs)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(jobs)
+
+
+def measure_tick(psd, specs, rounds):
+    jobs = make_jobs(psd, specs)
+    best = None
+    for r in range(rounds):
+        begin = time.perf_counter()
+        for _j in jobs:
+            _j.tick()
+        elapsed = time.perf_counter() - begin
+        if best is None or elapsed < best:
+            best = elapsed
+
+    # loop iteration with every job armed and none due
+    scheduler = psd.Scheduler()
+    now = datetime.datetime.now()
+    for _j in jobs:
+        scheduler.add(_j, _j.next_wakeup(now))
+    begin = time.perf_counter()
+    for r in range(1000):
+        scheduler.run_pending()
+        scheduler.delay()
+    idle = (time.perf_counter() - begin) / 1000
+    return best / len(jobs) * 1e9, idle * 1e6
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def measure_spawn(psd, count):  # latency from the instant all 'now' jobs are due to their Popen, then shutdown
+    psd.SUPERVISOR = psd.ChildSupervisor()
+    psd.SHUTDOWN = None
+    schedule = {"start": {"time": "now"}, "finish": {"time": "never"}}
+    jobs = [psd.Job("spawn" + str(i), "sleep 30", psd.Schedule(schedule), False, False) for i in range(count)]
+    scheduler = psd.Scheduler(psd.SUPERVISOR)
+    now = datetime.datetime.now()
+    for _j in jobs:
+        scheduler.add(_j, _j.next_wakeup(now))
+
+    spawned = []
+    popen = psd.popen
+
+    def timed_popen(job):
+        proc = popen(job)
+        spawned.append(time.perf_counter())
+        return proc
+
+    psd.popen = timed_popen
+    due = time.perf_counter()
+    try:
+        scheduler.run_pending()
+    finally:
+        psd.popen = popen
+    latency = [(_t - due) * 1000 for _t in spawned]
+
+    begin = time.perf_counter()
+    coordinator = psd.ShutdownCoordinator(psd.SUPERVISOR, jobs, [], False, 5, None)
+    psd.SHUTDOWN = coordinator
+    timeout = coordinator.start()
+    while timeout is not None:
+        psd.SUPERVISOR.wait(timeout)
+        timeout = coordinator.step()
+    shutdown = time.perf_counter() - begin
+    psd.SHUTDOWN = None
+    psd.SUPERVISOR = None
+    return {"spawned": len(spawned), "spawn_latency_p50_ms": percentile(latency, 0.5),
+            "spawn_latency_p99_ms": percentile(latency, 0.99), "spawn_latency_max_ms": max(latency),
+            "shutdown_s": shutdown}
+
+
+def run(sizes, rounds, spawn_max):
+    psd = load()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in sizes:
+            f_name = os.path.join(tmp, "bench_" + str(count) + ".json")
+            with open(f_name, "w") as f:
+                json.dump(make_settings(count), f)
+            result, specs = measure_load(psd, f_name, tmp + os.sep)
+            result["check_s"] = measure_check(f_name)
+            result["memory_bytes_per_job"] = measure_memory(psd, f_name, tmp + os.sep)
+            result["tick_ns_per_job"], result["idle_loop_us"] = measure_tick(psd, specs, rounds)
+            result.update(measure_spawn(psd, max(min(count, spawn_max), 1)))
+            results[str(count)] = result
+            print(str(count) + " jobs: " + ", ".join(_k + " " + format_value(_v) for _k, _v in result.items()))
+    return results
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return "%.4g" % value
+    return str(value)
+
+
+def compare(old, new):
+    for count, result in new["results"].items():
+        base = old["results"].get(count)
+        if base is None:
+            continue
+        print(count + " jobs:")
+        for key, value in result.items():
+            if key not in base or not base[key]:
+                continue
+            print("  %-24s %12s -> %-12s (%+.1f%%)" % (key, format_value(base[key]), format_value(value),
+                                                       (value / base[key] - 1) * 100))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of psd hot paths")
+    parser.add_argument("--sizes", default="1,100,10000,100000", help="numbers of jobs, comma separated")
+    parser.add_argument("--rounds", type=int, default=5, help="rounds of tick measurement, the best is taken")
+    parser.add_argument("--spawn-max", type=int, default=500, help="max number of processes started at once")
+    parser.add_argument("--out", default="bench.json", help="file of results")
+    parser.add_argument("--compare", help="older file of results")
+    args = parser.parse_args()
+
+    report = {
+        "psd_sha256": hashlib.sha256(PSD_FILE.read_bytes()).hexdigest()[:12],
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "results": run([int(_s) for _s in args.sizes.split(",")], args.rounds, args.spawn_max),
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Results are written to " + args.out)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
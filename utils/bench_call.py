@@ -0,0 +1,103 @@
+# Copyright (C) 2020  ViiSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Cost of a short Python job: a process per run (cold interpreter, zygote fork) against a call in the call pool.
+# For every mode: time from the start of a run to its result, and CPU time of psd per run.
+# Usage: python bench_call.py [--runs 50]
+
+import argparse
+import os
+import pathlib
+import resource
+import sys
+import tempfile
+import time
+import types
+
+PSD_FILE = pathlib.Path(__file__).absolute().parent.parent / "psd.py"
+TASK = "import json\n\n\ndef run(n):\n    return json.dumps({'n': n})\n\n\nif __name__ == '__main__':\n    run(1)\n"
+
+
+def load():
+    module = types.ModuleType("psd")
+    module.__file__ = str(PSD_FILE)
+    sys.modules["psd"] = module  # calls are pickled by reference, workers import psd
+    sys.path.insert(0, str(PSD_FILE.parent))
+    exec(compile(PSD_FILE.read_text(), str(PSD_FILE), "exec"), module.__dict__)
+    module.set_output(module.make_output("null", module.OUTPUT_BUFFER))
+    return module
+
+
+def cpu():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def measure(psd, job, runs):
+    latency = []
+    begin_cpu = cpu()
+    for r in range(runs):
+        begin = time.perf_counter()
+        proc = psd.popen(job)
+        while proc.poll() is None:
+            time.sleep(0.0002)
+        latency.append((time.perf_counter() - begin) * 1000)
+    return {"p50_ms": percentile(latency, 0.5), "p99_ms": percentile(latency, 0.99),
+            "psd_cpu_ms": (cpu() - begin_cpu) / runs * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost of a short Python job: a process per run against a call")
+    parser.add_argument("--runs", type=int, default=50, help="runs per mode")
+    args = parser.parse_args()
+    runs = args.runs
+    psd = load()
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "bench_task.py"), "w") as f:
+            f.write(TASK)
+        sys.path.insert(0, tmp)
+        script = os.path.join(tmp, "bench_task.py")
+        schedule = psd.Schedule({"start": {"time": "now"}, "finish": {"time": "never"}})
+
+        cold = psd.Job("cold", sys.executable + " " + script, schedule, False, False)
+        cold.is_shell = False
+        zygote = psd.Zygote("bench", sys.executable, ["json"])
+        zygote.start()
+        warm = psd.Job("zygote", sys.executable + " " + script, schedule, False, False)
+        warm.zygote = zygote
+        warm.zygote_argv = [script]
+        psd.CALL_POOL = psd.CallPool(1, None, None)
+        call = psd.Job("call", "bench_task:run", schedule, False, False)
+        call.call = "bench_task:run"
+        call.call_args = (1,)
+        measure(psd, warm, 1)  # warm up: zygote and worker are started once
+        measure(psd, call, 1)
+
+        print("runs: " + str(runs))
+        print("%-20s %10s %10s %12s" % ("", "p50 ms", "p99 ms", "psd cpu ms"))
+        for job in (cold, warm, call):
+            result = measure(psd, job, runs)
+            print("%-20s %10.3f %10.3f %12.3f" % (job.name, result["p50_ms"], result["p99_ms"], result["psd_cpu_ms"]))
+        zygote.close()
+        psd.CALL_POOL.close()
+
+
+if __name__ == "__main__":
+    main()
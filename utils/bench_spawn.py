@@ -0,0 +1,91 @@
+# Copyright (C) 2020  ViiSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Cost of starting job processes: exec mode "legacy" (Popen, with and without the shell) against exec mode "auto"
+# (os.posix_spawn of the parsed command, and of the shell for a command with shell syntax).
+# For every mode: latency of one start, CPU time of psd per start and CPU time of the started processes per run.
+# Usage: python bench_spawn.py [--runs 300] [--cmd true]
+
+import argparse
+import pathlib
+import resource
+import time
+import types
+
+PSD_FILE = pathlib.Path(__file__).absolute().parent.parent / "psd.py"
+
+
+def load():
+    module = types.ModuleType("psd")
+    module.__file__ = str(PSD_FILE)
+    exec(compile(PSD_FILE.read_text(), str(PSD_FILE), "exec"), module.__dict__)
+    return module
+
+
+def cpu(who):
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def measure(psd, exec_mode, cmd, is_shell, runs):
+    psd.EXEC_MODE = exec_mode
+    spec = psd.JobSpec({"name": "spawn", "cmd": cmd, "schedule": {"start": {"time": "now"},
+                                                                  "finish": {"time": "never"}}}, False)
+    job = psd.make_job(spec, is_shell)
+    procs = []
+    latency = []
+    self_begin = cpu(resource.RUSAGE_SELF)
+    for r in range(runs):
+        begin = time.perf_counter()
+        procs.append(psd.popen(job))
+        latency.append((time.perf_counter() - begin) * 1e6)
+    self_cpu = cpu(resource.RUSAGE_SELF) - self_begin
+
+    children_begin = cpu(resource.RUSAGE_CHILDREN)
+    for proc in procs:
+        while proc.poll() is None:
+            time.sleep(0.001)
+    children_cpu = cpu(resource.RUSAGE_CHILDREN) - children_begin
+    return {"program": job.program, "p50_us": percentile(latency, 0.5), "p99_us": percentile(latency, 0.99),
+            "psd_cpu_us": self_cpu / runs * 1e6, "child_cpu_us": children_cpu / runs * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost of starting job processes in every exec mode")
+    parser.add_argument("--runs", type=int, default=300, help="starts per mode")
+    parser.add_argument("--cmd", default="true", help="command of the job")
+    args = parser.parse_args()
+    runs, cmd = args.runs, args.cmd
+    psd = load()
+    modes = [("legacy, shell", "legacy", cmd, True),
+             ("legacy, no shell", "legacy", cmd, False),
+             ("auto, posix_spawn", "auto", cmd, True),
+             ("auto, shell syntax", "auto", cmd + " ;", True)]
+    measure(psd, "legacy", cmd, False, 20)  # warm up
+    print("runs: " + str(runs) + ", cmd: " + cmd + ", posix_spawn: " + str(psd.FAST_SPAWN))
+    print("%-20s %10s %10s %14s %14s" % ("", "p50 us", "p99 us", "psd cpu us", "child cpu us"))
+    for name, exec_mode, mode_cmd, is_shell in modes:
+        result = measure(psd, exec_mode, mode_cmd, is_shell, runs)
+        print("%-20s %10.1f %10.1f %14.1f %14.1f" % (name, result["p50_us"], result["p99_us"], result["psd_cpu_us"],
+                                                     result["child_cpu_us"]))
+
+
+if __name__ == "__main__":
+    main()
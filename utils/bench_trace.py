@@ -0,0 +1,111 @@
+# Copyright (C) 2020  ViiSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Tick cost of psd jobs with tracing off, compared with psd built without trace calls.
+# Usage: python bench_trace.py [--jobs 10000] [--rounds 20]
+
+import argparse
+import ast
+import datetime
+import pathlib
+import time
+import types
+
+PSD_FILE = pathlib.Path(__file__).absolute().parent.parent / "psd.py"
+
+
+class StripTrace(ast.NodeTransformer):  # removes every 'if TRACE:' block
+    def generic_visit(self, node):
+        super().generic_visit(node)
+        for field in ("body", "orelse"):
+            stmts = getattr(node, field, None)
+            if not isinstance(stmts, list) or not stmts or not isinstance(stmts[0], ast.stmt):
+                continue
+            kept = [st for st in stmts if not (isinstance(st, ast.If)
+                                               and isinstance(st.test, ast.Name) and st.test.id == "TRACE")]
+            if not kept and field == "body":
+                kept = [ast.Pass()]
+            setattr(node, field, kept)
+        return node
+
+
+def load(name, strip):
+    source = PSD_FILE.read_text()
+    tree = ast.parse(source)
+    if strip:
+        tree = ast.fix_missing_locations(StripTrace().visit(tree))
+    module = types.ModuleType(name)
+    module.__file__ = str(PSD_FILE)
+    exec(compile(tree, str(PSD_FILE), "exec"), module.__dict__)
+    return module
+
+
+def make_jobs(psd, count):
+    now = datetime.datetime.now()
+    start = (now + datetime.timedelta(hours=2)).strftime("%H:%M")
+    finish = (now + datetime.timedelta(hours=3)).strftime("%H:%M")
+    schedule = {"start": {"time": start, "day": 1}, "finish": {"time": finish}}
+    repeat = {"unit": "m", "val": 1, "wait_finished": True}
+    jobs = []
+    for i in range(count):
+        if i % 2:
+            jobs.append(psd.Job("job" + str(i), "true", psd.Schedule(schedule), False, True))
+        else:
+            # repeated job inside its window, waiting for the next repeat
+            jr = psd.JobRep("job" + str(i), "true", psd.Schedule(schedule), True, False, psd.Repeat(repeat))
+            jr.is_start = True
+            jr.next_repeat = now + datetime.timedelta(hours=1)
+            jr.stop_datetime = now + datetime.timedelta(hours=4)
+            jobs.append(jr)
+    return jobs
+
+
+def measure(jobs, rounds):
+    best = None
+    for r in range(rounds):
+        begin = time.perf_counter()
+        for _j in jobs:
+            _j.tick()
+        elapsed = time.perf_counter() - begin
+        if best is None or elapsed < best:
+            best = elapsed
+    return best / len(jobs) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tick cost of psd jobs with tracing off")
+    parser.add_argument("--jobs", type=int, default=10000, help="number of jobs")
+    parser.add_argument("--rounds", type=int, default=20, help="rounds of tick measurement")
+    args = parser.parse_args()
+    count, rounds = args.jobs, args.rounds
+
+    traced = load("psd_traced", False)
+    stripped = load("psd_stripped", True)
+
+    results = [("trace calls removed", measure(make_jobs(stripped, count), rounds)),
+               ("tracing off", measure(make_jobs(traced, count), rounds))]
+
+    traced.set_trace(True, {"level": "info"})  # enabled, but every job message is below the level
+    results.append(("tracing on, filtered out", measure(make_jobs(traced, count), rounds)))
+    traced.set_trace(False)
+
+    print("jobs: " + str(count) + ", rounds: " + str(rounds))
+    base = results[0][1]
+    for name, ns in results:
+        print("%-26s %8.1f ns/job tick  (%+.1f%%)" % (name, ns, (ns / base - 1) * 100))
+
+
+if __name__ == "__main__":
+    main()
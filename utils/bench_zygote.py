@@ -0,0 +1,90 @@
+# Copyright (C) 2020  ViiSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Run time of a Python script job: a cold interpreter per run against a run forked by a zygote with the modules of
+# the script preloaded. For every mode: time from the start of a run to its exit, and the cold start of the zygote.
+# Usage: python bench_zygote.py [--runs 50] [--modules json,decimal]
+
+import argparse
+import os
+import pathlib
+import sys
+import tempfile
+import time
+import types
+
+PSD_FILE = pathlib.Path(__file__).absolute().parent.parent / "psd.py"
+MODULES = "json,decimal,email.mime.multipart,http.client,logging.handlers,urllib.request"
+
+
+def load():
+    module = types.ModuleType("psd")
+    module.__file__ = str(PSD_FILE)
+    exec(compile(PSD_FILE.read_text(), str(PSD_FILE), "exec"), module.__dict__)
+    return module
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def measure(psd, job, runs):
+    latency = []
+    for r in range(runs):
+        begin = time.perf_counter()
+        proc = psd.popen(job)
+        while proc.poll() is None:
+            time.sleep(0.0005)
+        latency.append((time.perf_counter() - begin) * 1000)
+    return {"p50_ms": percentile(latency, 0.5), "p99_ms": percentile(latency, 0.99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run time of a Python script job with and without a zygote")
+    parser.add_argument("--runs", type=int, default=50, help="runs per mode")
+    parser.add_argument("--modules", default=MODULES, help="modules imported by the script, comma separated")
+    args = parser.parse_args()
+    runs, modules = args.runs, args.modules.split(",")
+    psd = load()
+    with tempfile.TemporaryDirectory() as tmp:
+        script = os.path.join(tmp, "job.py")
+        with open(script, "w") as f:
+            f.write("".join("import " + _m + "\n" for _m in modules))
+        cmd = sys.executable + " " + script
+        schedule = psd.Schedule({"start": {"time": "now"}, "finish": {"time": "never"}})
+        cold = psd.Job("cold", cmd, schedule, False, False)
+        cold.is_shell = False
+
+        zygote = psd.Zygote("bench", sys.executable, modules)
+        begin = time.perf_counter()
+        zygote.start()
+        warm = psd.Job("warm", cmd, schedule, False, False)
+        warm.zygote = zygote
+        warm.zygote_argv = psd.zygote_argv(cmd)
+        measure(psd, warm, 1)
+        zygote_start = (time.perf_counter() - begin) * 1000
+
+        print("runs: " + str(runs) + ", modules: " + ", ".join(modules))
+        print("zygote start, first run included: %.1f ms" % zygote_start)
+        print("%-20s %10s %10s" % ("", "p50 ms", "p99 ms"))
+        for name, job in (("cold interpreter", cold), ("zygote fork", warm)):
+            result = measure(psd, job, runs)
+            print("%-20s %10.1f %10.1f" % (name, result["p50_ms"], result["p99_ms"]))
+        zygote.close()
+
+
+if __name__ == "__main__":
+    main()